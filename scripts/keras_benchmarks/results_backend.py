@@ -0,0 +1,184 @@
+""" Backends that record benchmark results, either to BigQuery or to a local
+SQLite database for hosts that cannot reach BigQuery.
+
+Both backends store the same fields. The SQLite database can also be queried
+for the recent runs of a benchmark, e.g. the last 10 runs of lstm on the
+tensorflow backend:
+
+    python results_backend.py --sqlite_path=keras_benchmarks.db \
+        --test_name=lstm --backend_type=tensorflow --last=10
+"""
+import argparse
+import sqlite3
+import time
+import uuid
+
+
+# The fields of a benchmark result, in the order of the SQLite columns. The
+# schema is shared with tf_cnn_benchmarks/benchmark_history.py, which imports
+# it from here.
+RESULT_FIELDS = (
+    'test_id', 'test_name', 'recorded_time', 'total_time', 'epochs',
+    'batch_size', 'sample_type', 'backend_type', 'backend_version',
+    'cpu_num_cores', 'cpu_memory', 'cpu_memory_info', 'gpu_count',
+    'gpu_platform', 'platform_type', 'platform_machine_type', 'keras_version')
+
+CREATE_TABLE = """\
+CREATE TABLE IF NOT EXISTS benchmarks (
+    test_id INTEGER,
+    test_name TEXT NOT NULL,
+    recorded_time REAL NOT NULL,
+    total_time REAL,
+    epochs INTEGER,
+    batch_size INTEGER,
+    sample_type TEXT,
+    backend_type TEXT,
+    backend_version TEXT,
+    cpu_num_cores REAL,
+    cpu_memory REAL,
+    cpu_memory_info TEXT,
+    gpu_count REAL,
+    gpu_platform TEXT,
+    platform_type TEXT,
+    platform_machine_type TEXT,
+    keras_version TEXT)
+"""
+
+CREATE_INDEX = """\
+CREATE INDEX IF NOT EXISTS benchmarks_by_test
+    ON benchmarks (test_name, backend_type, recorded_time)
+"""
+
+
+def make_result(**kwargs):
+    """ Returns a result dict with every field in RESULT_FIELDS.
+
+    # Arguments
+        **kwargs: The fields of the result, with the same names as the
+                  arguments of `upload_benchmarks_bq.upload_metrics_to_bq`.
+                  `test_id` and `recorded_time` default to a random id and the
+                  current time, and other missing fields to None.
+    """
+    unknown_fields = set(kwargs) - set(RESULT_FIELDS)
+    if unknown_fields:
+        raise ValueError('Unknown result fields: %s' % sorted(unknown_fields))
+    result = dict.fromkeys(RESULT_FIELDS)
+    result['test_id'] = uuid.uuid4().int >> 80
+    result['recorded_time'] = time.time()
+    result.update(kwargs)
+    return result
+
+
+class ResultsBackend(object):
+    """ Records benchmark results. Subclasses implement `insert`."""
+
+    def insert(self, results):
+        """ Records a list of result dicts created by `make_result`."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class BigQueryBackend(ResultsBackend):
+    """ Uploads results to the keras_benchmarks.benchmarks BigQuery table."""
+
+    def __init__(self):
+        # Only import the BigQuery client when it is used, so the SQLite
+        # backend works on hosts without it.
+        import upload_benchmarks_bq
+        self._bq = upload_benchmarks_bq
+
+    def insert(self, results):
+        # BigQuery DML inserts one row per query.
+        for result in results:
+            kwargs = dict(result)
+            del kwargs['test_id'], kwargs['recorded_time']
+            self._bq.upload_metrics_to_bq(**kwargs)
+
+
+class SQLiteBackend(ResultsBackend):
+    """ Stores results in a local SQLite database.
+
+    # Arguments
+        path: The database file. It is created if it does not exist.
+    """
+
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path)
+        with self._connection:
+            self._connection.execute(CREATE_TABLE)
+            self._connection.execute(CREATE_INDEX)
+
+    def insert(self, results):
+        # All results are inserted in a single transaction.
+        with self._connection:
+            self._connection.executemany(
+                'INSERT INTO benchmarks (%s) VALUES (%s)' % (
+                    ', '.join(RESULT_FIELDS),
+                    ', '.join('?' * len(RESULT_FIELDS))),
+                [tuple(result[f] for f in RESULT_FIELDS) for result in results])
+
+    def query_recent(self, test_name, backend_type=None, limit=10):
+        """ Returns the last `limit` results of a benchmark, newest first.
+
+        # Arguments
+            test_name: The name of the benchmark, e.g. "lstm".
+            backend_type: If given, only results of this Keras backend are
+                          returned.
+            limit: The maximum number of results to return.
+        """
+        query = 'SELECT %s FROM benchmarks WHERE test_name = ?' % (
+            ', '.join(RESULT_FIELDS))
+        args = [test_name]
+        if backend_type is not None:
+            query += ' AND backend_type = ?'
+            args.append(backend_type)
+        query += ' ORDER BY recorded_time DESC, rowid DESC LIMIT ?'
+        args.append(limit)
+        rows = self._connection.execute(query, args).fetchall()
+        return [dict(zip(RESULT_FIELDS, row)) for row in rows]
+
+    def close(self):
+        self._connection.close()
+
+
+def get_backend(name, sqlite_path=None):
+    """ Returns the ResultsBackend called `name`, "bigquery" or "sqlite"."""
+    if name == 'bigquery':
+        return BigQueryBackend()
+    if name == 'sqlite':
+        if not sqlite_path:
+            raise ValueError('The sqlite backend requires a database path')
+        return SQLiteBackend(sqlite_path)
+    raise ValueError('Unknown results backend: %s' % name)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Prints the recent results of a benchmark.')
+    parser.add_argument('--sqlite_path', required=True,
+                        help='The SQLite database of results.')
+    parser.add_argument('--test_name', required=True,
+                        help='The benchmark, e.g. "lstm".')
+    parser.add_argument('--backend_type',
+                        help='Only show results of this Keras backend.')
+    parser.add_argument('--last', type=int, default=10,
+                        help='The number of results to show.')
+    args = parser.parse_args()
+
+    backend = SQLiteBackend(args.sqlite_path)
+    results = backend.query_recent(args.test_name, args.backend_type,
+                                   args.last)
+    backend.close()
+    print('recorded_time\tbackend\ttotal_time\tepochs\tbatch_size')
+    for result in results:
+        print('%s\t%s\t%.2f\t%s\t%s' % (
+            time.strftime('%Y-%m-%d %H:%M:%S',
+                          time.localtime(result['recorded_time'])),
+            result['backend_type'], result['total_time'], result['epochs'],
+            result['batch_size']))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,7 @@
 from models import mnist_mlp_benchmark
 from models import cifar10_cnn_benchmark
 from models import lstm_benchmark
-import upload_benchmarks_bq as bq
+import results_backend
 import argparse
 import keras
 import json
@@ -18,6 +18,13 @@ if keras.backend.backend() == "cntk":
 parser = argparse.ArgumentParser()
 parser.add_argument('--mode',
                     help='The benchmark can be run on cpu, gpu and multiple gpus.')
+parser.add_argument('--results_backend', default='bigquery',
+                    choices=['bigquery', 'sqlite'],
+                    help='Where the results are recorded. Use sqlite on hosts '
+                         'that cannot reach BigQuery.')
+parser.add_argument('--sqlite_path', default='keras_benchmarks.db',
+                    help='The SQLite database used by the sqlite results '
+                         'backend.')
 
 args = parser.parse_args()
 
@@ -36,35 +43,43 @@ def get_backend_version():
         return cntk.__version__
     return "undefined"
 
-def _upload_metrics(current_model):
-    bq.upload_metrics_to_bq(test_name=current_model.test_name,
-                            total_time=current_model.total_time,
-                            epochs=current_model.epochs,
-                            batch_size=current_model.batch_size,
-                            backend_type=keras.backend.backend(),
-                            backend_version=get_backend_version(),
-                            cpu_num_cores=config['cpu_num_cores'],
-                            cpu_memory=config['cpu_memory'],
-                            cpu_memory_info=config['cpu_memory_info'],
-                            gpu_count=config['gpus'],
-                            gpu_platform=config['gpu_platform'],
-                            platform_type=config['platform_type'],
-                            platform_machine_type=config['platform_machine_type'],
-                            keras_version=keras.__version__,
-                            sample_type=current_model.sample_type)
+def _get_result(current_model):
+    return results_backend.make_result(
+        test_name=current_model.test_name,
+        total_time=current_model.total_time,
+        epochs=current_model.epochs,
+        batch_size=current_model.batch_size,
+        backend_type=keras.backend.backend(),
+        backend_version=get_backend_version(),
+        cpu_num_cores=config['cpu_num_cores'],
+        cpu_memory=config['cpu_memory'],
+        cpu_memory_info=config['cpu_memory_info'],
+        gpu_count=config['gpus'],
+        gpu_platform=config['gpu_platform'],
+        platform_type=config['platform_type'],
+        platform_machine_type=config['platform_machine_type'],
+        keras_version=keras.__version__,
+        sample_type=current_model.sample_type)
 
 
-# MNIST MLP
-model = mnist_mlp_benchmark.MnistMlpBenchmark()
-model.run_benchmark(gpus=config['gpus'])
-_upload_metrics(model)
+backend = results_backend.get_backend(args.results_backend, args.sqlite_path)
 
-# CIFAR10 CNN
-model = cifar10_cnn_benchmark.Cifar10CnnBenchmark()
-model.run_benchmark(gpus=config['gpus'])
-_upload_metrics(model)
+# Each result is recorded as soon as its model has run, so the results of the
+# models that ran are kept if a later one fails.
+try:
+    # MNIST MLP
+    model = mnist_mlp_benchmark.MnistMlpBenchmark()
+    model.run_benchmark(gpus=config['gpus'])
+    backend.insert([_get_result(model)])
 
-# LSTM
-model = lstm_benchmark.LstmBenchmark()
-model.run_benchmark(gpus=config['gpus'])
-_upload_metrics(model)
+    # CIFAR10 CNN
+    model = cifar10_cnn_benchmark.Cifar10CnnBenchmark()
+    model.run_benchmark(gpus=config['gpus'])
+    backend.insert([_get_result(model)])
+
+    # LSTM
+    model = lstm_benchmark.LstmBenchmark()
+    model.run_benchmark(gpus=config['gpus'])
+    backend.insert([_get_result(model)])
+finally:
+    backend.close()
@@ -40,6 +40,7 @@ from tensorflow.python.ops import control_flow_ops
 import benchmark_cnn
 import cnn_util
 import flags
+import step_stats
 from cnn_util import log_fn
 
 
@@ -197,12 +198,13 @@ def run_graph(benchmark_op, bench_cnn, init_ops, dummy_loss_op):
   with tf.Session(config=config) as sess:
     for op in init_ops:
       sess.run(op)
-    step_train_times = []
+    step_time_stats = step_stats.StepTimeStats()
     fetches = {'average_loss': dummy_loss_op, 'benchmark_op': benchmark_op}
     log_fn('Running warmup')
     for i in range(-bench_cnn.num_warmup_batches, bench_cnn.num_batches):
       if i == 0:
         log_fn('Running all-reduce ops')
+        step_time_stats.reset()
         start = time.time()
       if i > 0 and i % bench_cnn.params.display_every == 0:
         log_fn('Iteration: %d. Average time per step so far: %s' %
@@ -216,7 +218,7 @@ def run_graph(benchmark_op, bench_cnn, init_ops, dummy_loss_op):
           # The batch size is only used for the images/sec calculation, which is
           # not actually calculated because we pass show_images_per_sec=False.
           batch_size=None,
-          step_train_times=step_train_times,
+          step_time_stats=step_time_stats,
           trace_filename=bench_cnn.trace_filename,
           partitioned_graph_file_prefix=(
               bench_cnn.params.partitioned_graph_file_prefix),
@@ -226,6 +228,7 @@ def run_graph(benchmark_op, bench_cnn, init_ops, dummy_loss_op):
           show_images_per_sec=False)
     log_fn('Average time per step: %s' %
            ((time.time() - start) / bench_cnn.num_batches))
+    log_fn(benchmark_cnn.get_step_time_percentiles_str(step_time_stats))
 
 
 def run_benchmark(bench_cnn, num_iters):
@@ -28,7 +28,6 @@ import math
 import multiprocessing
 import os
 import re
-import threading
 import time
 import traceback
 
@@ -39,13 +38,22 @@ import six
 from six.moves import xrange  # pylint: disable=redefined-builtin
 import tensorflow as tf
 
+import benchmark_history
 import cnn_util
 import constants
 import datasets
 import flags
+import graph_cache
+import host_stats
+import input_benchmark
+import metrics_log
 import mlperf
+import startup_profile
+import step_stats
+import tower_function
 import variable_mgr
 import variable_mgr_util
+import variable_snapshot
 from cnn_util import log_fn
 from models import model_config
 from platforms import util as platforms_util
@@ -64,6 +72,11 @@ from tensorflow.python.util import nest
 
 
 _DEFAULT_NUM_BATCHES = 100
+_DEFAULT_MAX_AUTO_WARMUP_BATCHES = 1000
+# With --warmup_mode=auto in distributed mode, how many warmup steps the workers
+# other than the chief run between reads of the number of warmup steps chosen
+# by the chief. Each read is a round trip to a parameter server.
+_WARMUP_END_STEP_POLL_STEPS = 10
 
 
 # GraphInfo encapsulates the tensors/ops that we care about after building a
@@ -165,6 +178,16 @@ flags.DEFINE_integer('eval_batch_size', 0, 'eval batch size per compute device')
 flags.DEFINE_integer('batch_group_size', 1,
                      'number of groups of batches processed in the image '
                      'producer.')
+flags.DEFINE_integer('steps_per_run', 1,
+                     'Number of training steps to run in each Session.run() '
+                     'call. If greater than 1, the model is built inside a '
+                     'tf.while_loop, which amortizes the per-call session and '
+                     'Python overhead over multiple steps. Step times and '
+                     'images/sec are then measured per call. The loss and '
+                     'accuracies are those of the last step of each call. '
+                     'Currently only supported when training on synthetic data '
+                     'with a single worker and --variable_update of '
+                     'parameter_server or independent.', lower_bound=1)
 flags.DEFINE_integer('num_batches', None, 'number of batches to run, excluding '
                      'warmup. Defaults to %d' % _DEFAULT_NUM_BATCHES)
 flags.DEFINE_integer('num_eval_batches', None,
@@ -185,7 +208,25 @@ flags.DEFINE_boolean('collect_eval_results_async', False,
                      'results asynchronously. This currently only works with '
                      'the SSD model.')
 flags.DEFINE_integer('num_warmup_batches', None,
-                     'number of batches to run before timing')
+                     'number of batches to run before timing. With '
+                     '--warmup_mode=auto, the maximum number of batches to '
+                     'run before timing. Defaults to %d with '
+                     '--warmup_mode=auto.' % _DEFAULT_MAX_AUTO_WARMUP_BATCHES)
+flags.DEFINE_enum('warmup_mode', 'fixed', ('fixed', 'auto'),
+                  'fixed: run --num_warmup_batches warmup batches. auto: end '
+                  'warmup once the step times are steady, meaning the '
+                  'coefficient of variation of the last --auto_warmup_window '
+                  'step times is below --auto_warmup_cv_threshold. The number '
+                  'of warmup batches that were run is reported in the final '
+                  'statistics.')
+flags.DEFINE_integer('auto_warmup_window', 20,
+                     'With --warmup_mode=auto, the number of most recent step '
+                     'times over which the coefficient of variation is '
+                     'computed.', lower_bound=2)
+flags.DEFINE_float('auto_warmup_cv_threshold', 0.05,
+                   'With --warmup_mode=auto, warmup ends once the coefficient '
+                   'of variation of the step times is below this value.',
+                   lower_bound=0.)
 flags.DEFINE_integer('autotune_threshold', None,
                      'The autotune threshold for the models')
 flags.DEFINE_integer('num_gpus', 1, 'the number of GPUs to run on')
@@ -193,6 +234,26 @@ flags.DEFINE_string('gpu_indices', '', 'indices of worker GPUs in ring order')
 flags.DEFINE_integer('display_every', 10,
                      'Number of local steps after which progress is printed '
                      'out')
+flags.DEFINE_float('step_anomaly_mad_threshold', None,
+                   'If set, training loop iterations that take longer than '
+                   'the median of the last --step_anomaly_window iterations by '
+                   'more than this many times their median absolute deviation '
+                   'are logged, and the time they lost is attributed to the '
+                   'checkpoints, summaries, evaluations and input waits that '
+                   'happened in them. An attribution table is printed at the '
+                   'end of training.', lower_bound=0.)
+flags.DEFINE_integer('step_anomaly_window', 100,
+                     'Number of recent iterations used to compute the median '
+                     'and median absolute deviation for '
+                     '--step_anomaly_mad_threshold.', lower_bound=10)
+flags.DEFINE_boolean('fetch_loss_every_step', True,
+                     'If False, the loss and training accuracies are only '
+                     'computed and fetched on steps that print them (see '
+                     '--display_every), steps that write summaries, and the '
+                     'last step. Other steps only run the train op, which '
+                     'avoids copying the loss to the host and, with multiple '
+                     'towers, reducing the loss across devices on every step. '
+                     'Only supported when training.')
 flags.DEFINE_string('data_dir', None,
                     'Path to dataset in TFRecord format (aka Example '
                     'protobufs). If not specified, synthetic data will be '
@@ -277,6 +338,13 @@ flags.DEFINE_integer('num_inter_threads', 0,
                      'set to 0, the system will pick an appropriate number.')
 flags.DEFINE_string('trace_file', '',
                     'Enable TensorFlow tracing and write trace to this file.')
+flags.DEFINE_string('metrics_log_file', None,
+                    'If specified, write a JSON record for every training '
+                    'step to this file, one per line. Each record contains '
+                    'the local step, wall time, step time, session run time, '
+                    'loss, examples/sec and global step. Records are written '
+                    'by a background thread, so this does not slow down '
+                    'training.')
 flags.DEFINE_boolean('use_chrome_trace_format', True,
                      'If True, the trace_file, if specified, will be in a '
                      'Chrome trace format. If False, then it will be a '
@@ -366,8 +434,88 @@ flags.DEFINE_string('debugger', None,
                     'the local CLI debugger. Otherwise, this must be in the '
                     'form hostname:port (e.g., localhost:7007) in which case '
                     'the experimental TensorBoard debugger will be used')
+flags.DEFINE_float('host_stats_interval_secs', None,
+                   'If set, the CPU utilization, resident set size, number of '
+                   'threads and context switches of this process are sampled '
+                   'from /proc at this interval, in seconds, while the '
+                   'benchmark runs. Their mean and maximum are added to the '
+                   'final statistics. Only supported on Linux.',
+                   lower_bound=0.)
+flags.DEFINE_boolean('startup_profile', False,
+                     'If True, log how long each phase of the startup, from '
+                     'importing TensorFlow to the end of the first step, '
+                     'takes, along with the number of ops and the size of the '
+                     'GraphDef after each phase. The startup time is always '
+                     'added to the final statistics.')
+flags.DEFINE_string('graph_cache_dir', None,
+                    'If set, the training graph is stored in this local '
+                    'directory, keyed by a hash of the params that affect the '
+                    'graph and the model name. Later runs with the same '
+                    'graph-affecting params import the stored graph instead '
+                    'of building it, so runs that only differ in params like '
+                    '--num_batches or --display_every build the graph once. '
+                    'Only supported when training or running forward only, '
+                    'in non-distributed mode.')
+flags.DEFINE_integer('graph_cache_max_size_mb', 1024,
+                     'The maximum total size of --graph_cache_dir, in MB. When '
+                     'it is exceeded, the least recently used graphs are '
+                     'removed.', lower_bound=0)
+flags.DEFINE_list('measurement_phases', [],
+                  'If set, the benchmark runs several measurement phases one '
+                  'after the other in the same session, and reports the '
+                  'stats of each one under "measurement_phases". Each phase is '
+                  'a colon-separated list of name=value pairs, where names '
+                  'are num_batches, num_warmup_batches or display_every. '
+                  'Values that are not given default to the flags of the '
+                  'same name, except num_warmup_batches, which defaults to 0 '
+                  'after the first phase since the session is already warm. '
+                  'For example: --measurement_phases=num_batches=100,'
+                  'num_batches=500:display_every=100. Only supported when '
+                  'training or running forward only, in non-distributed '
+                  'mode.')
+flags.DEFINE_boolean('tower_function', False,
+                     'If True, when training, the forward and backward pass of '
+                     'a tower is defined once as a function, which the towers '
+                     'other than the first and the last one call, instead of '
+                     'rebuilding the network on every device. This reduces '
+                     'graph construction time and GraphDef size with many '
+                     'devices; compare them with --startup_profile. Only '
+                     'supported with --variable_update=parameter_server, '
+                     'replicated or independent, without --xla_compile, '
+                     '--staged_vars or --steps_per_run > 1.')
+flags.DEFINE_string('variable_snapshot_dir', None,
+                    'If set, the initial values of the variables of every '
+                    'tower are saved in this local directory, keyed by the '
+                    'model, --tf_random_seed and the names and shapes of the '
+                    'variables. Later runs of the same model restore them in '
+                    'parallel instead of running the variable initializers '
+                    'and copying the variables of the first tower to the '
+                    'other towers. The time saved shows up in the '
+                    'create_session and post_init_ops phases of '
+                    '--startup_profile. Not used when --train_dir contains a '
+                    'checkpoint. Only supported when training or running '
+                    'forward only, in non-distributed mode, without '
+                    '--graph_cache_dir or --freeze_when_forward_only.')
+flags.DEFINE_boolean('input_pipeline_only', False,
+                     'If True, only the input pipeline is built, and its '
+                     'batches are read on the host as fast as possible, '
+                     'without running the model or copying them to the '
+                     'devices. Reports the examples/sec of the whole '
+                     'pipeline and of each of its stages, such as read, '
+                     'parse, decode and augment, and how full its prefetch '
+                     'buffers or queues were. Use this to check whether the '
+                     'input pipeline can keep up with the model. Only '
+                     'supported with real data, when training or running '
+                     'forward only, in non-distributed mode.')
 flags.DEFINE_boolean('use_python32_barrier', False,
                      'When on, use threading.Barrier at Python 3.2.')
+flags.DEFINE_boolean('use_session_callable', True,
+                     'If True, steps that are not traced, profiled or writing '
+                     'summaries run the training fetches through a callable '
+                     'created once with Session.make_callable(), instead of '
+                     'calling Session.run(), to reduce the per-step host '
+                     'overhead. The host overhead of each mode is reported in '
+                     'the step phase breakdown at the end of training.')
 
 flags.DEFINE_boolean('ml_perf', False,
                      'When True, change how the Imagenet input pipeline works '
@@ -440,6 +588,14 @@ flags.DEFINE_boolean('fuse_decode_and_crop', True,
                      'Fuse decode_and_crop for image preprocessing.')
 flags.DEFINE_boolean('distort_color_in_yiq', True,
                      'Distort color of input images in YIQ space.')
+flags.DEFINE_boolean('batch_color_distortion', False,
+                     'If True, with --distortions, the color of ImageNet '
+                     'training images is distorted a whole batch at a time '
+                     'after batching, with a single 3x3 color matrix and '
+                     'offset per image, instead of with separate brightness, '
+                     'saturation, hue and contrast ops for every image. This '
+                     'reduces the CPU cost of each image. Requires '
+                     '--distort_color_in_yiq.')
 flags.DEFINE_boolean('enable_optimizations', True,
                      'Whether to enable grappler and other optimizations.')
 flags.DEFINE_string('rewriter_config', None,
@@ -644,6 +800,12 @@ flags.DEFINE_string('benchmark_log_dir', None,
                     'results of benchmark. The logs are created by '
                     'BenchmarkFileLogger. Requires the root of the Tensorflow '
                     'models repository to be in $PYTHTONPATH.')
+flags.DEFINE_string('benchmark_history_db', None,
+                    'SQLite database to record the results of the benchmark '
+                    'to, in the same schema as keras_benchmarks. Unlike '
+                    '--benchmark_log_dir, this does not require the '
+                    'Tensorflow models repository. Cannot be used with '
+                    '--benchmark_log_dir.')
 flags.DEFINE_string('benchmark_test_id', None,
                     'The unique test ID of the benchmark run. It could be the '
                     'combination of key parameters. It is hardware independent '
@@ -655,16 +817,22 @@ flags.DEFINE_string('benchmark_test_id', None,
 platforms_util.define_platform_params()
 
 
-class GlobalStepWatcher(threading.Thread):
+class GlobalStepWatcher(object):
   """A helper class for global_step.
 
-  Polls for changes in the global_step of the model, and finishes when the
-  number of steps for the global run are done.
+  Tracks the global_step of the model, and finishes when the number of steps
+  for the global run are done.
+
+  The global_step is shared by all workers, so it already aggregates the steps
+  run by every worker. Each local step increments it with assign_add(), which
+  returns its new value, and that value is passed to step_done(). So tracking
+  the global_step does not require any extra round trips to the parameter
+  servers, and the start and finish of the global run are timed at the end of
+  the local step that observed them, rather than up to a polling interval late.
   """
 
   def __init__(self, sess, global_step_op, start_at_global_step,
                end_at_global_step):
-    threading.Thread.__init__(self)
     self.sess = sess
     self.global_step_op = global_step_op
     self.start_at_global_step = start_at_global_step
@@ -675,23 +843,38 @@ class GlobalStepWatcher(threading.Thread):
     self.finish_time = 0
     self.finish_step = 0
 
-  def run(self):
-    while self.finish_time == 0:
+  def step_done(self, global_step_val, step_end_time=None):
+    """Records that the global_step was `global_step_val` at `step_end_time`.
+
+    Args:
+      global_step_val: The value of the global_step after a local step.
+      step_end_time: The time at which the local step finished. Defaults to
+        the current time.
+    """
+    if step_end_time is None:
+      step_end_time = time.time()
+    if self.start_time == 0 and global_step_val >= self.start_at_global_step:
+      log_fn('Starting real work at step %s at time %s' %
+             (global_step_val, time.ctime(step_end_time)))
+      self.start_time = step_end_time
+      self.start_step = global_step_val
+    if self.finish_time == 0 and global_step_val >= self.end_at_global_step:
+      log_fn('Finishing real work at step %s at time %s' %
+             (global_step_val, time.ctime(step_end_time)))
+      self.finish_time = step_end_time
+      self.finish_step = global_step_val
+
+  def wait_until_done(self):
+    """Polls the global_step until the global run is done.
+
+    This is only needed once this worker stops running steps before the global
+    run is done, for example when it stops early, since step_done() is no
+    longer called.
+    """
+    while not self.done():
       time.sleep(.25)
       global_step_val, = self.sess.run([self.global_step_op])
-      if self.start_time == 0 and global_step_val >= self.start_at_global_step:
-        # Use tf.logging.info instead of log_fn, since print (which is log_fn)
-        # is not thread safe and may interleave the outputs from two parallel
-        # calls to print, which can break tests.
-        tf.logging.info('Starting real work at step %s at time %s' %
-                        (global_step_val, time.ctime()))
-        self.start_time = time.time()
-        self.start_step = global_step_val
-      if self.finish_time == 0 and global_step_val >= self.end_at_global_step:
-        tf.logging.info('Finishing real work at step %s at time %s' %
-                        (global_step_val, time.ctime()))
-        self.finish_time = time.time()
-        self.finish_step = global_step_val
+      self.step_done(global_step_val)
 
   def done(self):
     return self.finish_time > 0
@@ -703,6 +886,58 @@ class GlobalStepWatcher(threading.Thread):
     return self.finish_time - self.start_time
 
 
+class SteadyStateWarmup(object):
+  """Decides when warmup ends with --warmup_mode=auto.
+
+  Warmup ends once a step_stats.SteadyStateDetector reports the step times are
+  steady, or once `max_warmup_steps` steps have been run. Warmup only ends after
+  a number of steps for which `is_valid_num_warmup_steps` returns True.
+
+  In distributed mode with cross-replica sync, every worker must run the same
+  number of warmup steps, or the workers running extra steps block forever.
+  Only the chief decides when warmup ends. It writes the number of warmup steps
+  to `warmup_end_step`, a variable shared by all workers, which every other
+  worker reads once every `poll_steps` warmup steps. The steps of the workers
+  are synchronized, so no worker can finish the step after the chief's current
+  step before the chief has written the variable. The chief therefore picks a
+  number of warmup steps at least `poll_steps + 1` steps ahead of its own, so
+  every worker reads the variable before reaching that step.
+  """
+
+  def __init__(self, sess, params, max_warmup_steps, is_valid_num_warmup_steps,
+               is_chief=True, warmup_end_step=None,
+               poll_steps=_WARMUP_END_STEP_POLL_STEPS):
+    self.sess = sess
+    self.max_warmup_steps = max_warmup_steps
+    self.is_valid_num_warmup_steps = is_valid_num_warmup_steps
+    self.is_chief = is_chief
+    self.warmup_end_step = warmup_end_step
+    self.poll_steps = poll_steps
+    self.detector = step_stats.SteadyStateDetector(
+        params.auto_warmup_window, params.auto_warmup_cv_threshold)
+    self.num_warmup_steps = None
+
+  def step_done(self, num_steps_run, step_time):
+    """Returns True if warmup should end after `num_steps_run` steps."""
+    if self.num_warmup_steps is None:
+      if self.is_chief:
+        if self.detector.add(step_time):
+          num_warmup_steps = num_steps_run
+          if self.warmup_end_step is not None:
+            num_warmup_steps += self.poll_steps + 1
+          while not self.is_valid_num_warmup_steps(num_warmup_steps):
+            num_warmup_steps += 1
+          if num_warmup_steps < self.max_warmup_steps:
+            self.num_warmup_steps = num_warmup_steps
+            if self.warmup_end_step is not None:
+              self.warmup_end_step.load(num_warmup_steps, self.sess)
+      elif num_steps_run % self.poll_steps == 0:
+        num_warmup_steps, = self.sess.run([self.warmup_end_step])
+        if num_warmup_steps > 0:
+          self.num_warmup_steps = num_warmup_steps
+    return num_steps_run == self.num_warmup_steps
+
+
 class CheckpointNotFoundException(Exception):
   pass
 
@@ -801,12 +1036,24 @@ def get_mode_from_params(params):
 # How many digits to show for the loss and accuracies during training.
 LOSS_AND_ACCURACY_DIGITS_TO_SHOW = 3
 
+# The fetches that train the model. With --nofetch_loss_every_step, the other
+# fetches, such as the loss and accuracies, are only fetched on some steps.
+_TRAIN_FETCH_NAMES = ('train_op', 'enqueue_ops', 'inc_global_step',
+                      'sync_queues')
+
+
+def is_display_step(step, display_every, steps_per_run=1):
+  """Returns True if the run starting at local step `step` is displayed."""
+  last_step = step + steps_per_run - 1
+  return step >= 0 and (
+      step == 0 or (last_step + 1) // display_every > step // display_every)
+
 
 def benchmark_one_step(sess,
                        fetches,
                        step,
                        batch_size,
-                       step_train_times,
+                       step_time_stats,
                        trace_filename,
                        partitioned_graph_file_prefix,
                        profiler,
@@ -815,18 +1062,46 @@ def benchmark_one_step(sess,
                        summary_op=None,
                        show_images_per_sec=True,
                        benchmark_logger=None,
-                       collective_graph_key=0):
-  """Advance one step of benchmarking."""
+                       collective_graph_key=0,
+                       metrics_writer=None,
+                       phase_time_stats=None,
+                       steps_per_run=1,
+                       fetches_callable=None,
+                       global_step_watcher=None):
+  """Advance one step of benchmarking.
+
+  The time taken by the step is added to `step_time_stats`, a
+  step_stats.StepTimeStats. If `phase_time_stats`, a step_stats.PhaseTimeStats,
+  is not None, the time spent in Session.run() and waiting for `image_producer`
+  is added to it. If `metrics_writer`, a metrics_log.StepMetricsWriter, is not
+  None, a record describing the step is written to it.
+
+  If `fetches_callable` is not None, it must be a callable created with
+  Session.make_callable(fetches). It is used instead of Session.run() if the
+  step does not need RunOptions, RunMetadata or a summary, since it avoids
+  processing the fetches on every step.
+
+  If `global_step_watcher` is not None, the value of the global step after the
+  step, fetched as `inc_global_step`, is passed to it.
+
+  If `steps_per_run` is greater than 1, `fetches` runs that many steps, from
+  `step` up to and including `step + steps_per_run - 1`, and `batch_size` is
+  the number of examples processed by all of them.
+  """
+  last_step = step + steps_per_run - 1
+  # Trace the step before the last warm up step, or the Session.run() call that
+  # runs it.
+  should_trace = step <= -2 <= last_step
   should_profile = profiler and 0 <= step < _NUM_STEPS_TO_PROFILE
   need_options_and_metadata = (
       should_profile or collective_graph_key > 0 or
-      ((trace_filename or partitioned_graph_file_prefix) and step == -2)
+      ((trace_filename or partitioned_graph_file_prefix) and should_trace)
   )
   if need_options_and_metadata:
     run_options = tf.RunOptions()
-    if (trace_filename and step == -2) or should_profile:
+    if (trace_filename and should_trace) or should_profile:
       run_options.trace_level = tf.RunOptions.FULL_TRACE
-    if partitioned_graph_file_prefix and step == -2:
+    if partitioned_graph_file_prefix and should_trace:
       run_options.output_partition_graphs = True
     if collective_graph_key > 0:
       run_options.experimental.collective_graph_key = collective_graph_key
@@ -836,26 +1111,62 @@ def benchmark_one_step(sess,
     run_metadata = None
   summary_str = None
   start_time = time.time()
-  if summary_op is None:
+  if (fetches_callable and summary_op is None and
+      not need_options_and_metadata):
+    results = fetches_callable()
+  elif summary_op is None:
     results = sess.run(fetches, options=run_options, run_metadata=run_metadata)
   else:
     (results, summary_str) = sess.run(
         [fetches, summary_op], options=run_options, run_metadata=run_metadata)
+  sess_run_time = time.time() - start_time
 
   if not params.forward_only:
-    lossval = results['average_loss']
+    # None if `fetches` does not include the loss.
+    lossval = results.get('average_loss')
   else:
     lossval = 0.
+  input_wait_start_time = time.time()
   if image_producer is not None:
     image_producer.notify_image_consumption()
-  train_time = time.time() - start_time
-  step_train_times.append(train_time)
-  if (show_images_per_sec and step >= 0 and
-      (step == 0 or (step + 1) % params.display_every == 0)):
+  end_time = time.time()
+  input_wait_time = end_time - input_wait_start_time
+  train_time = end_time - start_time
+  step_time_stats.add(train_time)
+  if global_step_watcher:
+    global_step_watcher.step_done(results['inc_global_step'], end_time)
+  iterator_wait_time = None
+  if run_metadata is not None and run_metadata.HasField('step_stats'):
+    iterator_wait_time = get_iterator_wait_time(run_metadata.step_stats)
+  if phase_time_stats:
+    phase_time_stats.add(step_stats.PHASE_SESS_RUN, sess_run_time)
+    phase_time_stats.add(step_stats.PHASE_INPUT_WAIT, input_wait_time)
+    if iterator_wait_time is not None:
+      phase_time_stats.add(step_stats.PHASE_ITERATOR_WAIT, iterator_wait_time)
+  if metrics_writer:
+    record = {
+        'step': step,
+        'wall_time': end_time,
+        'step_time': train_time,
+        'sess_run_time': sess_run_time,
+        'input_wait_time': input_wait_time,
+        'loss': lossval,
+        'global_step': results.get('inc_global_step'),
+    }
+    if iterator_wait_time is not None:
+      record['iterator_wait_time'] = iterator_wait_time
+    if batch_size:
+      record['examples_per_sec'] = batch_size / max(train_time, 1e-9)
+    if 'top_1_accuracy' in results:
+      record['top_1_accuracy'] = results['top_1_accuracy']
+      record['top_5_accuracy'] = results['top_5_accuracy']
+    metrics_writer.write(record)
+  if show_images_per_sec and is_display_step(step, params.display_every,
+                                             steps_per_run):
     speed_mean, speed_uncertainty, speed_jitter = get_perf_timing(
-        batch_size, step_train_times)
+        batch_size, step_time_stats)
     log_str = '%i\t%s\t%.*f' % (
-        step + 1,
+        last_step + 1,
         get_perf_timing_str(speed_mean, speed_uncertainty, speed_jitter),
         LOSS_AND_ACCURACY_DIGITS_TO_SHOW, lossval)
     if 'top_1_accuracy' in results:
@@ -865,16 +1176,18 @@ def benchmark_one_step(sess,
     log_fn(log_str)
     if benchmark_logger:
       benchmark_logger.log_metric(
-          'current_examples_per_sec', speed_mean, global_step=step + 1)
+          'current_examples_per_sec', speed_mean, global_step=last_step + 1)
       if 'top_1_accuracy' in results:
         benchmark_logger.log_metric(
-            'top_1_accuracy', results['top_1_accuracy'], global_step=step + 1)
+            'top_1_accuracy', results['top_1_accuracy'],
+            global_step=last_step + 1)
         benchmark_logger.log_metric(
-            'top_5_accuracy', results['top_5_accuracy'], global_step=step + 1)
+            'top_5_accuracy', results['top_5_accuracy'],
+            global_step=last_step + 1)
   if need_options_and_metadata:
     if should_profile:
       profiler.add_step(step, run_metadata)
-    if trace_filename and step == -2:
+    if trace_filename and should_trace:
       log_fn('Dumping trace to %s' % trace_filename)
       trace_dir = os.path.dirname(trace_filename)
       if not gfile.Exists(trace_dir):
@@ -885,7 +1198,7 @@ def benchmark_one_step(sess,
           trace_file.write(trace.generate_chrome_trace_format(show_memory=True))
         else:
           trace_file.write(str(run_metadata.step_stats))
-    if partitioned_graph_file_prefix and step == -2:
+    if partitioned_graph_file_prefix and should_trace:
       path, filename = os.path.split(partitioned_graph_file_prefix)
       if '.' in filename:
         base_filename, ext = filename.rsplit('.', 1)
@@ -903,6 +1216,64 @@ def benchmark_one_step(sess,
   return (summary_str, lossval)
 
 
+def get_iterator_wait_time(run_step_stats):
+  """Returns the seconds spent in input iterator get_next ops in a trace.
+
+  Args:
+    run_step_stats: The StepStats proto of a traced Session.run() call.
+
+  Returns:
+    The total duration of the IteratorGetNext ops in `run_step_stats`. With
+    datasets_use_prefetch, this is how long the model waited for the input
+    pipeline, since the ops return as soon as a prefetched batch is available.
+  """
+  iterator_wait_micros = 0
+  for dev_stats in run_step_stats.dev_stats:
+    for node_stats in dev_stats.node_stats:
+      if node_stats.node_name.split(':')[0].endswith('IteratorGetNext'):
+        iterator_wait_micros += node_stats.all_end_rel_micros
+  return iterator_wait_micros / 1e6
+
+
+def get_phase_times_str(phase_time_stats):
+  mean_times = phase_time_stats.mean_times()
+  return 'step phases (ms): %s' % ', '.join(
+      '%s %.2f' % (phase, 1000 * mean_times[phase])
+      for phase in sorted(mean_times))
+
+
+def get_phase_times(phase_time_stats):
+  """Returns a dict from 'phase_time_<phase>' to its mean time, in seconds."""
+  return {'phase_time_%s' % phase: t
+          for phase, t in six.iteritems(phase_time_stats.mean_times())}
+
+
+def get_step_anomaly_strs(anomaly_tracker):
+  """Returns lines describing the time lost by anomalous iterations."""
+  strs = ['%d of %d iterations were anomalous, losing %.2f sec (%.1f%% of the '
+          'training loop time)' %
+          (anomaly_tracker.num_anomalies, anomaly_tracker.num_iterations,
+           anomaly_tracker.lost_time,
+           100. * anomaly_tracker.lost_time /
+           max(anomaly_tracker.total_time, 1e-9))]
+  fractions = anomaly_tracker.lost_time_fractions()
+  for activity in sorted(fractions, key=fractions.get, reverse=True):
+    strs.append('  %.1f%% of lost time attributable to %s' %
+                (100. * fractions[activity], activity))
+  return strs
+
+
+def get_step_anomaly_stats(anomaly_tracker):
+  stats = {
+      'num_anomalous_iterations': anomaly_tracker.num_anomalies,
+      'anomalous_lost_time': anomaly_tracker.lost_time,
+  }
+  for activity, fraction in six.iteritems(
+      anomaly_tracker.lost_time_fractions()):
+    stats['lost_time_fraction_%s' % activity] = fraction
+  return stats
+
+
 def get_perf_timing_str(speed_mean, speed_uncertainty, speed_jitter, scale=1):
   if scale == 1:
     # TODO(laigd): rename 'images' to maybe 'inputs', same below.
@@ -912,13 +1283,23 @@ def get_perf_timing_str(speed_mean, speed_uncertainty, speed_jitter, scale=1):
     return 'images/sec: %.1f' % speed_mean
 
 
-def get_perf_timing(batch_size, step_train_times, scale=1):
-  times = np.array(step_train_times)
-  speeds = batch_size / times
-  speed_mean = scale * batch_size / np.mean(times)
-  speed_uncertainty = np.std(speeds) / np.sqrt(float(len(speeds)))
-  speed_jitter = 1.4826 * np.median(np.abs(speeds - np.median(speeds)))
-  return speed_mean, speed_uncertainty, speed_jitter
+def get_perf_timing(batch_size, step_time_stats, scale=1):
+  return step_time_stats.get_perf_timing(batch_size, scale)
+
+
+def get_step_time_percentiles_str(step_time_stats):
+  percentiles = step_time_stats.percentiles(step_stats.STEP_TIME_PERCENTILES)
+  return 'step time (ms): mean %.2f, %s' % (
+      1000 * step_time_stats.mean(),
+      ', '.join('p%d %.2f' % (p, 1000 * t) for p, t in
+                zip(step_stats.STEP_TIME_PERCENTILES, percentiles)))
+
+
+def get_step_time_percentiles(step_time_stats):
+  """Returns a dict from 'step_time_p<N>' to that percentile, in seconds."""
+  percentiles = step_time_stats.percentiles(step_stats.STEP_TIME_PERCENTILES)
+  return {'step_time_p%d' % p: t
+          for p, t in zip(step_stats.STEP_TIME_PERCENTILES, percentiles)}
 
 
 def load_checkpoint(saver, sess, ckpt_dir):
@@ -1053,6 +1434,72 @@ def remove_param_fields(params, fields_to_remove):
   return new_params_type(**params_dict)
 
 
+# A measurement phase of --measurement_phases. See parse_measurement_phases().
+MeasurementPhase = namedtuple(  # pylint: disable=invalid-name
+    'MeasurementPhase',
+    ['num_batches', 'num_warmup_batches', 'display_every'])
+
+
+def parse_measurement_phases(phase_strs, num_batches, num_warmup_batches,
+                             display_every):
+  """Parses the value of --measurement_phases.
+
+  Args:
+    phase_strs: A list of phases, each of which is a colon-separated list of
+      name=value pairs, where names are fields of MeasurementPhase.
+    num_batches: The number of batches of phases that do not specify it.
+    num_warmup_batches: The number of warm up batches of the first phase, if it
+      does not specify it. Other phases default to no warm up.
+    display_every: The display interval of phases that do not specify it.
+
+  Returns:
+    A list of MeasurementPhase, empty if `phase_strs` is empty.
+
+  Raises:
+    ValueError: If a phase is invalid.
+  """
+  phases = []
+  for phase_num, phase_str in enumerate(phase_strs):
+    values = {
+        'num_batches': num_batches,
+        'num_warmup_batches': num_warmup_batches if phase_num == 0 else 0,
+        'display_every': display_every,
+    }
+    for pair in phase_str.split(':'):
+      name, sep, value = pair.partition('=')
+      if not sep or name not in values:
+        raise ValueError('Invalid measurement phase "%s": expected name=value '
+                         'pairs separated by ":", with names among %s' %
+                         (phase_str, ', '.join(MeasurementPhase._fields)))
+      try:
+        value = int(value)
+      except ValueError:
+        raise ValueError('Invalid value of %s in measurement phase "%s"' %
+                         (name, phase_str))
+      min_value = 0 if name == 'num_warmup_batches' else 1
+      if value < min_value:
+        raise ValueError('%s must be at least %d in measurement phase "%s"' %
+                         (name, min_value, phase_str))
+      values[name] = value
+    phases.append(MeasurementPhase(**values))
+  return phases
+
+
+def get_num_warmup_batches(params):
+  """Returns the number of warm up batches to run before timing.
+
+  With --warmup_mode=auto, this is the maximum number of warm up batches.
+  BenchmarkCNN.benchmark_with_session() sets it to the number of warm up
+  batches that were actually run.
+  """
+  if params.num_warmup_batches is not None:
+    return params.num_warmup_batches
+  if params.warmup_mode == 'auto':
+    return _DEFAULT_MAX_AUTO_WARMUP_BATCHES
+  autotune_threshold = params.autotune_threshold or 1
+  return max(10, 5 * autotune_threshold * autotune_threshold)
+
+
 def get_num_batches_and_epochs(params, batch_size, num_examples_per_epoch):
   """Returns the number of batches and epochs to run for.
 
@@ -1242,7 +1689,7 @@ def generate_tfprof_profile(profiler, tfprof_file):
 class BenchmarkCNN(object):
   """Class for benchmarking a cnn network."""
 
-  def __init__(self, params, dataset=None, model=None):
+  def __init__(self, params, dataset=None, model=None, startup_profiler=None):
     """Initialize BenchmarkCNN.
 
     Args:
@@ -1252,10 +1699,15 @@ class BenchmarkCNN(object):
                obtain the dataset.
       model: If not None, the model to use. Otherwise, params is used to obtain
              the model.
+      startup_profiler: If not None, the startup_profile.StartupProfiler that
+                        already timed the phases before this call. Otherwise,
+                        the startup is timed from this call.
     Raises:
       ValueError: Unsupported params settings.
     """
     mlperf.logger.log(key=mlperf.tags.RUN_START)
+    self.startup_profiler = startup_profiler or startup_profile.StartupProfiler(
+        measure_graphs=params.startup_profile)
     self.params = params
     if params.eval:
       self._doing_eval = True
@@ -1269,12 +1721,7 @@ class BenchmarkCNN(object):
         self.params.model, self.dataset, self.params)
     self.trace_filename = self.params.trace_file
     self.rewriter_config = self.params.rewriter_config
-    autotune_threshold = self.params.autotune_threshold if (
-        self.params.autotune_threshold) else 1
-    min_autotune_warmup = 5 * autotune_threshold * autotune_threshold
-    self.num_warmup_batches = self.params.num_warmup_batches if (
-        self.params.num_warmup_batches is not None) else max(
-            10, min_autotune_warmup)
+    self.num_warmup_batches = get_num_warmup_batches(self.params)
     self.graph_file = self.params.graph_file
     self.resize_method = self.params.resize_method
     self.sync_queue_counter = 0
@@ -1416,6 +1863,8 @@ class BenchmarkCNN(object):
         self.params.use_fp16 and self.params.fp16_enable_auto_loss_scale)
     self.loss_scale = None
     self.loss_scale_normal_steps = None
+    self.variable_snapshot = None
+    self.restore_variable_snapshot = False
 
     self.job_name = self.params.job_name  # "" for local training
 
@@ -1476,6 +1925,16 @@ class BenchmarkCNN(object):
       raise ValueError('--all_reduce_spec=nccl is invalid in a '
                        'multi-worker job')
 
+    if self.params.warmup_mode == 'auto':
+      if self.job_name and not self.params.cross_replica_sync:
+        raise ValueError('--warmup_mode=auto requires --cross_replica_sync in '
+                         'distributed mode')
+      if (self.num_workers > 1 and
+          self.params.variable_update in ('collective_all_reduce', 'horovod')):
+        raise ValueError('--warmup_mode=auto is not supported with '
+                         '--variable_update=%s and multiple workers' %
+                         self.params.variable_update)
+
     # Device to use for ops that need to always run on the local worker's CPU.
     self.cpu_device = '%s/cpu:0' % worker_prefix
 
@@ -1507,6 +1966,119 @@ class BenchmarkCNN(object):
     else:
       self.num_eval_batches, self.num_eval_epochs = None, None
 
+    if not self.params.fetch_loss_every_step and self.mode not in (
+        constants.BenchmarkMode.TRAIN, constants.BenchmarkMode.TRAIN_AND_EVAL):
+      raise ValueError('--nofetch_loss_every_step is only supported when '
+                       'training')
+
+    if self.params.tower_function:
+      if (self.params.variable_update not in ('parameter_server', 'replicated',
+                                              'independent') or
+          self.job_name):
+        raise ValueError('--tower_function is only supported with '
+                         '--variable_update=parameter_server, replicated or '
+                         'independent, in non-distributed mode')
+      if self.params.xla_compile:
+        raise ValueError('--tower_function is not supported with '
+                         '--xla_compile')
+      if self.params.staged_vars:
+        raise ValueError('--tower_function is not supported with '
+                         '--staged_vars')
+      if self.params.steps_per_run > 1:
+        raise ValueError('--tower_function is not supported with '
+                         '--steps_per_run > 1')
+
+    if (self.params.batch_color_distortion and
+        not self.params.distort_color_in_yiq):
+      # Only the hue and saturation changes in YIQ space are linear.
+      raise ValueError('--batch_color_distortion requires '
+                       '--distort_color_in_yiq')
+
+    if self.params.graph_cache_dir:
+      self._check_local_train_or_forward_only('--graph_cache_dir')
+      if self.params.backbone_model_path:
+        raise ValueError('--graph_cache_dir is not supported with '
+                         '--backbone_model_path')
+
+    if self.params.variable_snapshot_dir:
+      self._check_local_train_or_forward_only('--variable_snapshot_dir')
+      if self.params.graph_cache_dir:
+        # Whether the variables are copied to the other towers is part of the
+        # graph, but not of the graph cache key.
+        raise ValueError('--variable_snapshot_dir is not supported with '
+                         '--graph_cache_dir')
+      if self.forward_only_and_freeze:
+        raise ValueError('--variable_snapshot_dir is not supported with '
+                         '--freeze_when_forward_only')
+
+    if self.params.input_pipeline_only:
+      if self.dataset.use_synthetic_gpu_inputs():
+        raise ValueError('--input_pipeline_only requires real data')
+      self._check_local_train_or_forward_only('--input_pipeline_only')
+      if self.params.measurement_phases:
+        raise ValueError('--input_pipeline_only is not supported with '
+                         '--measurement_phases')
+
+    if self.params.steps_per_run > 1:
+      steps_per_run = self.params.steps_per_run
+      if self.mode != constants.BenchmarkMode.TRAIN:
+        raise ValueError('--steps_per_run > 1 is only supported when training '
+                         'without evaluation')
+      if not self.dataset.use_synthetic_gpu_inputs():
+        raise ValueError('--steps_per_run > 1 is only supported with synthetic '
+                         'data')
+      if self.job_name or self.num_workers > 1:
+        raise ValueError('--steps_per_run > 1 is not supported in distributed '
+                         'mode')
+      if self.params.variable_update not in ('parameter_server',
+                                             'independent'):
+        raise ValueError('--steps_per_run > 1 is not supported with '
+                         '--variable_update=%s' % self.params.variable_update)
+      if self.params.staged_vars:
+        raise ValueError('--steps_per_run > 1 is not supported with '
+                         '--staged_vars')
+      if self.params.summary_verbosity:
+        raise ValueError('--steps_per_run > 1 is not supported with '
+                         '--summary_verbosity, as summaries cannot be computed '
+                         'inside a tf.while_loop')
+      if self.params.warmup_mode == 'auto':
+        raise ValueError('--steps_per_run > 1 is not supported with '
+                         '--warmup_mode=auto')
+      if (self.params.save_model_steps and
+          self.params.save_model_steps % steps_per_run):
+        raise ValueError('--save_model_steps must be a multiple of '
+                         '--steps_per_run')
+      # Each Session.run() call runs steps_per_run steps, so round up the number
+      # of steps to a multiple of it.
+      rounded_num_batches = (-(-self.num_batches // steps_per_run)
+                             * steps_per_run)
+      rounded_num_warmup_batches = (-(-self.num_warmup_batches // steps_per_run)
+                                    * steps_per_run)
+      if (rounded_num_batches != self.num_batches or
+          rounded_num_warmup_batches != self.num_warmup_batches):
+        log_fn('Round up the number of batches to %d and the number of warm up '
+               'batches to %d to match steps_per_run' %
+               (rounded_num_batches, rounded_num_warmup_batches))
+      self.num_batches = rounded_num_batches
+      self.num_warmup_batches = rounded_num_warmup_batches
+
+    self.measurement_phases = parse_measurement_phases(
+        self.params.measurement_phases, self.num_batches,
+        self.num_warmup_batches, self.params.display_every)
+    if self.measurement_phases:
+      self._check_local_train_or_forward_only('--measurement_phases')
+      if self.params.steps_per_run > 1:
+        raise ValueError('--measurement_phases is not supported with '
+                         '--steps_per_run > 1')
+      if self.params.warmup_mode == 'auto':
+        raise ValueError('--measurement_phases is not supported with '
+                         '--warmup_mode=auto')
+      first_phase = self.measurement_phases[0]
+      self.num_batches = first_phase.num_batches
+      self.num_warmup_batches = first_phase.num_warmup_batches
+      self.params = self.params._replace(
+          display_every=first_phase.display_every)
+
     num_train_examples_per_epoch = self.dataset.num_examples_per_epoch('train')
     if self.params.eval_during_training_every_n_epochs:
       n_epochs = self.params.eval_during_training_every_n_epochs
@@ -1640,6 +2212,7 @@ class BenchmarkCNN(object):
       # TODO(b/116627045): We should also remove fields that have an eval
       # equivalent, like num_batches and num_eval_batches.
       self.params = remove_param_fields(self.params, {'eval'})
+    self.startup_profiler.mark('init')
 
   @contextlib.contextmanager
   def _do_eval(self):
@@ -1676,7 +2249,14 @@ class BenchmarkCNN(object):
   def _config_benchmark_logger(self):
     """Config the model garden benchmark logger."""
     model_benchmark_logger = None
-    if self.params.benchmark_log_dir is not None:
+    if self.params.benchmark_history_db is not None:
+      if self.params.benchmark_log_dir is not None:
+        raise ValueError('--benchmark_history_db and --benchmark_log_dir '
+                         'cannot both be specified')
+      model_benchmark_logger = benchmark_history.SQLiteBenchmarkLogger(
+          self.params.benchmark_history_db, device=self.params.device,
+          num_epochs=self.params.num_epochs)
+    elif self.params.benchmark_log_dir is not None:
       try:
         from official.utils.logs import logger as models_logger  # pylint: disable=g-import-not-at-top
       except ImportError:
@@ -1801,6 +2381,23 @@ class BenchmarkCNN(object):
           self.model.get_model_name(), benchmark_info['dataset_name'],
           run_param, test_id=self.params.benchmark_test_id)
 
+  def _check_local_train_or_forward_only(self, flag_str):
+    """Raises a ValueError unless training or running forward only locally.
+
+    Args:
+      flag_str: The flag that requires it, such as '--graph_cache_dir'.
+
+    Raises:
+      ValueError: If evaluating, or in distributed mode.
+    """
+    if self.mode not in (constants.BenchmarkMode.TRAIN,
+                         constants.BenchmarkMode.FORWARD_ONLY):
+      raise ValueError('%s is only supported when training without evaluation '
+                       'or running forward only' % flag_str)
+    if (self.job_name or self.params.variable_update in (
+        'horovod', 'distributed_all_reduce', 'collective_all_reduce')):
+      raise ValueError('%s is not supported in distributed mode' % flag_str)
+
   def run(self):
     """Run the benchmark task assigned to this process.
 
@@ -1825,12 +2422,39 @@ class BenchmarkCNN(object):
         raise ValueError('unrecognized job name: %s' % self.params.job_name)
 
     self._log_benchmark_run()
-    if self._doing_eval:
-      with tf.Graph().as_default():
-        # TODO(laigd): freeze the graph in eval mode.
-        return self._run_eval()
-    else:
-      return self._benchmark_train()
+    host_resource_sampler = None
+    if self.params.host_stats_interval_secs:
+      host_resource_sampler = host_stats.HostResourceSampler(
+          self.params.host_stats_interval_secs)
+      host_resource_sampler.start()
+    stats = None
+    try:
+      if self._doing_eval:
+        with tf.Graph().as_default():
+          # TODO(laigd): freeze the graph in eval mode.
+          stats = self._run_eval()
+      elif self.params.input_pipeline_only:
+        stats = self._benchmark_input_pipeline()
+      else:
+        stats = self._benchmark_train()
+    finally:
+      if host_resource_sampler:
+        host_resource_sampler.stop()
+      if stats is None and self.params.benchmark_history_db is not None:
+        # The run failed, so it is not recorded.
+        self.benchmark_logger.close()
+    if host_resource_sampler:
+      host_summary = host_resource_sampler.get_summary()
+      log_fn('Host: cpu utilization mean %.2f max %.2f, rss (MB) max %.1f, '
+             'threads max %d' %
+             (host_summary['host_cpu_utilization_mean'],
+              host_summary['host_cpu_utilization_max'],
+              host_summary['host_rss_bytes_max'] / 2.**20,
+              host_summary['host_num_threads_max']))
+      stats.update(host_summary)
+    if self.params.benchmark_history_db is not None:
+      self.benchmark_logger.finish(stats)
+    return stats
 
   def _run_eval(self):
     """Evaluate a model every self.params.eval_interval_secs.
@@ -1953,13 +2577,17 @@ class BenchmarkCNN(object):
       top_1_accuracy_sum = 0.0
       top_5_accuracy_sum = 0.0
       total_eval_count = self.num_batches * self.batch_size
+      step_time_stats = step_stats.StepTimeStats()
       for step in xrange(self.num_batches):
+        step_start_time = time.time()
         if (summary_writer and self.params.save_summaries_steps > 0 and
             (step + 1) % self.params.save_summaries_steps == 0):
           results, summary_str = sess.run([fetches, summary_op])
+          step_time_stats.add(time.time() - step_start_time)
           summary_writer.add_summary(summary_str)
         else:
           results = sess.run(fetches)
+          step_time_stats.add(time.time() - step_start_time)
         # Make global_step available in results for postprocessing.
         results['global_step'] = global_step
         results = self.model.postprocess(results)
@@ -1995,6 +2623,7 @@ class BenchmarkCNN(object):
         # batch, which will have a slight performance impact.
         log_fn('-' * 64)
         log_fn('total images/sec: %.2f' % images_per_sec)
+        log_fn(get_step_time_percentiles_str(step_time_stats))
         log_fn('-' * 64)
       if self.benchmark_logger:
         eval_result = {
@@ -2014,6 +2643,103 @@ class BenchmarkCNN(object):
                           value=self.params.stop_at_top_1_accuracy)
       return accuracy_at_1, accuracy_at_5
 
+  def _benchmark_input_pipeline(self):
+    """Reads batches from the input pipeline on the host, without a model.
+
+    The whole pipeline is measured first, then the pipelines returned by
+    input_preprocessor.create_stage_datasets(), which run its first stages.
+
+    Returns:
+      Dictionary containing input pipeline statistics (num_steps,
+      examples_per_sec, stage_examples_per_sec, prefetch_buffer_utilization).
+    """
+    input_preprocessor = self.input_preprocessor
+    params = self.params
+    batch_size = input_preprocessor.batch_size
+    subset = 'train'
+    summary_op = None
+    queue_utilization_op = None
+    stage_ops = []
+    with tf.Graph().as_default(), tf.device(self.cpu_device):
+      if params.use_datasets and input_preprocessor.supports_datasets():
+        ds = input_preprocessor.create_dataset(
+            batch_size,
+            input_preprocessor.num_splits,
+            input_preprocessor.batch_size_per_split,
+            self.dataset,
+            subset,
+            input_preprocessor.train,
+            datasets_repeat_cached_sample=params.datasets_repeat_cached_sample,
+            num_threads=params.datasets_num_private_threads,
+            datasets_use_caching=params.datasets_use_caching,
+            datasets_parallel_interleave_cycle_length=(
+                params.datasets_parallel_interleave_cycle_length),
+            datasets_sloppy_parallel_interleave=(
+                params.datasets_sloppy_parallel_interleave),
+            datasets_parallel_interleave_prefetch=(
+                params.datasets_parallel_interleave_prefetch))
+        ds, summary_op = input_benchmark.add_stats_aggregator(ds)
+        ds_iterator = input_preprocessor.create_iterator(ds)
+        # Every get_next() returns the batch of one split.
+        pipeline_op = tf.group(*[
+            ds_iterator.get_next()
+            for _ in xrange(input_preprocessor.num_splits)])
+        for stage_name, stage_ds in input_preprocessor.create_stage_datasets(
+            self.dataset, subset, num_parallel_calls=batch_size):
+          stage_ops.append((stage_name, input_benchmark.get_stage_batch(
+              stage_ds, batch_size, params.datasets_num_private_threads)))
+      else:
+        input_list = input_preprocessor.minibatch(
+            self.dataset, subset=subset, params=params)
+        pipeline_op = tf.group(*nest.flatten(input_list))
+        queue_utilization_op = input_benchmark.get_queue_utilization(
+            tf.get_collection(tf.GraphKeys.QUEUE_RUNNERS))
+      init_ops = [tf.global_variables_initializer(),
+                  tf.local_variables_initializer(),
+                  tf.tables_initializer()]
+
+      log_fn('Running the input pipeline only')
+      stats = {'num_steps': self.num_batches}
+      coord = tf.train.Coordinator()
+      with tf.Session(config=create_config_proto(params)) as sess:
+        sess.run(init_ops)
+        threads = tf.train.start_queue_runners(sess=sess, coord=coord)
+        try:
+          elapsed_time, samples = input_benchmark.run_steps(
+              sess, pipeline_op, self.num_warmup_batches, self.num_batches,
+              queue_utilization_op)
+          examples_per_sec = self.num_batches * batch_size / elapsed_time
+          stats['examples_per_sec'] = examples_per_sec
+          stats['images_per_sec'] = examples_per_sec
+          if summary_op is not None:
+            # The statistics cover all steps, so they are fetched once.
+            utilization = input_benchmark.get_buffer_utilization(
+                sess.run(summary_op))
+          else:
+            utilization = input_benchmark.mean_or_none(samples)
+          stats['prefetch_buffer_utilization'] = utilization
+          stage_examples_per_sec = {}
+          for stage_name, stage_op in stage_ops:
+            elapsed_time, _ = input_benchmark.run_steps(
+                sess, stage_op, self.num_warmup_batches, self.num_batches)
+            stage_examples_per_sec[stage_name] = (
+                self.num_batches * batch_size / elapsed_time)
+          stats['stage_examples_per_sec'] = stage_examples_per_sec
+        finally:
+          coord.request_stop()
+          coord.join(threads)
+
+    log_fn('-' * 64)
+    log_fn('input pipeline examples/sec: %.2f' % stats['examples_per_sec'])
+    for stage_name, _ in stage_ops:
+      log_fn('  %s stage examples/sec: %.2f' %
+             (stage_name, stats['stage_examples_per_sec'][stage_name]))
+    if stats['prefetch_buffer_utilization'] is not None:
+      log_fn('prefetch buffer utilization: %.2f' %
+             stats['prefetch_buffer_utilization'])
+    log_fn('-' * 64)
+    return stats
+
   def _benchmark_train(self):
     """Run cnn in benchmark mode. Skip the backward pass if forward_only is on.
 
@@ -2023,14 +2749,19 @@ class BenchmarkCNN(object):
     """
     graph = tf.Graph()
     with graph.as_default():
-      build_result = self._build_graph()
+      if self.params.graph_cache_dir:
+        build_result = self._build_or_load_graph()
+      else:
+        build_result = self._build_graph()
       if self.mode == constants.BenchmarkMode.TRAIN_AND_EVAL:
         with self.variable_mgr.reuse_variables():
           with tf.name_scope('Evaluation') as ns:
             eval_build_results = self._build_eval_graph(ns)
+        self.startup_profiler.mark('build_eval_graph', graph)
       else:
         eval_build_results = None
     (graph, result_to_benchmark) = self._preprocess_graph(graph, build_result)
+    self.startup_profiler.mark('preprocess_graph', graph)
     with graph.as_default():
       return self._benchmark_graph(result_to_benchmark, eval_build_results)
 
@@ -2058,7 +2789,15 @@ class BenchmarkCNN(object):
     else:
       self.single_session = False
       (input_producer_op, enqueue_ops, fetches) = self._build_model()
-    fetches_list = nest.flatten(list(fetches.values()))
+    self.startup_profiler.mark('build_model', tf.get_default_graph())
+    if self.params.fetch_loss_every_step:
+      fetches_list = nest.flatten(list(fetches.values()))
+    else:
+      # The global step increment and the sync queues depend on this group, so
+      # it must not include the loss or accuracies, or they would be computed on
+      # every step even when they are not fetched.
+      fetches_list = nest.flatten([fetches[name] for name in _TRAIN_FETCH_NAMES
+                                   if name in fetches])
     main_fetch_group = tf.group(*fetches_list, name='main_fetch_group')
     execution_barrier = None
     if (not self.single_session and self.job_name and
@@ -2069,7 +2808,12 @@ class BenchmarkCNN(object):
     global_step = tf.train.get_global_step()
     with tf.device(self.global_step_device), tf.name_scope('inc_global_step'):
       with tf.control_dependencies([main_fetch_group]):
-        fetches['inc_global_step'] = global_step.assign_add(1)
+        if self.params.steps_per_run > 1:
+          # The global step is incremented once per step inside the training
+          # loop.
+          fetches['inc_global_step'] = global_step.read_value()
+        else:
+          fetches['inc_global_step'] = global_step.assign_add(1)
 
     if ((not self.single_session) and (not self.distributed_collective) and
         self.job_name and self.params.cross_replica_sync):
@@ -2077,6 +2821,19 @@ class BenchmarkCNN(object):
       fetches['sync_queues'] = self.add_sync_queues_and_barrier(
           'sync_queues_step_end_', [main_fetch_group])
 
+    self.warmup_end_step = None
+    if (self.params.warmup_mode == 'auto' and self.job_name and
+        not self.single_session):
+      # The chief writes the number of warmup steps to this variable, so that
+      # all workers run the same number of warmup steps. It is a local variable
+      # so that it is not saved in checkpoints. Every worker initializes it,
+      # but the init_ops_end_ barrier below ensures this happens before the
+      # chief can write to it.
+      with tf.device(self.global_step_device):
+        self.warmup_end_step = tf.Variable(
+            -1, dtype=tf.int64, trainable=False, name='warmup_end_step',
+            collections=[tf.GraphKeys.LOCAL_VARIABLES])
+
     # Skips the init ops for freezable local variables in forward_only mode so
     # we can remove all the assign ops when converting variables to constants.
     with tf.name_scope('local_variable_initialization'):
@@ -2090,9 +2847,15 @@ class BenchmarkCNN(object):
     variable_manager_init_ops = [local_var_init_op]
     if table_init_ops:
       variable_manager_init_ops.extend([table_init_ops])
-    if not self.forward_only_and_freeze:
+    self.startup_profiler.mark('build_graph', tf.get_default_graph())
+    if self.params.variable_snapshot_dir:
+      self._create_variable_snapshot()
+    # The snapshot contains the variables of every tower, so they need not be
+    # copied from the first tower.
+    if not (self.forward_only_and_freeze or self.restore_variable_snapshot):
       with tf.control_dependencies([local_var_init_op]):
         variable_manager_init_ops.extend(self.variable_mgr.get_post_init_ops())
+      self.startup_profiler.mark('post_init_ops', tf.get_default_graph())
     if ((not self.single_session) and (not self.distributed_collective) and
         self.job_name and self.params.cross_replica_sync):
       # Ensure all workers execute variable_manager_init_ops before they start
@@ -2113,6 +2876,61 @@ class BenchmarkCNN(object):
         local_var_init_op_group=local_var_init_op_group,
         summary_op=summary_op)
 
+  def _create_variable_snapshot(self):
+    """Sets self.variable_snapshot, and whether to restore it."""
+    # The variables that are not created by the model are cheap to initialize,
+    # and their initial values depend on params such as --fp16_loss_scale, so
+    # they are always initialized instead.
+    excluded_variables = [tf.train.get_global_step(), self.loss_scale,
+                          self.loss_scale_normal_steps]
+    excluded_names = set(v.op.name for v in excluded_variables if v is not None)
+    self.variable_snapshot = variable_snapshot.VariableSnapshot(
+        self.params.variable_snapshot_dir, self.model.get_model_name(),
+        self.params.tf_random_seed,
+        [v for v in tf.global_variables() if v.op.name not in excluded_names])
+    # The Supervisor restores a checkpoint in --train_dir instead of
+    # initializing the variables, but the checkpoint only has the variables of
+    # the first tower, so they must still be copied to the other towers.
+    self.restore_variable_snapshot = (
+        self.variable_snapshot.exists() and
+        not self._train_dir_has_checkpoint())
+
+  def _train_dir_has_checkpoint(self):
+    return bool(self.params.train_dir and
+                tf.train.latest_checkpoint(self.params.train_dir))
+
+  def _build_or_load_graph(self):
+    """Imports the graph from --graph_cache_dir, or builds and stores it.
+
+    Returns:
+      The GraphInfo returned by _build_graph(), for the default graph.
+    """
+    cache = graph_cache.GraphCache(
+        self.params.graph_cache_dir,
+        self.params.graph_cache_max_size_mb * 2**20)
+    graph_params = graph_cache.get_graph_params(self.params,
+                                                self.model.get_model_name())
+    names = cache.load(graph_params)
+    if names is None:
+      graph_info = self._build_graph()
+      # The global step is a variable, which is restored from its collection
+      # instead.
+      names = graph_cache.get_names(
+          graph_info._replace(global_step=None)._asdict())
+      cache.store(graph_params, tf.train.export_meta_graph(), names)
+      self.startup_profiler.mark('store_graph_cache')
+      return graph_info
+
+    log_fn('Imported the graph from %s' % self.params.graph_cache_dir)
+    # Set the attributes that _build_graph() would have set. Neither is used in
+    # the non-distributed modes that support the cache.
+    self.single_session = False
+    self.warmup_end_step = None
+    graph = tf.get_default_graph()
+    graph_info = GraphInfo(**graph_cache.get_graph_elements(graph, names))
+    self.startup_profiler.mark('load_graph_cache', graph)
+    return graph_info._replace(global_step=tf.train.get_global_step())
+
   def _benchmark_graph(self, graph_info, eval_graph_info):
     """Benchmark the training graph.
 
@@ -2198,6 +3016,22 @@ class BenchmarkCNN(object):
       # same time can cause race conditions.
       with tf.control_dependencies(local_var_init_ops):
         local_var_init_ops.append(eval_graph_info.local_var_init_op_group)
+    init_op = tf.train.Supervisor.USE_DEFAULT
+    init_fn = None
+    save_variable_snapshot = False
+    if self.variable_snapshot:
+      self.variable_snapshot.create_saver()
+      if self.restore_variable_snapshot:
+        log_fn('Restoring the initial values of the variables from %s' %
+               self.variable_snapshot.path)
+        snapshot_names = set(v.op.name
+                             for v in self.variable_snapshot.variables)
+        init_op = tf.variables_initializer(
+            [v for v in tf.global_variables()
+             if v.op.name not in snapshot_names])
+        init_fn = self.variable_snapshot.restore
+      else:
+        save_variable_snapshot = not self._train_dir_has_checkpoint()
     sv = tf.train.Supervisor(
         # For the purpose of Supervisor, all Horovod workers are 'chiefs',
         # since we want session to be initialized symmetrically on all the
@@ -2208,6 +3042,8 @@ class BenchmarkCNN(object):
         # workers from corrupting each other's checkpoints.
         logdir=self.params.train_dir if is_chief else None,
         ready_for_local_init_op=ready_for_local_init_op,
+        init_op=init_op,
+        init_fn=init_fn,
         local_init_op=local_var_init_ops,
         saver=saver,
         global_step=graph_info.global_step,
@@ -2229,24 +3065,39 @@ class BenchmarkCNN(object):
         self.params.train_dir or
         self.dataset.queue_runner_required())
     target = self.cluster_manager.get_target() if self.cluster_manager else ''
+    self.startup_profiler.mark('create_supervisor', tf.get_default_graph())
     with sv.managed_session(
         master=target,
         config=create_config_proto(self.params),
         start_standard_services=start_standard_services) as sess:
+      # The Supervisor initializes the variables when creating the session.
+      self.startup_profiler.mark('create_session')
+      if save_variable_snapshot:
+        self.variable_snapshot.save(sess)
+        log_fn('Saved the initial values of the variables to %s' %
+               self.variable_snapshot.path)
+        self.startup_profiler.mark('save_variable_snapshot')
       # Anything that can potentially raise an OutOfRangeError with 'sess' MUST
       # be under this try block. The managed_session() context manager silently
       # ignores OutOfRangeError, so we must catch them and wrap them with
       # a different exception type so that they can be propagated up to the
       # caller.
+      metrics_writer = None
+      if self.params.metrics_log_file:
+        metrics_writer = metrics_log.StepMetricsWriter(
+            self.params.metrics_log_file)
       try:
         stats = self.benchmark_with_session(
             sess, sv, graph_info, eval_graph_info, bcast_global_variables_op,
-            is_chief, summary_writer, profiler)
+            is_chief, summary_writer, profiler, metrics_writer)
       except tf.errors.OutOfRangeError:
         raise RuntimeError(
             'Received OutOfRangeError. Wrapping in Runtime error to avoid '
             'Supervisor from suppressing the error. Original OutOfRangeError '
             'with traceback:\n' + traceback.format_exc())
+      finally:
+        if metrics_writer:
+          metrics_writer.close()
 
     sv.stop()
     if profiler:
@@ -2255,7 +3106,8 @@ class BenchmarkCNN(object):
 
   def benchmark_with_session(self, sess, supervisor, graph_info,
                              eval_graph_info, bcast_global_variables_op,
-                             is_chief, summary_writer, profiler):
+                             is_chief, summary_writer, profiler,
+                             metrics_writer=None):
     """Benchmarks the graph with the given session.
 
     Args:
@@ -2272,6 +3124,8 @@ class BenchmarkCNN(object):
       summary_writer: The SummaryWriter used to write summaries, or None if
         summaries are not used.
       profiler: The tf.profiler.Profiler, or None if tfprof is not used.
+      metrics_writer: The metrics_log.StepMetricsWriter that per-step records
+        are written to, or None if --metrics_log_file is not specified.
 
     Returns:
       Dictionary containing training statistics (num_workers, num_steps,
@@ -2300,7 +3154,6 @@ class BenchmarkCNN(object):
           self.num_workers * self.num_warmup_batches +
           self.init_global_step,
           self.num_workers * (self.num_warmup_batches + self.num_batches) - 1)
-      global_step_watcher.start()
     else:
       global_step_watcher = None
     eval_image_producer = None
@@ -2312,24 +3165,17 @@ class BenchmarkCNN(object):
       eval_image_producer = self._initialize_eval_graph(
           eval_graph_info.enqueue_ops, eval_graph_info.input_producer_op,
           local_var_init_op_group=None, sess=sess)
-    step_train_times = []
-    log_fn('Running warm up')
-    local_step = -1 * self.num_warmup_batches
-    if self.single_session:
-      # In single session mode, each step, the global_step is incremented by
-      # 1. In non-single session mode, each step, the global_step is
-      # incremented once per worker. This means we need to divide
-      # init_global_step by num_workers only in non-single session mode.
-      end_local_step = self.num_batches - self.init_global_step
+    if self.params.warmup_mode == 'auto':
+      num_enqueue_ops = len(graph_info.enqueue_ops)
+      steady_state_warmup = SteadyStateWarmup(
+          sess, self.params, self.num_warmup_batches,
+          # Warmup must end right after an image_producer barrier. See
+          # _benchmark_graph().
+          lambda n: (n + num_enqueue_ops - 1) % self.batch_group_size == 0,
+          is_chief=self.task_index == 0,
+          warmup_end_step=self.warmup_end_step)
     else:
-      end_local_step = self.num_batches - (self.init_global_step //
-                                           self.num_workers)
-    if not global_step_watcher:
-      # In cross-replica sync mode, all workers must run the same number of
-      # local steps, or else the workers running the extra step will block.
-      done_fn = lambda: local_step >= end_local_step
-    else:
-      done_fn = global_step_watcher.done
+      steady_state_warmup = None
     if self.params.debugger is not None:
       if self.params.debugger == 'cli':
         log_fn('The CLI TensorFlow debugger will be used.')
@@ -2338,114 +3184,244 @@ class BenchmarkCNN(object):
         log_fn('The TensorBoard debugger plugin will be used.')
         sess = tf_debug.TensorBoardDebugWrapperSession(sess,
                                                        self.params.debugger)
+    if self.params.fetch_loss_every_step:
+      train_fetches = None
+    else:
+      train_fetches = {name: fetch
+                       for name, fetch in six.iteritems(graph_info.fetches)
+                       if name in _TRAIN_FETCH_NAMES}
+    if self.params.use_session_callable and self.params.debugger is None:
+      fetches_callable = sess.make_callable(graph_info.fetches)
+      train_fetches_callable = (sess.make_callable(train_fetches)
+                                if train_fetches else None)
+    else:
+      fetches_callable = None
+      train_fetches_callable = None
+    self.startup_profiler.mark('prepare_run')
     mlperf.logger.log(key=mlperf.tags.TRAIN_LOOP)
     skip_final_eval = False
     accuracy_at_1 = None
-    last_eval_step = local_step
-    loop_start_time = time.time()
-    last_average_loss = None
-    while not done_fn():
-      if local_step == 0:
-        log_fn('Done warm up')
-        if graph_info.execution_barrier:
-          log_fn('Waiting for other replicas to finish warm up')
-          sess.run([graph_info.execution_barrier])
-
-        # TODO(laigd): rename 'Img' to maybe 'Input'.
-        header_str = ('Step\tImg/sec\t' +
-                      self.params.loss_type_to_report.replace('/', ' '))
-        if self.params.print_training_accuracy or self.params.forward_only:
-          # TODO(laigd): use the actual accuracy op names of the model.
-          header_str += '\ttop_1_accuracy\ttop_5_accuracy'
-        log_fn(header_str)
-        assert len(step_train_times) == self.num_warmup_batches
-        # reset times to ignore warm up batch
-        step_train_times = []
-        loop_start_time = time.time()
-      if (summary_writer and
-          (local_step + 1) % self.params.save_summaries_steps == 0):
-        fetch_summary = graph_info.summary_op
+    # Without --measurement_phases, the run is a single phase. The first phase
+    # uses the batch counts and --display_every set up by __init__().
+    measurement_phases = self.measurement_phases or [None]
+    all_phase_stats = []
+    num_steps_run = 0
+    for phase_num, measurement_phase in enumerate(measurement_phases):
+      if phase_num > 0:
+        self._start_measurement_phase(measurement_phase, num_steps_run,
+                                      len(graph_info.enqueue_ops))
+      if len(measurement_phases) > 1:
+        log_fn('Measurement phase %d of %d: %d warm up batches, %d batches' %
+               (phase_num + 1, len(measurement_phases),
+                self.num_warmup_batches, self.num_batches))
+      step_time_stats = step_stats.StepTimeStats()
+      phase_time_stats = step_stats.PhaseTimeStats()
+      log_fn('Running warm up')
+      local_step = -1 * self.num_warmup_batches
+      if phase_num > 0:
+        # The global step at the start of the run only affects the first phase.
+        end_local_step = self.num_batches
+      elif self.single_session:
+        # In single session mode, each step, the global_step is incremented by
+        # 1. In non-single session mode, each step, the global_step is
+        # incremented once per worker. This means we need to divide
+        # init_global_step by num_workers only in non-single session mode.
+        end_local_step = self.num_batches - self.init_global_step
       else:
-        fetch_summary = None
-      collective_graph_key = 7 if (
-          self.params.variable_update == 'collective_all_reduce') else 0
-      (summary_str, last_average_loss) = benchmark_one_step(
-          sess, graph_info.fetches, local_step,
-          self.batch_size * (self.num_workers
-                             if self.single_session else 1), step_train_times,
-          self.trace_filename, self.params.partitioned_graph_file_prefix,
-          profiler, image_producer, self.params, fetch_summary,
-          benchmark_logger=self.benchmark_logger,
-          collective_graph_key=collective_graph_key)
-      if summary_str is not None and is_chief:
-        supervisor.summary_computed(sess, summary_str)
-      local_step += 1
-      if (self.params.save_model_steps and
-          local_step % self.params.save_model_steps == 0 and
-          local_step > 0 and
-          is_chief):
-        supervisor.saver.save(sess, supervisor.save_path,
-                              supervisor.global_step)
-      if (eval_graph_info and local_step > 0 and not done_fn() and
-          self._should_eval_during_training(local_step)):
-        python_global_step = sess.run(graph_info.global_step)
-        num_steps_since_last_eval = local_step - last_eval_step
-        # The INPUT_SIZE tag value might not match the
-        # PREPROC_NUM_TRAIN_EXAMPLES tag value, because the number of examples
-        # run, which is INPUT_SIZE, is rounded up to the nearest multiple of
-        # self.batch_size.
-        mlperf.logger.log(
-            key=mlperf.tags.INPUT_SIZE,
-            value=num_steps_since_last_eval * self.batch_size)
-        log_fn('Running evaluation at global_step {}'.format(
-            python_global_step))
-        accuracy_at_1, _ = self._eval_once(
-            sess, summary_writer, eval_graph_info.fetches,
-            eval_graph_info.summary_op, eval_image_producer,
-            python_global_step)
-        last_eval_step = local_step
-        if (self.params.stop_at_top_1_accuracy and
-            accuracy_at_1 >= self.params.stop_at_top_1_accuracy):
-          log_fn('Stopping, as eval accuracy at least %s was reached' %
-                 self.params.stop_at_top_1_accuracy)
+        end_local_step = self.num_batches - (self.init_global_step //
+                                             self.num_workers)
+      if not global_step_watcher:
+        # In cross-replica sync mode, all workers must run the same number of
+        # local steps, or else the workers running the extra step will block.
+        done_fn = lambda: local_step >= end_local_step
+      else:
+        done_fn = global_step_watcher.done
+      if self.params.step_anomaly_mad_threshold:
+        anomaly_tracker = step_stats.StepAnomalyTracker(
+            self.params.step_anomaly_window,
+            self.params.step_anomaly_mad_threshold)
+      else:
+        anomaly_tracker = None
+      last_eval_step = local_step
+      loop_start_time = time.time()
+      last_average_loss = None
+      while not done_fn():
+        if local_step == 0:
+          log_fn('Done warm up')
+          if graph_info.execution_barrier:
+            log_fn('Waiting for other replicas to finish warm up')
+            sess.run([graph_info.execution_barrier])
+
+          # TODO(laigd): rename 'Img' to maybe 'Input'.
+          header_str = ('Step\tImg/sec\t' +
+                        self.params.loss_type_to_report.replace('/', ' '))
+          if self.params.print_training_accuracy or self.params.forward_only:
+            # TODO(laigd): use the actual accuracy op names of the model.
+            header_str += '\ttop_1_accuracy\ttop_5_accuracy'
+          log_fn(header_str)
+          assert (len(step_time_stats) ==
+                  self.num_warmup_batches // self.params.steps_per_run)
+          # reset times to ignore warm up batch
+          step_time_stats.reset()
+          phase_time_stats.reset()
+          loop_start_time = time.time()
+        iteration_start_time = time.time()
+        iteration_step = local_step
+        eval_time = 0.
+        # Side activities run in this iteration, for anomaly_tracker.
+        activities = []
+        if (summary_writer and
+            (local_step + 1) % self.params.save_summaries_steps == 0):
+          fetch_summary = graph_info.summary_op
+          activities.append('summary')
+        else:
+          fetch_summary = None
+        if (train_fetches and fetch_summary is None and
+            not is_display_step(local_step, self.params.display_every,
+                                self.params.steps_per_run) and
+            local_step + self.params.steps_per_run < end_local_step):
+          step_fetches, step_fetches_callable = (train_fetches,
+                                                 train_fetches_callable)
+        else:
+          step_fetches, step_fetches_callable = (graph_info.fetches,
+                                                 fetches_callable)
+        collective_graph_key = 7 if (
+            self.params.variable_update == 'collective_all_reduce') else 0
+        (summary_str, average_loss) = benchmark_one_step(
+            sess, step_fetches, local_step,
+            self.batch_size * self.params.steps_per_run *
+            (self.num_workers if self.single_session else 1), step_time_stats,
+            self.trace_filename, self.params.partitioned_graph_file_prefix,
+            profiler, image_producer, self.params, fetch_summary,
+            benchmark_logger=self.benchmark_logger,
+            collective_graph_key=collective_graph_key,
+            metrics_writer=metrics_writer,
+            phase_time_stats=phase_time_stats,
+            steps_per_run=self.params.steps_per_run,
+            fetches_callable=step_fetches_callable,
+            global_step_watcher=global_step_watcher)
+        if not self.startup_profiler.finished:
+          self.startup_profiler.mark('first_step')
+          self.startup_profiler.finish()
+          if self.params.startup_profile:
+            for line in self.startup_profiler.get_report_lines():
+              log_fn(line)
+        if average_loss is not None:
+          last_average_loss = average_loss
+        if summary_str is not None and is_chief:
+          supervisor.summary_computed(sess, summary_str)
+        local_step += self.params.steps_per_run
+        if (steady_state_warmup and local_step < 0 and
+            steady_state_warmup.step_done(
+                self.num_warmup_batches + local_step,
+                step_time_stats.last_time)):
+          self.num_warmup_batches += local_step
+          log_fn('Step times are steady after %d warm up steps' %
+                 self.num_warmup_batches)
+          local_step = 0
+        if (self.params.save_model_steps and
+            local_step % self.params.save_model_steps == 0 and
+            local_step > 0 and
+            is_chief):
+          supervisor.saver.save(sess, supervisor.save_path,
+                                supervisor.global_step)
+          activities.append('checkpoint')
+        if (eval_graph_info and local_step > 0 and not done_fn() and
+            self._should_eval_during_training(local_step)):
+          eval_start_time = time.time()
+          activities.append('eval')
+          python_global_step = sess.run(graph_info.global_step)
+          num_steps_since_last_eval = local_step - last_eval_step
+          # The INPUT_SIZE tag value might not match the
+          # PREPROC_NUM_TRAIN_EXAMPLES tag value, because the number of examples
+          # run, which is INPUT_SIZE, is rounded up to the nearest multiple of
+          # self.batch_size.
+          mlperf.logger.log(
+              key=mlperf.tags.INPUT_SIZE,
+              value=num_steps_since_last_eval * self.batch_size)
+          log_fn('Running evaluation at global_step {}'.format(
+              python_global_step))
+          accuracy_at_1, _ = self._eval_once(
+              sess, summary_writer, eval_graph_info.fetches,
+              eval_graph_info.summary_op, eval_image_producer,
+              python_global_step)
+          last_eval_step = local_step
+          if (self.params.stop_at_top_1_accuracy and
+              accuracy_at_1 >= self.params.stop_at_top_1_accuracy):
+            log_fn('Stopping, as eval accuracy at least %s was reached' %
+                   self.params.stop_at_top_1_accuracy)
+            skip_final_eval = True
+            break
+          else:
+            log_fn('Resuming training')
+          eval_time = time.time() - eval_start_time
+        if eval_graph_info and self.model.reached_target():
+          log_fn('Stopping, as the model indicates its custom goal was reached')
           skip_final_eval = True
           break
-        else:
-          log_fn('Resuming training')
-      if eval_graph_info and self.model.reached_target():
-        log_fn('Stopping, as the model indicates its custom goal was reached')
-        skip_final_eval = True
-        break
-    loop_end_time = time.time()
-    # Waits for the global step to be done, regardless of done_fn.
-    if global_step_watcher:
-      while not global_step_watcher.done():
-        time.sleep(.25)
-    if not global_step_watcher:
-      elapsed_time = loop_end_time - loop_start_time
-      average_wall_time = elapsed_time / local_step if local_step > 0 else 0
-      images_per_sec = (self.num_workers * local_step * self.batch_size /
-                        elapsed_time)
-      num_steps = local_step * self.num_workers
-    else:
-      # NOTE: Each worker independently increases the global step. So,
-      # num_steps will be the sum of the local_steps from each worker.
-      num_steps = global_step_watcher.num_steps()
-      elapsed_time = global_step_watcher.elapsed_time()
-      average_wall_time = (elapsed_time * self.num_workers / num_steps
-                           if num_steps > 0 else 0)
-      images_per_sec = num_steps * self.batch_size / elapsed_time
-
-    # We skip printing images/sec if --eval_during_training_* is specified,
-    # because we are both processing training and evaluation images, so a
-    # singular "images/sec" value is meaningless.
-    if self.mode != constants.BenchmarkMode.TRAIN_AND_EVAL:
-      log_fn('-' * 64)
-      # TODO(laigd): rename 'images' to maybe 'inputs'.
-      log_fn('total images/sec: %.2f' % images_per_sec)
-      log_fn('-' * 64)
-    else:
-      log_fn('Done with training')
+        # Everything in this iteration other than the step itself and evaluation
+        # is host overhead.
+        iteration_time = time.time() - iteration_start_time
+        phase_time_stats.add(
+            step_stats.PHASE_HOST_OVERHEAD,
+            max(iteration_time - eval_time - step_time_stats.last_time, 0.))
+        if anomaly_tracker and iteration_step >= 0:
+          lost_time = anomaly_tracker.add(
+              iteration_time, activities,
+              phase_time_stats.last_times.get(step_stats.PHASE_INPUT_WAIT, 0.))
+          if lost_time:
+            log_fn('Step %d took %.3f sec, %.3f sec longer than usual (%s)' %
+                   (iteration_step + 1, iteration_time, lost_time,
+                    ', '.join(activities) or 'no side activity'))
+      loop_end_time = time.time()
+      # Waits for the global step to be done, regardless of done_fn.
+      if global_step_watcher:
+        global_step_watcher.wait_until_done()
+      if not global_step_watcher:
+        elapsed_time = loop_end_time - loop_start_time
+        average_wall_time = elapsed_time / local_step if local_step > 0 else 0
+        images_per_sec = (self.num_workers * local_step * self.batch_size /
+                          elapsed_time)
+        num_steps = local_step * self.num_workers
+      else:
+        # NOTE: Each worker independently increases the global step. So,
+        # num_steps will be the sum of the local_steps from each worker.
+        num_steps = global_step_watcher.num_steps()
+        elapsed_time = global_step_watcher.elapsed_time()
+        average_wall_time = (elapsed_time * self.num_workers / num_steps
+                             if num_steps > 0 else 0)
+        images_per_sec = num_steps * self.batch_size / elapsed_time
+
+      # We skip printing images/sec if --eval_during_training_* is specified,
+      # because we are both processing training and evaluation images, so a
+      # singular "images/sec" value is meaningless.
+      if self.mode != constants.BenchmarkMode.TRAIN_AND_EVAL:
+        log_fn('-' * 64)
+        # TODO(laigd): rename 'images' to maybe 'inputs'.
+        log_fn('total images/sec: %.2f' % images_per_sec)
+        log_fn(get_step_time_percentiles_str(step_time_stats))
+        log_fn(get_phase_times_str(phase_time_stats))
+        log_fn('-' * 64)
+      else:
+        log_fn('Done with training')
+      if anomaly_tracker:
+        for anomaly_str in get_step_anomaly_strs(anomaly_tracker):
+          log_fn(anomaly_str)
+      phase_stats = {
+          'num_workers': self.num_workers,
+          'num_steps': num_steps,
+          'num_warmup_batches': self.num_warmup_batches,
+          'average_wall_time': average_wall_time,
+          'images_per_sec': images_per_sec
+      }
+      phase_stats.update(get_step_time_percentiles(step_time_stats))
+      phase_stats.update(get_phase_times(phase_time_stats))
+      if anomaly_tracker:
+        phase_stats.update(get_step_anomaly_stats(anomaly_tracker))
+      if last_average_loss is not None:
+        phase_stats['last_average_loss'] = last_average_loss
+      all_phase_stats.append(phase_stats)
+      num_steps_run += self.num_warmup_batches + local_step
     num_steps_since_last_eval = local_step - last_eval_step
     mlperf.logger.log(
         key=mlperf.tags.INPUT_SIZE,
@@ -2466,8 +3442,10 @@ class BenchmarkCNN(object):
       eval_image_producer.done()
     if is_chief:
       if self.benchmark_logger:
+        # Like the returned stats, the metric describes the first phase.
         self.benchmark_logger.log_metric(
-            'average_examples_per_sec', images_per_sec, global_step=num_steps)
+            'average_examples_per_sec', all_phase_stats[0]['images_per_sec'],
+            global_step=all_phase_stats[0]['num_steps'])
 
     # Save the model checkpoint.
     if self.params.train_dir is not None and is_chief:
@@ -2479,14 +3457,10 @@ class BenchmarkCNN(object):
       # Wait for other workers to reach the end, so this worker doesn't
       # go away underneath them.
       sess.run([graph_info.execution_barrier])
-    stats = {
-        'num_workers': self.num_workers,
-        'num_steps': num_steps,
-        'average_wall_time': average_wall_time,
-        'images_per_sec': images_per_sec
-    }
-    if last_average_loss is not None:
-      stats['last_average_loss'] = last_average_loss
+    stats = dict(all_phase_stats[0])
+    stats.update(self.startup_profiler.get_stats())
+    if len(all_phase_stats) > 1:
+      stats['measurement_phases'] = all_phase_stats
     success = bool(self.model.reached_target() or
                    (accuracy_at_1 and self.params.stop_at_top_1_accuracy and
                     accuracy_at_1 >= self.params.stop_at_top_1_accuracy))
@@ -2494,6 +3468,26 @@ class BenchmarkCNN(object):
     mlperf.logger.log(key=mlperf.tags.RUN_FINAL)
     return stats
 
+  def _start_measurement_phase(self, measurement_phase, num_steps_run,
+                               num_enqueue_ops):
+    """Applies the params of a measurement phase other than the first one.
+
+    Args:
+      measurement_phase: The MeasurementPhase to start.
+      num_steps_run: The number of steps, including warm up steps, run by the
+        previous phases.
+      num_enqueue_ops: The number of enqueue ops of the graph.
+    """
+    self.num_batches = measurement_phase.num_batches
+    self.num_warmup_batches = measurement_phase.num_warmup_batches
+    # Like the first phase, the phase must start right after an image_producer
+    # barrier. See _benchmark_graph().
+    while ((num_steps_run + self.num_warmup_batches + num_enqueue_ops - 1) %
+           self.batch_group_size):
+      self.num_warmup_batches += 1
+    self.params = self.params._replace(
+        display_every=measurement_phase.display_every)
+
   def _should_eval_during_training(self, step):
     """Return True iff should run eval during training at current step."""
 
@@ -2756,10 +3750,6 @@ class BenchmarkCNN(object):
       mode_string = 'training'
 
     log_fn('Generating {} model'.format(mode_string))
-    losses = []
-    device_grads = []
-    all_logits = []
-    all_accuracy_ops = {}
     gpu_compute_stage_ops = []
     gpu_grad_stage_ops = []
 
@@ -2773,15 +3763,81 @@ class BenchmarkCNN(object):
       input_processing_info = self._build_input_processing(shift_ratio=0)
       if input_processing_info.input_producer_op is not None:
         input_producer_op = tf.group(*input_processing_info.input_producer_op)
+    if self.params.steps_per_run > 1:
+      fetches = self._build_training_loop(global_step, input_processing_info)
+      return (input_producer_op, [], fetches)
+
+    (losses, device_grads, all_logits, all_accuracy_ops, update_ops,
+     staging_delta_ops) = self._build_towers(
+         phase_train, input_processing_info, gpu_compute_stage_ops,
+         gpu_grad_stage_ops)
+
+    enqueue_ops = []
+    if not self.datasets_use_prefetch:
+      if self.variable_mgr.supports_staged_vars():
+        for staging_ops in self.variable_mgr.staging_vars_on_devices:
+          gpu_compute_stage_ops.extend(
+              [put_op for _, (put_op, _) in six.iteritems(staging_ops)])
+      enqueue_ops.append(tf.group(*gpu_compute_stage_ops,
+                                  name='gpu_compute_stage_ops_group'))
+      if gpu_grad_stage_ops:
+        staging_delta_ops += gpu_grad_stage_ops
+      if staging_delta_ops:
+        enqueue_ops.append(tf.group(*(staging_delta_ops)))
+
+    if (self.mode == constants.BenchmarkMode.TRAIN_AND_EVAL and
+        self.params.variable_update == 'replicated'):
+      # We need to get all the update ops instead of only those for the first
+      # tower. This is because during evaluation, each tower will read from its
+      # own tower's moving averages instead of the first tower's moving
+      # averages.
+      # TODO(reedwm): Have each tower read from the first tower's moving
+      # averages for a slight performance gain.
+      update_ops = tf.get_collection(tf.GraphKeys.UPDATE_OPS)
+
+    fetches = self._build_fetches(global_step, all_logits, losses, device_grads,
+                                  enqueue_ops, update_ops, all_accuracy_ops,
+                                  phase_train)
+    return (input_producer_op, enqueue_ops, fetches)
+
+  def _build_towers(self, phase_train, input_processing_info,
+                    gpu_compute_stage_ops, gpu_grad_stage_ops,
+                    synthetic_input_lists=None):
+    """Builds the forward pass, and gradients if training, on every device.
+
+    Returns:
+      A (losses, device_grads, all_logits, all_accuracy_ops, update_ops,
+      staging_delta_ops) tuple.
+    """
+    losses = []
+    device_grads = []
+    all_logits = []
+    all_accuracy_ops = {}
     update_ops = None
     staging_delta_ops = []
+    tower_fn = None
 
     for device_num in range(len(self.devices)):
+      # With --tower_function, the first tower is built as usual, since it
+      # creates the variables and the batch norm updates, and so is the last
+      # one, since it computes the L2 loss. The towers in between call a
+      # function defined once.
+      use_tower_fn = (phase_train and self.params.tower_function and
+                      0 < device_num < len(self.devices) - 1)
+      outer_variable_scope = self.variable_mgr.create_outer_variable_scope(
+          device_num)
       with tf.name_scope('tower_%i' % device_num) as name_scope, (
-          self.variable_mgr.create_outer_variable_scope(device_num)):
+          outer_variable_scope) as var_scope:
+        if use_tower_fn and tower_fn is None:
+          tower_fn = tower_function.TowerFunction(
+              first_tower_scope_name,
+              self.variable_mgr.trainable_variables_on_device(0, 0))
         results = self.add_forward_pass_and_gradients(
             phase_train, device_num, device_num, input_processing_info,
-            gpu_compute_stage_ops, gpu_grad_stage_ops)
+            gpu_compute_stage_ops, gpu_grad_stage_ops,
+            synthetic_input_list=(synthetic_input_lists[device_num]
+                                  if synthetic_input_lists else None),
+            tower_fn=tower_fn if use_tower_fn else None)
 
         if self.params.backbone_model_path:
           self.model.add_backbone_saver()
@@ -2800,6 +3856,7 @@ class BenchmarkCNN(object):
               all_accuracy_ops[key].append(op)
 
         if device_num == 0:
+          first_tower_scope_name = var_scope.name
           # Retain the Batch Normalization updates operations only from the
           # first tower. These operations update the moving mean and moving
           # variance variables, which are updated (but not used) during
@@ -2815,34 +3872,61 @@ class BenchmarkCNN(object):
             assert not self.variable_mgr.staging_delta_ops
           else:
             staging_delta_ops = list(self.variable_mgr.staging_delta_ops)
+    return (losses, device_grads, all_logits, all_accuracy_ops, update_ops,
+            staging_delta_ops)
 
-    enqueue_ops = []
-    if not self.datasets_use_prefetch:
-      if self.variable_mgr.supports_staged_vars():
-        for staging_ops in self.variable_mgr.staging_vars_on_devices:
-          gpu_compute_stage_ops.extend(
-              [put_op for _, (put_op, _) in six.iteritems(staging_ops)])
-      enqueue_ops.append(tf.group(*gpu_compute_stage_ops,
-                                  name='gpu_compute_stage_ops_group'))
-      if gpu_grad_stage_ops:
-        staging_delta_ops += gpu_grad_stage_ops
-      if staging_delta_ops:
-        enqueue_ops.append(tf.group(*(staging_delta_ops)))
+  def _build_training_loop(self, global_step, input_processing_info):
+    """Builds a tf.while_loop that runs --steps_per_run training steps.
 
-    if (self.mode == constants.BenchmarkMode.TRAIN_AND_EVAL and
-        self.params.variable_update == 'replicated'):
-      # We need to get all the update ops instead of only those for the first
-      # tower. This is because during evaluation, each tower will read from its
-      # own tower's moving averages instead of the first tower's moving
-      # averages.
-      # TODO(reedwm): Have each tower read from the first tower's moving
-      # averages for a slight performance gain.
-      update_ops = tf.get_collection(tf.GraphKeys.UPDATE_OPS)
-
-    fetches = self._build_fetches(global_step, all_logits, losses, device_grads,
-                                  enqueue_ops, update_ops, all_accuracy_ops,
-                                  phase_train)
-    return (input_producer_op, enqueue_ops, fetches)
+    Returns:
+      The fetches map. Fetching any of the fetches runs all the steps. Fetches
+      other than 'train_op' hold their value from the last step.
+    """
+    # The synthetic inputs are stored in local variables, which cannot be
+    # created inside a tf.while_loop.
+    nclass = self.dataset.num_classes
+    synthetic_input_lists = []
+    for device_num in range(len(self.devices)):
+      with tf.name_scope('tower_%i' % device_num), tf.device(
+          self.raw_devices[device_num]):
+        synthetic_input_lists.append(self.model.get_synthetic_inputs(
+            BenchmarkCNN.GPU_CACHED_INPUT_VARIABLE_NAME, nclass))
+
+    fetch_names = []
+
+    def loop_body(step, unused_last_values):
+      """Runs a single training step."""
+      (losses, device_grads, _, all_accuracy_ops, update_ops,
+       _) = self._build_towers(
+           True, input_processing_info, [], [], synthetic_input_lists)
+      fetches = self._build_fetches(global_step, [], losses, device_grads, [],
+                                    update_ops, all_accuracy_ops,
+                                    phase_train=True)
+      with tf.device(self.global_step_device):
+        with tf.control_dependencies([fetches.pop('train_op')]):
+          inc_global_step = global_step.assign_add(1)
+      for name, value in sorted(fetches.items()):
+        if value.shape.ndims != 0:
+          raise ValueError('--steps_per_run > 1 does not support the '
+                           'non-scalar fetch %s of model %s' %
+                           (name, self.model.get_model_name()))
+        fetch_names.append(name)
+      # The next step must not start before this step's updates are applied.
+      with tf.control_dependencies([inc_global_step]):
+        last_values = tf.stack([tf.cast(fetches[name], tf.float32)
+                                for name in fetch_names])
+        return step + 1, last_values
+
+    with tf.name_scope('training_loop'):
+      _, last_values = tf.while_loop(
+          lambda step, _: step < self.params.steps_per_run,
+          loop_body,
+          [tf.constant(0), tf.zeros([0])],
+          shape_invariants=[tf.TensorShape([]), tf.TensorShape([None])],
+          parallel_iterations=1)
+    fetches = {name: last_values[i] for i, name in enumerate(fetch_names)}
+    fetches['train_op'] = tf.group(last_values, name='train_ops_group')
+    return fetches
 
   def _build_fetches(self, global_step, all_logits, losses, device_grads,
                      enqueue_ops, update_ops, all_accuracy_ops, phase_train):
@@ -3075,8 +4159,16 @@ class BenchmarkCNN(object):
                                      abs_device_num,
                                      input_processing_info,
                                      gpu_compute_stage_ops,
-                                     gpu_grad_stage_ops):
-    """Add ops for forward-pass and gradient computations."""
+                                     gpu_grad_stage_ops,
+                                     synthetic_input_list=None,
+                                     tower_fn=None):
+    """Add ops for forward-pass and gradient computations.
+
+    If `synthetic_input_list` is not None, it is used as the synthetic inputs
+    instead of creating them. If `tower_fn` is not None, it is a
+    tower_function.TowerFunction, which is called instead of building the
+    forward pass and gradients on this device.
+    """
     nclass = self.dataset.num_classes
     if self.datasets_use_prefetch:
       function_buffering_resource = None
@@ -3118,6 +4210,8 @@ class BenchmarkCNN(object):
           gpu_compute_stage_op = gpu_compute_stage.put(host_input_list)
           input_list = gpu_compute_stage.get()
           gpu_compute_stage_ops.append(gpu_compute_stage_op)
+      elif synthetic_input_list is not None:
+        input_list = synthetic_input_list
       else:
         with tf.device(self.raw_devices[rel_device_num]):
           # Minor hack to avoid H2D copy when using synthetic data
@@ -3146,9 +4240,13 @@ class BenchmarkCNN(object):
         for i in range(len(input_list))
     ]
 
-    def forward_pass_and_gradients():
+    def forward_pass_and_gradients(tower_input_list=None, tower_params=None):
       """Builds forward pass and gradient computation network.
 
+      `tower_input_list` and `tower_params`, if not None, are used instead of
+      the inputs and trainable variables of the device. They are the arguments
+      of the function when the tower is built by a TowerFunction.
+
       When phase_train=True and print_training_accuracy=False:
         return [loss] + grads
 
@@ -3169,16 +4267,20 @@ class BenchmarkCNN(object):
         outputs: A list of tensors depending on different modes.
       """
 
+      inputs = input_list if tower_input_list is None else tower_input_list
       build_network_result = self.model.build_network(
-          input_list, phase_train, nclass)
+          inputs, phase_train, nclass)
       logits = build_network_result.logits
 
       if not phase_train:
         return [logits]
 
-      base_loss = self.model.loss_function(input_list, build_network_result)
-      params = self.variable_mgr.trainable_variables_on_device(
-          rel_device_num, abs_device_num)
+      base_loss = self.model.loss_function(inputs, build_network_result)
+      if tower_params is None:
+        params = self.variable_mgr.trainable_variables_on_device(
+            rel_device_num, abs_device_num)
+      else:
+        params = tower_params
       l2_loss = None
       total_loss = base_loss
       with tf.name_scope('l2_loss'):
@@ -3222,6 +4324,10 @@ class BenchmarkCNN(object):
         # gradient. A sparse gradient is an instance of tf.IndexedSlices.
         # convert_to_tensor does not modify dense tensors.
         grads = [tf.convert_to_tensor(g) for g in grads]
+      if tower_params is not None:
+        # Function outputs must be dense tensors.
+        grads = [tf.zeros_like(p) if g is None else tf.convert_to_tensor(g)
+                 for g, p in zip(grads, params)]
       if self.loss_scale is not None:
         # TODO(reedwm): If automatic loss scaling is not used, we could avoid
         # these multiplications by directly modifying the learning rate instead.
@@ -3316,7 +4422,11 @@ class BenchmarkCNN(object):
       return results
 
     with tf.device(self.devices[rel_device_num]):
-      outputs = maybe_compile(forward_pass_and_gradients, self.params)
+      if tower_fn is not None:
+        outputs = tower_fn(forward_pass_and_gradients, input_list,
+                           tower_fn.create_tower_variables())
+      else:
+        outputs = maybe_compile(forward_pass_and_gradients, self.params)
       logits, loss, grads = unpack_forward_pass_and_gradients_output(outputs)
       return make_results(logits, loss, grads)
 
@@ -3349,7 +4459,8 @@ class BenchmarkCNN(object):
         summary_verbosity=self.params.summary_verbosity,
         distort_color_in_yiq=self.params.distort_color_in_yiq,
         fuse_decode_and_crop=self.params.fuse_decode_and_crop,
-        match_mlperf=self.params.ml_perf)
+        match_mlperf=self.params.ml_perf,
+        batch_color_distortion=self.params.batch_color_distortion)
 
   def add_sync_queues_and_barrier(self, name_prefix, enqueue_after_list):
     """Adds ops to enqueue on all worker queues.
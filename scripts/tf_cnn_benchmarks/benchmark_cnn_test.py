@@ -19,20 +19,28 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 import glob
+import json
 import os
 import re
+import time
 
 import mock
 import numpy as np
+from six.moves import cPickle
 import tensorflow as tf
 from google.protobuf import text_format
+from tensorflow.contrib.image.python.ops import distort_image_ops
 from tensorflow.core.framework import step_stats_pb2
 from tensorflow.core.profiler import tfprof_log_pb2
 from tensorflow.python.platform import test
 import benchmark_cnn
+import benchmark_history
+import convert_cifar10_to_records
+import convert_imagenet_to_raw
 import datasets
 import flags
 import preprocessing
+import step_stats
 import test_util
 import variable_mgr_util
 from platforms import util as platforms_util
@@ -685,6 +693,313 @@ class TfCnnBenchmarksTest(tf.test.TestCase):
       # The following statement should not raise an exception.
       profile_proto.ParseFromString(f.read())
 
+  def testMetricsLogFile(self):
+    metrics_log_file = os.path.join(self.get_temp_dir(),
+                                    'testMetricsLogFile.jsonl')
+    params = test_util.get_params('testMetricsLogFile')._replace(
+        metrics_log_file=metrics_log_file)
+    self._train_and_eval_local(params, skip='eval_and_train_from_checkpoint')
+    with open(metrics_log_file) as f:
+      records = [json.loads(line) for line in f]
+    num_steps = params.num_warmup_batches + params.num_batches
+    self.assertEqual([record['step'] for record in records],
+                     list(range(-params.num_warmup_batches,
+                                params.num_batches)))
+    self.assertEqual([record['global_step'] for record in records],
+                     list(range(1, num_steps + 1)))
+    for record in records:
+      self.assertGreater(record['step_time'], 0)
+      self.assertLessEqual(record['sess_run_time'], record['step_time'])
+      self.assertLessEqual(record['input_wait_time'], record['step_time'])
+      self.assertGreater(record['examples_per_sec'], 0)
+      self.assertIn('loss', record)
+      self.assertIn('wall_time', record)
+      self.assertIn('top_1_accuracy', record)
+
+  def testPhaseTimes(self):
+    params = test_util.get_params('testPhaseTimes')
+    stats = benchmark_cnn.BenchmarkCNN(params).run()
+    for phase in (step_stats.PHASE_SESS_RUN, step_stats.PHASE_INPUT_WAIT,
+                  step_stats.PHASE_HOST_OVERHEAD):
+      self.assertGreaterEqual(stats['phase_time_' + phase], 0)
+    self.assertLessEqual(stats['phase_time_' + step_stats.PHASE_SESS_RUN],
+                         stats['average_wall_time'])
+
+  def testStartupProfile(self):
+    params = test_util.get_params('testStartupProfile')._replace(
+        startup_profile=True)
+    logs = []
+    with test_util.monkey_patch(benchmark_cnn,
+                                log_fn=test_util.print_and_add_to_list(logs)):
+      bench = benchmark_cnn.BenchmarkCNN(params)
+      stats = bench.run()
+    phase_names = [phase.name for phase in bench.startup_profiler.phases]
+    self.assertEqual(phase_names,
+                     ['init', 'build_model', 'build_graph', 'post_init_ops',
+                      'preprocess_graph', 'create_supervisor', 'create_session',
+                      'prepare_run', 'first_step'])
+    build_model_phase = bench.startup_profiler.phases[1]
+    self.assertGreater(build_model_phase.num_ops, 0)
+    self.assertGreater(build_model_phase.graph_def_bytes, 0)
+    self.assertAllClose(stats['startup_time'],
+                        sum(stats['startup_%s_time' % name]
+                            for name in phase_names))
+    self.assertTrue(any(line.startswith('Startup phase') for line in logs))
+
+  def testMeasurementPhases(self):
+    params = test_util.get_params('testMeasurementPhases')._replace(
+        measurement_phases=['num_batches=10', 'num_batches=6:display_every=2'])
+    stats = benchmark_cnn.BenchmarkCNN(params).run()
+    phase_stats = stats['measurement_phases']
+    self.assertEqual([s['num_steps'] for s in phase_stats], [10, 6])
+    self.assertEqual([s['num_warmup_batches'] for s in phase_stats],
+                     [params.num_warmup_batches, 0])
+    self.assertEqual(stats['num_steps'], 10)
+    self.assertIn('startup_time', stats)
+
+  def testParseMeasurementPhases(self):
+    phases = benchmark_cnn.parse_measurement_phases(
+        ['num_batches=10', 'display_every=5:num_warmup_batches=2'],
+        num_batches=20, num_warmup_batches=3, display_every=1)
+    self.assertEqual(phases, [
+        benchmark_cnn.MeasurementPhase(num_batches=10, num_warmup_batches=3,
+                                       display_every=1),
+        benchmark_cnn.MeasurementPhase(num_batches=20, num_warmup_batches=2,
+                                       display_every=5)])
+    self.assertEqual(benchmark_cnn.parse_measurement_phases([], 20, 3, 1), [])
+    for phase_str in ('num_batches', 'batch_size=2', 'num_batches=x',
+                      'num_batches=0'):
+      with self.assertRaises(ValueError):
+        benchmark_cnn.parse_measurement_phases([phase_str], 20, 3, 1)
+
+  def testGraphCache(self):
+    params = test_util.get_params('testGraphCache')._replace(
+        graph_cache_dir=os.path.join(self.get_temp_dir(), 'graph_cache'))
+    phase_names = []
+    for num_batches in (10, 20):
+      bench = benchmark_cnn.BenchmarkCNN(params._replace(
+          num_batches=num_batches))
+      stats = bench.run()
+      self.assertEqual(stats['num_steps'], num_batches)
+      phase_names.append([phase.name for phase in
+                          bench.startup_profiler.phases])
+    self.assertIn('store_graph_cache', phase_names[0])
+    self.assertIn('load_graph_cache', phase_names[1])
+    self.assertNotIn('build_model', phase_names[1])
+    # A different batch size must not use the cached graph.
+    bench = benchmark_cnn.BenchmarkCNN(params._replace(batch_size=4))
+    bench.run()
+    self.assertIn('store_graph_cache',
+                  [phase.name for phase in bench.startup_profiler.phases])
+
+  def testVariableSnapshot(self):
+    params = test_util.get_params('testVariableSnapshot')._replace(
+        num_gpus=2, variable_update='replicated',
+        variable_snapshot_dir=os.path.join(self.get_temp_dir(), 'snapshots'))
+    phase_names = []
+    for _ in range(2):
+      bench = benchmark_cnn.BenchmarkCNN(params)
+      stats = bench.run()
+      self.assertTrue(np.isfinite(stats['last_average_loss']))
+      phase_names.append([phase.name for phase in
+                          bench.startup_profiler.phases])
+    self.assertIn('post_init_ops', phase_names[0])
+    self.assertIn('save_variable_snapshot', phase_names[0])
+    self.assertNotIn('post_init_ops', phase_names[1])
+    self.assertNotIn('save_variable_snapshot', phase_names[1])
+    with self.assertRaises(ValueError):
+      benchmark_cnn.BenchmarkCNN(params._replace(
+          graph_cache_dir=os.path.join(self.get_temp_dir(), 'graph_cache')))
+
+  def testTowerFunction(self):
+    for variable_update in ('parameter_server', 'replicated'):
+      num_ops = {}
+      for tower_function in (False, True):
+        params = test_util.get_params('testTowerFunction')._replace(
+            num_gpus=4, variable_update=variable_update,
+            tower_function=tower_function, startup_profile=True)
+        bench = benchmark_cnn.BenchmarkCNN(params)
+        stats = bench.run()
+        self.assertTrue(np.isfinite(stats['last_average_loss']))
+        build_model_phase, = [phase for phase in bench.startup_profiler.phases
+                              if phase.name == 'build_model']
+        num_ops[tower_function] = build_model_phase.num_ops
+      self.assertLess(num_ops[True], num_ops[False])
+
+  def testTowerFunctionUnsupported(self):
+    params = test_util.get_params('testTowerFunctionUnsupported')._replace(
+        tower_function=True, staged_vars=True)
+    with self.assertRaises(ValueError):
+      benchmark_cnn.BenchmarkCNN(params)
+
+  def testWithoutSessionCallable(self):
+    params = test_util.get_params('testWithoutSessionCallable')._replace(
+        use_session_callable=False)
+    self._train_and_eval_local(params, skip='eval_and_train_from_checkpoint')
+
+  def testStepAnomalies(self):
+    # The only checkpoint saved during training, after step 15, is slow.
+    params = test_util.get_params('testStepAnomalies')._replace(
+        step_anomaly_mad_threshold=5., step_anomaly_window=10,
+        save_model_steps=15)
+    real_save = tf.train.Saver.save
+
+    def slow_save(saver, *args, **kwargs):
+      time.sleep(1.)
+      return real_save(saver, *args, **kwargs)
+
+    logs = []
+    with mock.patch.object(tf.train.Saver, 'save', slow_save):
+      with test_util.monkey_patch(benchmark_cnn,
+                                  log_fn=test_util.print_and_add_to_list(logs)):
+        stats = benchmark_cnn.BenchmarkCNN(params).run()
+    self.assertGreaterEqual(stats['num_anomalous_iterations'], 1)
+    self.assertGreater(stats['anomalous_lost_time'], 0.9)
+    # Most of the lost time is attributed to the checkpoint.
+    self.assertGreater(
+        stats['lost_time_fraction_checkpoint'] * stats['anomalous_lost_time'],
+        0.9)
+    self.assertTrue(any(re.match(r'Step 15 took .* \(checkpoint\)', log)
+                        for log in logs))
+
+  def testHostStats(self):
+    params = test_util.get_params('testHostStats')._replace(
+        host_stats_interval_secs=0.05)
+    stats = benchmark_cnn.BenchmarkCNN(params).run()
+    self.assertGreater(stats['host_rss_bytes_max'], 0)
+    self.assertGreater(stats['host_num_threads_max'], 1)
+    self.assertIn('host_cpu_utilization_mean', stats)
+
+  def testBenchmarkHistoryDb(self):
+    db = os.path.join(self.get_temp_dir(), 'benchmark_history.db')
+    params = test_util.get_params('testBenchmarkHistoryDb')._replace(
+        benchmark_history_db=db)
+    stats = benchmark_cnn.BenchmarkCNN(params).run()
+    runs = benchmark_history.get_recent_runs(db, 'trivial')
+    self.assertEqual(len(runs), 1)
+    self.assertEqual(runs[0]['batch_size'], params.batch_size * params.num_gpus)
+    self.assertAllClose(runs[0]['total_time'],
+                        stats['average_wall_time'] * stats['num_steps'])
+    with self.assertRaises(ValueError):
+      benchmark_cnn.BenchmarkCNN(params._replace(benchmark_log_dir=db))
+
+  def testGlobalStepWatcher(self):
+    watcher = benchmark_cnn.GlobalStepWatcher(
+        sess=None, global_step_op=None, start_at_global_step=10,
+        end_at_global_step=30)
+    # Another worker increments the global step between the local steps.
+    for global_step, step_end_time in [(4, 1.), (9, 2.), (12, 3.), (20, 4.),
+                                       (27, 5.)]:
+      watcher.step_done(global_step, step_end_time)
+      self.assertFalse(watcher.done())
+    watcher.step_done(33, 6.5)
+    self.assertTrue(watcher.done())
+    self.assertEqual(watcher.num_steps(), 21)
+    self.assertEqual(watcher.elapsed_time(), 3.5)
+    watcher.step_done(40, 7.)
+    self.assertEqual(watcher.num_steps(), 21)
+
+  def testFetchLossOnlyOnDisplaySteps(self):
+    params = test_util.get_params('testFetchLossOnlyOnDisplaySteps')._replace(
+        fetch_loss_every_step=False, display_every=5)
+    self._train_and_eval_local(params, skip='eval_and_train_from_checkpoint')
+
+    params = params._replace(
+        num_batches=12, num_warmup_batches=2,
+        train_dir=test_util.get_temp_dir('testFetchLossOnlyOnDisplaySteps2'))
+    steps = []
+    real_benchmark_one_step = benchmark_cnn.benchmark_one_step
+
+    def benchmark_one_step(sess, fetches, step, *args, **kwargs):
+      summary_str, lossval = real_benchmark_one_step(sess, fetches, step,
+                                                     *args, **kwargs)
+      steps.append((step, 'average_loss' in fetches, lossval))
+      return summary_str, lossval
+
+    logs = []
+    with test_util.monkey_patch(benchmark_cnn,
+                                benchmark_one_step=benchmark_one_step,
+                                log_fn=test_util.print_and_add_to_list(logs)):
+      stats = benchmark_cnn.BenchmarkCNN(params).run()
+    # The loss is only fetched on display steps and the last step.
+    self.assertEqual([step for step, fetched_loss, _ in steps if fetched_loss],
+                     [0, 4, 9, 11])
+    self.assertEqual([step for step, _, _ in steps], list(range(-2, 12)))
+    for _, fetched_loss, lossval in steps:
+      self.assertEqual(lossval is not None, fetched_loss)
+    # Display steps still log the loss.
+    outputs = test_util.get_training_outputs_from_logs(
+        logs, params.print_training_accuracy)
+    self.assertEqual(len(outputs), 3)
+    self.assertEqual(stats['last_average_loss'], steps[-1][2])
+
+  def testStepsPerRun(self):
+    logs = []
+    params = test_util.get_params('testStepsPerRun')._replace(
+        steps_per_run=4, num_warmup_batches=3, num_batches=10)
+    with test_util.monkey_patch(benchmark_cnn,
+                                log_fn=test_util.print_and_add_to_list(logs)):
+      bench = benchmark_cnn.BenchmarkCNN(params)
+      stats = bench.run()
+    # Both are rounded up to a multiple of --steps_per_run.
+    self.assertEqual(bench.num_warmup_batches, 4)
+    self.assertEqual(stats['num_steps'], 12)
+    outputs = test_util.get_training_outputs_from_logs(
+        logs, params.print_training_accuracy)
+    self.assertEqual(len(outputs), 3)
+    ckpt = tf.train.get_checkpoint_state(params.train_dir)
+    self.assertTrue(ckpt.model_checkpoint_path.endswith('-16'))
+
+  def testStepsPerRunUnsupported(self):
+    params = test_util.get_params('testStepsPerRunUnsupported')._replace(
+        steps_per_run=2, variable_update='replicated')
+    with self.assertRaises(ValueError):
+      benchmark_cnn.BenchmarkCNN(params)
+
+  def testAutoWarmup(self):
+    params = test_util.get_params('testAutoWarmup')._replace(
+        warmup_mode='auto', num_warmup_batches=50, auto_warmup_window=3,
+        auto_warmup_cv_threshold=1e9)
+    stats = benchmark_cnn.BenchmarkCNN(params).run()
+    # With such a high threshold, step times are steady once the window is full.
+    self.assertEqual(stats['num_warmup_batches'], 3)
+    self.assertEqual(stats['num_steps'], params.num_batches)
+
+  def testSteadyStateWarmupDistributed(self):
+    params = test_util.get_params('testSteadyStateWarmupDistributed')._replace(
+        auto_warmup_window=3, auto_warmup_cv_threshold=1e9)
+    warmup_end_step = mock.Mock()
+    chief_warmup = benchmark_cnn.SteadyStateWarmup(
+        mock.Mock(), params, 100, lambda n: True, is_chief=True,
+        warmup_end_step=warmup_end_step, poll_steps=4)
+    for num_steps_run in range(1, 4):
+      self.assertFalse(chief_warmup.step_done(num_steps_run, 1.))
+    # The chief ends warmup far enough ahead of its own step for the other
+    # workers to read the number of warmup steps first.
+    warmup_end_step.load.assert_called_once_with(8, mock.ANY)
+    self.assertEqual(chief_warmup.num_warmup_steps, 8)
+
+    sess = mock.Mock()
+    sess.run.return_value = [-1]
+    worker_warmup = benchmark_cnn.SteadyStateWarmup(
+        sess, params, 100, lambda n: True, is_chief=False,
+        warmup_end_step=warmup_end_step, poll_steps=4)
+    for num_steps_run in range(1, 4):
+      self.assertFalse(worker_warmup.step_done(num_steps_run, 1.))
+    self.assertEqual(sess.run.call_count, 0)
+    sess.run.return_value = [8]
+    for num_steps_run in range(4, 8):
+      self.assertFalse(worker_warmup.step_done(num_steps_run, 1.))
+    self.assertTrue(worker_warmup.step_done(8, 1.))
+    # The variable is only read every `poll_steps` steps.
+    self.assertEqual(sess.run.call_count, 1)
+
+  def testAutoWarmupMaxBatches(self):
+    params = test_util.get_params('testAutoWarmupMaxBatches')._replace(
+        warmup_mode='auto', num_warmup_batches=4, auto_warmup_window=10)
+    stats = benchmark_cnn.BenchmarkCNN(params).run()
+    self.assertEqual(stats['num_warmup_batches'], 4)
+
   def testMoveTrainDir(self):
     params = test_util.get_params('testMoveTrainDir')
     self._train_and_eval_local(params)
@@ -734,6 +1049,79 @@ class TfCnnBenchmarksTest(tf.test.TestCase):
         data_dir=imagenet_dir, data_name='imagenet')
     self._train_and_eval_local(params, use_test_preprocessor=False)
 
+  def testRawImagePreprocessor(self):
+    raw_imagenet_dir = os.path.join(self.get_temp_dir(), 'imagenet_raw')
+    convert_imagenet_to_raw.convert(
+        os.path.join(platforms_util.get_test_data_dir(),
+                     'fake_tf_record_data'),
+        raw_imagenet_dir, image_size=256, num_processes=1)
+    params = test_util.get_params('testRawImagePreprocessor')._replace(
+        data_dir=raw_imagenet_dir, data_name='imagenet',
+        input_preprocessor='raw_uint8', distortions=True)
+    self._train_and_eval_local(params, use_test_preprocessor=False)
+
+  def testImagenetPreprocessorBatchColorDistortion(self):
+    imagenet_dir = os.path.join(platforms_util.get_test_data_dir(),
+                                'fake_tf_record_data')
+    for use_datasets in (True, False):
+      params = test_util.get_params(
+          'testImagenetPreprocessorBatchColorDistortion')._replace(
+              data_dir=imagenet_dir, data_name='imagenet', distortions=True,
+              batch_color_distortion=True, use_datasets=use_datasets)
+      self._train_and_eval_local(params, use_test_preprocessor=False)
+
+  def testDistortColorBatch(self):
+    gray_levels = np.linspace(0.2, 0.8, 8, dtype=np.float32)
+    images = np.tile(gray_levels.reshape([8, 1, 1, 1]), [1, 4, 4, 3])
+    colored_images = np.random.uniform(size=[8, 4, 4, 3]).astype(np.float32)
+    with tf.Graph().as_default(), self.test_session() as sess:
+      distorted_images, distorted_colored_images = sess.run([
+          preprocessing.distort_color_batch(tf.constant(images)),
+          preprocessing.distort_color_batch(tf.constant(colored_images))])
+    # Gray images have no hue or saturation, and constant images are not
+    # changed by contrast, so only the brightness changes.
+    deltas = distorted_images - images
+    self.assertAllClose(deltas, np.tile(deltas[:, :1, :1, :1], [1, 4, 4, 3]),
+                        atol=1e-5)
+    self.assertTrue(np.all(np.abs(deltas) <= 32. / 255. + 1e-5))
+    self.assertEqual(distorted_colored_images.shape, (8, 4, 4, 3))
+    self.assertTrue(np.all(distorted_colored_images >= 0.))
+    self.assertTrue(np.all(distorted_colored_images <= 1.))
+
+  def testDistortColorBatchMatchesDistortColor(self):
+    images = np.random.uniform(0.3, 0.7, size=[2, 4, 4, 3]).astype(np.float32)
+    brightness_delta, saturation_factor, hue_delta, contrast_factor = (
+        0.05, 1.2, 0.3, 0.8)
+    # distort_color_batch() draws the brightness, saturation, hue and contrast
+    # factors in this order.
+    factors = iter([brightness_delta, saturation_factor, hue_delta,
+                    contrast_factor])
+
+    def random_uniform(shape, *args, **kwargs):
+      del args, kwargs  # Unused
+      return tf.fill(shape, next(factors))
+
+    with tf.Graph().as_default(), self.test_session() as sess:
+      with mock.patch.object(tf, 'random_uniform', random_uniform):
+        batch_distorted = preprocessing.distort_color_batch(
+            tf.constant(images))
+      expected = []
+      # Both orders of the changes used by distort_color() give the same
+      # result.
+      for contrast_first in (False, True):
+        image = tf.image.adjust_brightness(tf.constant(images),
+                                           brightness_delta)
+        if contrast_first:
+          image = tf.image.adjust_contrast(image, contrast_factor)
+        image = distort_image_ops.adjust_hsv_in_yiq(
+            image, delta_hue=hue_delta, scale_saturation=saturation_factor)
+        if not contrast_first:
+          image = tf.image.adjust_contrast(image, contrast_factor)
+        expected.append(tf.clip_by_value(image, 0., 1.))
+      batch_distorted, expected = sess.run([batch_distorted, expected])
+    for expected_images in expected:
+      self.assertAllClose(batch_distorted, expected_images, atol=1e-3)
+
   def testImagenetPreprocessorNoDistortions(self):
     imagenet_dir = os.path.join(platforms_util.get_test_data_dir(),
                                 'fake_tf_record_data')
@@ -765,6 +1153,116 @@ class TfCnnBenchmarksTest(tf.test.TestCase):
         data_name='cifar10')
     self._train_and_eval_local(params)
 
+  def _write_fake_cifar10_data(self, test_name):
+    """Writes both versions of CIFAR-10, with 8 images per batch."""
+    data_dir = os.path.join(self.get_temp_dir(), test_name)
+    if not os.path.isdir(data_dir):
+      os.makedirs(data_dir)
+    for batch_name in ['data_batch_%d' % i for i in range(1, 6)] + [
+        'test_batch']:
+      batch = {
+          b'data': np.random.randint(0, 256, size=(8, 32 * 32 * 3),
+                                     dtype=np.uint8),
+          b'labels': list(range(8)),
+      }
+      with open(os.path.join(data_dir, batch_name), 'wb') as f:
+        cPickle.dump(batch, f)
+    convert_cifar10_to_records.convert(data_dir, data_dir)
+    return data_dir
+
+  def testCifar10RealData(self):
+    data_dir = self._write_fake_cifar10_data('testCifar10RealData')
+    params = test_util.get_params('testCifar10RealData')._replace(
+        data_dir=data_dir, data_name='cifar10')
+    self._train_and_eval_local(params, use_test_preprocessor=False)
+    dataset = datasets.create_dataset(data_dir, 'cifar10')
+    record_files = dataset.get_record_files('train')
+    self.assertEqual(len(record_files), 5)
+    with open(record_files[0], 'rb') as f:
+      records = f.read()
+    self.assertEqual(len(records), 8 * dataset.RECORD_BYTES)
+    self.assertEqual(records[dataset.RECORD_BYTES:dataset.RECORD_BYTES + 1],
+                     b'\x01')
+
+  def testCifar10RecordFilesMissing(self):
+    data_dir = os.path.join(self.get_temp_dir(),
+                            'testCifar10RecordFilesMissing')
+    os.makedirs(data_dir)
+    dataset = datasets.create_dataset(data_dir, 'cifar10')
+    with self.assertRaisesRegexp(ValueError, 'convert_cifar10_to_records'):
+      dataset.get_record_files('train')
+    # Nothing is written to --data_dir.
+    self.assertEqual(os.listdir(data_dir), [])
+
+  def testCifar10RealDataWithoutDatasets(self):
+    data_dir = self._write_fake_cifar10_data(
+        'testCifar10RealDataWithoutDatasets')
+    params = test_util.get_params(
+        'testCifar10RealDataWithoutDatasets')._replace(
+            data_dir=data_dir, data_name='cifar10', use_datasets=False)
+    self._train_and_eval_local(params, use_test_preprocessor=False)
+
+  def testInputPipelineOnly(self):
+    imagenet_dir = os.path.join(platforms_util.get_test_data_dir(),
+                                'fake_tf_record_data')
+    for use_datasets in (True, False):
+      params = test_util.get_params('testInputPipelineOnly')._replace(
+          data_dir=imagenet_dir, data_name='imagenet',
+          use_datasets=use_datasets, input_pipeline_only=True, num_batches=4,
+          num_warmup_batches=1)
+      stats = benchmark_cnn.BenchmarkCNN(params).run()
+      self.assertEqual(stats['num_steps'], 4)
+      self.assertGreater(stats['examples_per_sec'], 0)
+      expected_stages = (['read', 'parse', 'decode', 'augment']
+                         if use_datasets else [])
+      self.assertEqual(sorted(stats['stage_examples_per_sec']),
+                       sorted(expected_stages))
+      for examples_per_sec in stats['stage_examples_per_sec'].values():
+        self.assertGreater(examples_per_sec, 0)
+
+  def testInputPipelineOnlyUnsupported(self):
+    imagenet_dir = os.path.join(platforms_util.get_test_data_dir(),
+                                'fake_tf_record_data')
+    params = test_util.get_params('testInputPipelineOnlyUnsupported')._replace(
+        data_dir=imagenet_dir, data_name='imagenet', input_pipeline_only=True)
+    with self.assertRaises(ValueError):
+      benchmark_cnn.BenchmarkCNN(params._replace(data_dir=None))
+    with self.assertRaises(ValueError):
+      benchmark_cnn.BenchmarkCNN(params._replace(eval=True))
+    with self.assertRaisesRegexp(ValueError, '--measurement_phases'):
+      benchmark_cnn.BenchmarkCNN(
+          params._replace(measurement_phases=['num_batches=10']))
+
+  def testCifar10InputPipelineOnly(self):
+    data_dir = self._write_fake_cifar10_data('testCifar10InputPipelineOnly')
+    params = test_util.get_params('testCifar10InputPipelineOnly')._replace(
+        data_dir=data_dir, data_name='cifar10', use_datasets=False,
+        input_pipeline_only=True, num_batches=4, num_warmup_batches=1)
+    stats = benchmark_cnn.BenchmarkCNN(params).run()
+    self.assertGreater(stats['examples_per_sec'], 0)
+    # The queues of tf.train.batch are measured instead of tf.data buffers.
+    self.assertGreaterEqual(stats['prefetch_buffer_utilization'], 0.)
+    self.assertLessEqual(stats['prefetch_buffer_utilization'], 1.)
+
+  def testCifar10DistortImages(self):
+    batch_size = 16
+    preprocessor = preprocessing.Cifar10ImagePreprocessor(
+        batch_size, [[batch_size, 32, 32, 3], [batch_size]], num_splits=1,
+        dtype=tf.float32, train=True, distortions=True, resize_method=None)
+    images = np.random.randint(0, 256, size=(batch_size, 32, 32, 3))
+    padded_images = np.pad(images, [[0, 0], [4, 4], [4, 4], [0, 0]],
+                           'constant')
+    with tf.Graph().as_default(), self.test_session() as sess:
+      distorted_images = sess.run(preprocessor._distort_images(
+          tf.constant(images, dtype=tf.float32)))
+    # Every image must be a window of the padded image, possibly mirrored.
+    for padded_image, distorted_image in zip(padded_images, distorted_images):
+      windows = [padded_image[y:y + 32, x:x + 32]
+                 for y in range(9) for x in range(9)]
+      windows += [window[:, ::-1] for window in windows]
+      self.assertTrue(any(np.allclose(distorted_image, window, atol=1e-3)
+                          for window in windows))
+
   def testShiftRatio(self):
     test_util.monkey_patch_base_cluster_manager()
     params = benchmark_cnn.make_params(
@@ -0,0 +1,230 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Records benchmark results to a local SQLite database.
+
+SQLiteBenchmarkLogger can be used in place of the BenchmarkFileLogger of the
+TensorFlow models repository, on hosts that cannot upload results elsewhere.
+Each run is a row of the `benchmarks` table, whose schema is imported from
+keras_benchmarks/results_backend.py, so both can share a database and be
+queried the same way. The metrics logged during the run, such
+as images/sec, are rows of the `metrics` table.
+
+keras_benchmarks/results_backend.py is only loaded once a database is used, so
+the rest of tf_cnn_benchmarks runs without keras_benchmarks next to it.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import multiprocessing
+import os
+import sqlite3
+import time
+import uuid
+
+import tensorflow as tf
+
+
+_RESULTS_BACKEND_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, 'keras_benchmarks',
+    'results_backend.py')
+
+# keras_benchmarks/results_backend.py, once loaded by _get_results_backend().
+_results_backend = None
+
+
+def _get_results_backend():
+  """Imports keras_benchmarks/results_backend.py by path, on first use.
+
+  It defines the schema of the benchmarks table, which both benchmarks write.
+  Each benchmark runs from its own directory, so keras_benchmarks cannot be
+  imported by name.
+
+  Raises:
+    ValueError: If keras_benchmarks is not next to tf_cnn_benchmarks.
+  """
+  global _results_backend  # pylint: disable=global-statement
+  if _results_backend is not None:
+    return _results_backend
+  if not os.path.exists(_RESULTS_BACKEND_PATH):
+    raise ValueError('The benchmark history database requires %s, from the '
+                     'keras_benchmarks directory next to tf_cnn_benchmarks' %
+                     os.path.normpath(_RESULTS_BACKEND_PATH))
+  try:
+    import importlib.util  # pylint: disable=g-import-not-at-top
+  except ImportError:
+    # Python 2.
+    import imp  # pylint: disable=g-import-not-at-top
+    _results_backend = imp.load_source('keras_results_backend',
+                                       _RESULTS_BACKEND_PATH)
+    return _results_backend
+  spec = importlib.util.spec_from_file_location('keras_results_backend',
+                                                _RESULTS_BACKEND_PATH)
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  _results_backend = module
+  return _results_backend
+
+
+_CREATE_METRICS_TABLE = """
+CREATE TABLE IF NOT EXISTS metrics (
+    test_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    value REAL,
+    unit TEXT,
+    global_step INTEGER,
+    recorded_time REAL NOT NULL)
+"""
+
+# Metrics are inserted in batches of this many rows.
+_METRICS_BATCH_SIZE = 100
+
+
+def _get_cpu_memory_gb():
+  try:
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / 2.**30
+  except (AttributeError, ValueError):
+    return None
+
+
+class SQLiteBenchmarkLogger(object):
+  """Benchmark logger that writes to a SQLite database.
+
+  It has the log_run_info, log_metric and log_evaluation_result methods of
+  BenchmarkFileLogger. The row of the run in the benchmarks table is written by
+  finish(), which takes the stats returned by BenchmarkCNN.run().
+
+  Args:
+    path: The SQLite database. It is created if it does not exist.
+    device: The --device of the run. The GPU count of CPU runs is 0.
+    num_epochs: The --num_epochs of the run, or None if it is set by
+      --num_batches. The benchmarks table only holds whole epochs, so the
+      epochs of the run are left NULL unless this is a whole number.
+  """
+
+  def __init__(self, path, device='gpu', num_epochs=None):
+    self._results_backend = _get_results_backend()
+    self._device = device
+    self._num_epochs = num_epochs
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.isdir(dirname):
+      os.makedirs(dirname)
+    self._connection = sqlite3.connect(path)
+    with self._connection:
+      self._connection.execute(self._results_backend.CREATE_TABLE)
+      self._connection.execute(self._results_backend.CREATE_INDEX)
+      self._connection.execute(_CREATE_METRICS_TABLE)
+    self._test_id = uuid.uuid4().int >> 80
+    self._run_info = None
+    self._pending_metrics = []
+
+  def log_run_info(self, model_name, dataset_name, run_params, test_id=None):
+    """Records the parameters of the run, which are written by finish()."""
+    del dataset_name, test_id  # Not part of the benchmarks table
+    if self._num_epochs is not None and float(self._num_epochs).is_integer():
+      epochs = int(self._num_epochs)
+    else:
+      epochs = None
+    if self._device == 'gpu':
+      gpu_count = len(run_params.get('devices', []))
+    else:
+      gpu_count = 0
+    self._run_info = {
+        'test_name': model_name,
+        'epochs': epochs,
+        'batch_size': run_params.get('batch_size'),
+        'gpu_count': gpu_count,
+    }
+
+  def log_metric(self, name, value, unit=None, global_step=None, extras=None):
+    """Records a metric. Metrics are written in batches."""
+    del extras  # Not part of the metrics table
+    self._pending_metrics.append(
+        (self._test_id, name, float(value), unit,
+         None if global_step is None else int(global_step), time.time()))
+    if len(self._pending_metrics) >= _METRICS_BATCH_SIZE:
+      self._flush_metrics()
+
+  def log_evaluation_result(self, eval_results):
+    """Records each value in the dict `eval_results` as a metric."""
+    global_step = eval_results.get('global_step')
+    for name, value in sorted(eval_results.items()):
+      if name != 'global_step':
+        self.log_metric(name, value, global_step=global_step)
+
+  def _flush_metrics(self):
+    if self._pending_metrics:
+      with self._connection:
+        self._connection.executemany(
+            'INSERT INTO metrics VALUES (?, ?, ?, ?, ?, ?)',
+            self._pending_metrics)
+      self._pending_metrics = []
+
+  def finish(self, stats):
+    """Writes the run and any pending metrics, and closes the database.
+
+    Args:
+      stats: The dict returned by BenchmarkCNN.run(). The total time of the
+        run is the wall time of the measured, non-warm up steps.
+    """
+    self._flush_metrics()
+    if self._run_info is not None:
+      result_fields = self._results_backend.RESULT_FIELDS
+      result = dict.fromkeys(result_fields)
+      result.update(self._run_info)
+      result.update({
+          'test_id': self._test_id,
+          'recorded_time': time.time(),
+          'sample_type': 'images',
+          'backend_type': 'tensorflow',
+          'backend_version': tf.__version__,
+          'cpu_num_cores': multiprocessing.cpu_count(),
+          'cpu_memory': _get_cpu_memory_gb(),
+          'cpu_memory_info': 'GB',
+      })
+      if 'average_wall_time' in stats and 'num_steps' in stats:
+        result['total_time'] = stats['average_wall_time'] * stats['num_steps']
+      with self._connection:
+        self._connection.execute(
+            'INSERT INTO benchmarks (%s) VALUES (%s)' % (
+                ', '.join(result_fields), ', '.join('?' * len(result_fields))),
+            tuple(result[f] for f in result_fields))
+    self.close()
+
+  def close(self):
+    """Closes the database without writing the run. Can be called again."""
+    if self._connection is not None:
+      self._connection.close()
+      self._connection = None
+
+
+def get_recent_runs(path, test_name, backend_type=None, limit=10):
+  """Returns the last `limit` runs of a benchmark in a database, newest first.
+
+  Args:
+    path: The SQLite database.
+    test_name: The name of the benchmark, such as the model name.
+    backend_type: If not None, only runs with this backend are returned.
+    limit: The maximum number of runs to return.
+
+  Returns:
+    A list of dicts with the columns of the benchmarks table.
+  """
+  backend = _get_results_backend().SQLiteBackend(path)
+  try:
+    return backend.query_recent(test_name, backend_type, limit)
+  finally:
+    backend.close()
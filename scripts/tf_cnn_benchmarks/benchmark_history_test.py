@@ -0,0 +1,97 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for tf_cnn_benchmarks.benchmark_history."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import sqlite3
+
+import tensorflow as tf
+
+import benchmark_history
+
+
+class BenchmarkHistoryTest(tf.test.TestCase):
+
+  def _log_run(self, path, model_name, average_wall_time, device='gpu',
+               num_epochs=None):
+    logger = benchmark_history.SQLiteBenchmarkLogger(path, device=device,
+                                                     num_epochs=num_epochs)
+    logger.log_run_info(model_name, 'imagenet',
+                        {'batch_size': 64, 'num_epochs': 0.5,
+                         'devices': ['/%s:0' % device, '/%s:1' % device]})
+    for step in range(1, 251):
+      logger.log_metric('current_examples_per_sec', 100., global_step=step)
+    logger.log_evaluation_result({'top_1_accuracy': 0.5, 'global_step': 250})
+    logger.finish({'num_steps': 200, 'average_wall_time': average_wall_time,
+                   'images_per_sec': 100.})
+
+  def testLogger(self):
+    path = os.path.join(self.get_temp_dir(), 'logger', 'history.db')
+    self._log_run(path, 'resnet50', 0.5)
+    connection = sqlite3.connect(path)
+    try:
+      self.assertEqual(
+          connection.execute('SELECT COUNT(*) FROM metrics').fetchone()[0],
+          251)
+      self.assertEqual(
+          connection.execute('SELECT value, global_step FROM metrics WHERE '
+                             "name = 'top_1_accuracy'").fetchall(),
+          [(0.5, 250)])
+    finally:
+      connection.close()
+    runs = benchmark_history.get_recent_runs(path, 'resnet50')
+    self.assertEqual(len(runs), 1)
+    self.assertEqual(runs[0]['batch_size'], 64)
+    self.assertEqual(runs[0]['gpu_count'], 2)
+    self.assertIsNone(runs[0]['epochs'])
+    self.assertEqual(runs[0]['backend_type'], 'tensorflow')
+    self.assertAllClose(runs[0]['total_time'], 100.)
+
+  def testGetRecentRuns(self):
+    path = os.path.join(self.get_temp_dir(), 'recent', 'history.db')
+    for average_wall_time in (0.1, 0.2, 0.3):
+      self._log_run(path, 'resnet50', average_wall_time)
+    self._log_run(path, 'vgg16', 1.)
+    runs = benchmark_history.get_recent_runs(path, 'resnet50',
+                                             backend_type='tensorflow', limit=2)
+    self.assertAllClose([r['total_time'] for r in runs], [60., 40.])
+    self.assertEqual(benchmark_history.get_recent_runs(path, 'inception3'), [])
+
+  def testEpochsAndGpuCount(self):
+    path = os.path.join(self.get_temp_dir(), 'epochs', 'history.db')
+    self._log_run(path, 'resnet50', 0.5, device='cpu', num_epochs=2.)
+    self._log_run(path, 'vgg16', 0.5, num_epochs=0.5)
+    run, = benchmark_history.get_recent_runs(path, 'resnet50')
+    self.assertEqual(run['epochs'], 2)
+    self.assertEqual(run['gpu_count'], 0)
+    run, = benchmark_history.get_recent_runs(path, 'vgg16')
+    self.assertIsNone(run['epochs'])
+    self.assertEqual(run['gpu_count'], 2)
+
+  def testCloseWithoutFinish(self):
+    path = os.path.join(self.get_temp_dir(), 'failed', 'history.db')
+    logger = benchmark_history.SQLiteBenchmarkLogger(path)
+    logger.log_run_info('resnet50', 'imagenet', {'batch_size': 64})
+    logger.close()
+    logger.close()
+    self.assertEqual(benchmark_history.get_recent_runs(path, 'resnet50'), [])
+
+
+if __name__ == '__main__':
+  tf.test.main()
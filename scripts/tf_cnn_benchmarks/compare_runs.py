@@ -0,0 +1,249 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Compares the throughput of two sets of benchmark runs.
+
+The runs are the results stored by sweep.py in --sweep_results_dir. Each
+configuration in the candidate runs is matched with the configuration in the
+baseline runs that has the same parameters, and its images/sec are compared:
+
+  python compare_runs.py --baseline=/tmp/sweep_before \\
+      --candidate=/tmp/sweep_after
+
+If per-step times were recorded, a Mann-Whitney U test on them tells whether
+the difference is significant. The command exits with status 1 if any
+configuration regressed by more than --regression_threshold.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import json
+import math
+import os
+
+from absl import app
+from absl import flags as absl_flags
+import numpy as np
+
+from cnn_util import log_fn
+
+
+absl_flags.DEFINE_string('baseline', None,
+                         'Directory or file with the results of the baseline '
+                         'runs.')
+absl_flags.DEFINE_string('candidate', None,
+                         'Directory or file with the results of the candidate '
+                         'runs.')
+absl_flags.DEFINE_float('regression_threshold', 0.02,
+                        'Fraction by which the images/sec of a configuration '
+                        'must drop to be a regression.', lower_bound=0.)
+absl_flags.DEFINE_float('significance_level', 0.05,
+                        'A drop is only a regression if the p-value of the '
+                        'difference in per-step times is below this. Runs '
+                        'without per-step times are compared only by '
+                        '--regression_threshold.', lower_bound=0.,
+                        upper_bound=1.)
+
+
+# Parameters that only affect where output is written, which are ignored when
+# matching configurations.
+_OUTPUT_PARAMS = frozenset([
+    'benchmark_log_dir', 'benchmark_test_id', 'eval_dir', 'graph_file',
+    'metrics_log_file', 'partitioned_graph_file_prefix', 'tfprof_file',
+    'trace_file', 'train_dir',
+])
+
+
+# The runs of one configuration.
+RunGroup = collections.namedtuple(
+    'RunGroup',
+    [
+        # The images/sec of each run.
+        'images_per_sec',
+        # The measured per-step times of all runs, as a Numpy array. Empty if
+        # no run recorded them.
+        'step_times',
+    ])
+
+
+# The comparison of one configuration in the baseline and candidate runs.
+Comparison = collections.namedtuple(
+    'Comparison',
+    [
+        # The command line flags of the configuration, as a tuple of strings.
+        'config',
+        'baseline_images_per_sec',
+        'candidate_images_per_sec',
+        # The relative change of images/sec, e.g. -0.05 for a 5% drop.
+        'delta',
+        # Two-sided p-value of the per-step times, or None if either side has
+        # no per-step times.
+        'p_value',
+        'is_regression',
+    ])
+
+
+def get_config_key(flag_strs):
+  """Returns the key by which runs of the same configuration are matched."""
+  return tuple(sorted(
+      f for f in flag_strs
+      if f.lstrip('-').partition('=')[0] not in _OUTPUT_PARAMS))
+
+
+def load_step_times(metrics_log_file):
+  """Returns the times of the measured steps in a --metrics_log_file.
+
+  Warm up steps, which have negative step numbers, are excluded.
+  """
+  step_times = []
+  with open(metrics_log_file) as f:
+    for line in f:
+      record = json.loads(line)
+      if record['step'] >= 0:
+        step_times.append(record['step_time'])
+  return step_times
+
+
+def load_runs(path):
+  """Loads the results in `path`, grouped by configuration.
+
+  Args:
+    path: A result file written by sweep.py, or a directory of them.
+
+  Returns:
+    A dict mapping the key returned by get_config_key to a RunGroup.
+  """
+  if os.path.isdir(path):
+    filenames = [os.path.join(path, f) for f in sorted(os.listdir(path))
+                 if f.endswith('.json')]
+  else:
+    filenames = [path]
+  images_per_sec = collections.defaultdict(list)
+  step_times = collections.defaultdict(list)
+  for filename in filenames:
+    with open(filename) as f:
+      result = json.load(f)
+    # Skip other JSON files, such as the stats files of the runs.
+    if 'flags' not in result or 'stats' not in result:
+      continue
+    key = get_config_key(result['flags'])
+    images_per_sec[key].append(result['stats']['images_per_sec'])
+    if result.get('metrics_log_file'):
+      metrics_log_file = os.path.join(os.path.dirname(filename),
+                                      result['metrics_log_file'])
+      if os.path.exists(metrics_log_file):
+        step_times[key].extend(load_step_times(metrics_log_file))
+  return {key: RunGroup(values, np.array(step_times[key], dtype=np.float64))
+          for key, values in images_per_sec.items()}
+
+
+def _average_ranks(values):
+  """Returns the 1-based ranks of `values`, and the sizes of the ties.
+
+  Tied values all get the average of their ranks.
+  """
+  _, inverse, counts = np.unique(values, return_inverse=True,
+                                 return_counts=True)
+  ends = np.cumsum(counts)
+  return ((ends - counts + 1 + ends) / 2.)[inverse], counts
+
+
+def mann_whitney_u(x, y):
+  """Returns the U statistic of `x` and the two-sided p-value.
+
+  Uses the normal approximation with tie and continuity corrections, which is
+  accurate for the number of steps in a benchmark run.
+  """
+  x = np.asarray(x, dtype=np.float64)
+  y = np.asarray(y, dtype=np.float64)
+  n1, n2 = x.size, y.size
+  if not n1 or not n2:
+    raise ValueError('Both samples must be non-empty')
+  ranks, tie_counts = _average_ranks(np.concatenate([x, y]))
+  u = ranks[:n1].sum() - n1 * (n1 + 1) / 2.
+  n = n1 + n2
+  tie_correction = (tie_counts ** 3 - tie_counts).sum() / (n * (n - 1.))
+  sigma = math.sqrt(n1 * n2 / 12. * (n + 1 - tie_correction))
+  if sigma == 0:
+    return u, 1.
+  z = (abs(u - n1 * n2 / 2.) - 0.5) / sigma
+  return u, min(1., math.erfc(max(z, 0.) / math.sqrt(2.)))
+
+
+def compare(baseline_runs, candidate_runs, regression_threshold=0.02,
+            significance_level=0.05):
+  """Compares every configuration present in both sets of runs.
+
+  Args:
+    baseline_runs: A dict returned by load_runs.
+    candidate_runs: A dict returned by load_runs.
+    regression_threshold: Fraction by which images/sec must drop to be a
+      regression.
+    significance_level: If both configurations have per-step times, the drop is
+      only a regression if the p-value of the step times is below this.
+
+  Returns:
+    A list of Comparisons, sorted by delta so the largest drops come first.
+  """
+  comparisons = []
+  for key in set(baseline_runs) & set(candidate_runs):
+    baseline, candidate = baseline_runs[key], candidate_runs[key]
+    baseline_images_per_sec = float(np.mean(baseline.images_per_sec))
+    candidate_images_per_sec = float(np.mean(candidate.images_per_sec))
+    delta = candidate_images_per_sec / baseline_images_per_sec - 1.
+    p_value = None
+    if baseline.step_times.size and candidate.step_times.size:
+      _, p_value = mann_whitney_u(baseline.step_times, candidate.step_times)
+    is_regression = (delta < -regression_threshold and
+                     (p_value is None or p_value < significance_level))
+    comparisons.append(Comparison(key, baseline_images_per_sec,
+                                  candidate_images_per_sec, delta, p_value,
+                                  is_regression))
+  comparisons.sort(key=lambda c: c.delta)
+  return comparisons
+
+
+def main(positional_arguments):
+  if len(positional_arguments) > 1:
+    raise ValueError('Received unknown positional arguments: %s'
+                     % positional_arguments[1:])
+  flags_obj = absl_flags.FLAGS
+  if not flags_obj.baseline or not flags_obj.candidate:
+    raise ValueError('--baseline and --candidate must be specified')
+  baseline_runs = load_runs(flags_obj.baseline)
+  candidate_runs = load_runs(flags_obj.candidate)
+  comparisons = compare(baseline_runs, candidate_runs,
+                        flags_obj.regression_threshold,
+                        flags_obj.significance_level)
+  num_unmatched = len(set(baseline_runs) ^ set(candidate_runs))
+  if num_unmatched:
+    log_fn('%d configurations are only in one set of runs' % num_unmatched)
+  log_fn('baseline\tcandidate\tdelta\tp-value\tconfiguration')
+  for c in comparisons:
+    log_fn('%.2f\t%.2f\t%+.2f%%\t%s\t%s%s' % (
+        c.baseline_images_per_sec, c.candidate_images_per_sec, c.delta * 100,
+        'n/a' if c.p_value is None else '%.4f' % c.p_value,
+        ' '.join(c.config) or '(defaults)',
+        '\tREGRESSION' if c.is_regression else ''))
+  num_regressions = sum(1 for c in comparisons if c.is_regression)
+  log_fn('%d of %d configurations regressed' %
+         (num_regressions, len(comparisons)))
+  return 1 if num_regressions else 0
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -0,0 +1,93 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for tf_cnn_benchmarks.compare_runs."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+
+import numpy as np
+import tensorflow as tf
+
+import compare_runs
+
+
+class CompareRunsTest(tf.test.TestCase):
+
+  def testMannWhitneyU(self):
+    u, p_value = compare_runs.mann_whitney_u([1., 2., 3.], [4., 5., 6.])
+    self.assertEqual(u, 0.)
+    self.assertAllClose(p_value, 0.0809, atol=1e-4)
+    # Ties are given the average rank.
+    u, p_value = compare_runs.mann_whitney_u([1., 2., 2.], [2., 3., 3.])
+    self.assertEqual(u, 1.)
+    _, p_value = compare_runs.mann_whitney_u([1., 1.], [1., 1.])
+    self.assertEqual(p_value, 1.)
+
+  def testLoadRuns(self):
+    results_dir = os.path.join(self.get_temp_dir(), 'load_runs')
+    os.makedirs(results_dir)
+    with open(os.path.join(results_dir, 'a.json'), 'w') as f:
+      json.dump({'flags': ['--model=resnet50', '--train_dir=/tmp/a'],
+                 'stats': {'images_per_sec': 100.},
+                 'metrics_log_file': 'a.metrics.jsonl'}, f)
+    with open(os.path.join(results_dir, 'a.metrics.jsonl'), 'w') as f:
+      for step, step_time in [(-1, 5.), (0, 0.5), (1, 0.6)]:
+        f.write(json.dumps({'step': step, 'step_time': step_time}) + '\n')
+    with open(os.path.join(results_dir, 'b.json'), 'w') as f:
+      json.dump({'flags': ['--model=resnet50'],
+                 'stats': {'images_per_sec': 110.}}, f)
+    # Stats files of the runs are ignored.
+    with open(os.path.join(results_dir, 'a.stats.json'), 'w') as f:
+      json.dump({'images_per_sec': 100.}, f)
+    runs = compare_runs.load_runs(results_dir)
+    self.assertEqual(list(runs), [('--model=resnet50',)])
+    self.assertEqual(runs[('--model=resnet50',)].images_per_sec, [100., 110.])
+    self.assertAllClose(runs[('--model=resnet50',)].step_times, [0.5, 0.6])
+
+  def testCompare(self):
+    rng = np.random.RandomState(0)
+    step_times = rng.normal(1., 0.01, size=200)
+    baseline_runs = {
+        ('--model=a',): compare_runs.RunGroup([100.], step_times),
+        ('--model=b',): compare_runs.RunGroup([100.], step_times),
+        ('--model=c',): compare_runs.RunGroup([100.], np.array([])),
+        ('--model=d',): compare_runs.RunGroup([100.], np.array([])),
+    }
+    candidate_runs = {
+        # A significant 10% drop.
+        ('--model=a',): compare_runs.RunGroup([90.], step_times * 1.1),
+        # A 9% drop that is within the noise of the per-step times.
+        ('--model=b',): compare_runs.RunGroup([91.], rng.permutation(
+            step_times)),
+        # Without per-step times, only the threshold is used.
+        ('--model=c',): compare_runs.RunGroup([97.], np.array([])),
+        ('--model=d',): compare_runs.RunGroup([99.], np.array([])),
+    }
+    comparisons = compare_runs.compare(baseline_runs, candidate_runs,
+                                       regression_threshold=0.02)
+    regressions = {c.config[0]: c.is_regression for c in comparisons}
+    self.assertEqual(regressions, {'--model=a': True, '--model=b': False,
+                                   '--model=c': True, '--model=d': False})
+    self.assertAllClose(comparisons[0].delta, -0.1)
+    self.assertLess(comparisons[0].p_value, 1e-6)
+    self.assertIsNone(comparisons[-1].p_value)
+
+
+if __name__ == '__main__':
+  tf.test.main()
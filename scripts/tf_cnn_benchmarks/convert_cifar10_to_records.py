@@ -0,0 +1,63 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Converts the Python version of CIFAR-10 to the binary version.
+
+tf_cnn_benchmarks reads CIFAR-10 as uint8 records of the binary version
+(data_batch_N.bin and test_batch.bin), which can also be downloaded directly.
+This script converts the pickled batches of the Python version once:
+
+  python convert_cifar10_to_records.py --input_dir=/data/cifar-10-batches-py \\
+      --output_dir=/data/cifar10_bin
+  python tf_cnn_benchmarks.py --data_name=cifar10 --data_dir=/data/cifar10_bin
+
+--output_dir may be the same as --input_dir.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from absl import app
+from absl import flags as absl_flags
+
+from cnn_util import log_fn
+import datasets
+
+
+absl_flags.DEFINE_string('input_dir', None,
+                         'Directory with the Python version of CIFAR-10.')
+absl_flags.DEFINE_string('output_dir', None,
+                         'Directory to write the binary version to.')
+
+
+def convert(input_dir, output_dir):
+  """Converts the Python version in `input_dir`, and returns the new files."""
+  filenames = datasets.Cifar10Dataset(input_dir).write_record_files(output_dir)
+  log_fn('Wrote %d files to %s' % (len(filenames), output_dir))
+  return filenames
+
+
+def main(positional_arguments):
+  if len(positional_arguments) > 1:
+    raise ValueError('Received unknown positional arguments: %s'
+                     % positional_arguments[1:])
+  flags_obj = absl_flags.FLAGS
+  if not flags_obj.input_dir or not flags_obj.output_dir:
+    raise ValueError('--input_dir and --output_dir must be set')
+  convert(flags_obj.input_dir, flags_obj.output_dir)
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -0,0 +1,199 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Converts ImageNet TFRecords to TFRecords of decoded, resized uint8 images.
+
+Decoding JPEGs is most of the host CPU cost of the ImageNet input pipeline.
+This script decodes every image once, resizes it so its shorter side is
+--image_size, crops the center square, and writes the raw pixels to new shards
+with the same names as the input shards. The shards are converted in parallel
+by a pool of processes. To benchmark with the converted images:
+
+  python convert_imagenet_to_raw.py --input_dir=/data/imagenet \\
+      --output_dir=/data/imagenet_raw --image_size=256
+  python tf_cnn_benchmarks.py --data_name=imagenet \\
+      --data_dir=/data/imagenet_raw --input_preprocessor=raw_uint8
+
+--image_size must be at least the image size of the model. At 256, the
+training set takes about 250 GB.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import multiprocessing
+import os
+import re
+
+from absl import app
+from absl import flags as absl_flags
+import tensorflow as tf
+
+from cnn_util import log_fn
+import preprocessing
+
+
+absl_flags.DEFINE_string('input_dir', None,
+                         'Directory with the ImageNet TFRecords, named '
+                         'train-* and validation-*.')
+absl_flags.DEFINE_string('output_dir', None,
+                         'Directory to write the converted TFRecords to. '
+                         'Shards that already exist are not converted again.')
+absl_flags.DEFINE_integer('image_size', 256,
+                          'Height and width of the converted images.',
+                          lower_bound=1)
+absl_flags.DEFINE_integer('num_processes', None,
+                          'Number of shards to convert in parallel. Defaults '
+                          'to the number of CPUs.', lower_bound=1)
+
+
+# Matches the temporary files convert_shard() writes before renaming them.
+_TMP_FILE_RE = re.compile(r'\.tmp\d+$')
+
+
+def get_shard_names(input_dir):
+  """Returns the sorted names of the ImageNet shards in `input_dir`."""
+  return sorted(
+      os.path.basename(filename)
+      for pattern in ('train-*', 'validation-*')
+      for filename in tf.gfile.Glob(os.path.join(input_dir, pattern))
+      if not _TMP_FILE_RE.search(filename))
+
+
+def decode_and_resize(example_serialized, image_size):
+  """Returns the image of an ImageNet Example as uint8, and its label.
+
+  The image is resized so its shorter side is `image_size`, then cropped to
+  the center `image_size` x `image_size` square.
+  """
+  image_buffer, label, _, _ = preprocessing.parse_example_proto(
+      example_serialized)
+  image = tf.image.decode_jpeg(image_buffer, channels=3)
+  shape = tf.to_float(tf.shape(image)[:2])
+  scale = image_size / tf.reduce_min(shape)
+  # The shorter side may be rounded down, so it is set exactly.
+  new_shape = tf.maximum(tf.to_int32(tf.round(shape * scale)), image_size)
+  image = tf.image.resize_images(image, new_shape,
+                                 tf.image.ResizeMethod.BILINEAR)
+  image = tf.image.resize_image_with_crop_or_pad(image, image_size, image_size)
+  image = tf.cast(tf.clip_by_value(tf.round(image), 0., 255.), tf.uint8)
+  return image, label
+
+
+def make_example(image, label):
+  """Returns the Example parsed by preprocessing.parse_raw_example_proto()."""
+  def _int64_feature(value):
+    return tf.train.Feature(int64_list=tf.train.Int64List(value=[value]))
+  return tf.train.Example(features=tf.train.Features(feature={
+      'image/raw': tf.train.Feature(
+          bytes_list=tf.train.BytesList(value=[image.tobytes()])),
+      'image/height': _int64_feature(image.shape[0]),
+      'image/width': _int64_feature(image.shape[1]),
+      'image/class/label': _int64_feature(label[0]),
+  }))
+
+
+def convert_shard(input_file, output_file, image_size):
+  """Converts one shard, and returns its number of images."""
+  num_images = 0
+  with tf.Graph().as_default():
+    ds = tf.data.TFRecordDataset(input_file)
+    ds = ds.map(lambda value: decode_and_resize(value, image_size))
+    next_element = ds.make_one_shot_iterator().get_next()
+    # Every process converts one shard at a time, so it uses a single thread.
+    config = tf.ConfigProto(intra_op_parallelism_threads=1,
+                            inter_op_parallelism_threads=1)
+    # Write to a temporary file and rename it, so that an interrupted
+    # conversion never leaves a partial shard. The name is unique to this
+    # process, so conversions to the same directory never rename each other's
+    # partial shards.
+    tmp_file = '%s.tmp%d' % (output_file, os.getpid())
+    with tf.Session(config=config) as sess:
+      with tf.python_io.TFRecordWriter(tmp_file) as writer:
+        while True:
+          try:
+            image, label = sess.run(next_element)
+          except tf.errors.OutOfRangeError:
+            break
+          writer.write(make_example(image, label).SerializeToString())
+          num_images += 1
+  tf.gfile.Rename(tmp_file, output_file, overwrite=True)
+  return num_images
+
+
+def _convert_shard_from_args(args):
+  """Calls convert_shard() with a tuple of arguments, for Pool.imap."""
+  return args[0], convert_shard(*args)
+
+
+def convert(input_dir, output_dir, image_size, num_processes=None):
+  """Converts the shards in `input_dir` that are not in `output_dir` yet.
+
+  Args:
+    input_dir: Directory with the ImageNet TFRecords.
+    output_dir: Directory to write the converted TFRecords to.
+    image_size: Height and width of the converted images.
+    num_processes: Number of shards to convert in parallel. Defaults to the
+      number of CPUs. If 1, the shards are converted in this process.
+
+  Returns:
+    A dict mapping the names of the converted shards to their number of
+    images.
+  """
+  shard_names = get_shard_names(input_dir)
+  if not shard_names:
+    raise ValueError('Found no ImageNet TFRecords in %s' % input_dir)
+  if not tf.gfile.IsDirectory(output_dir):
+    tf.gfile.MakeDirs(output_dir)
+  args = [(os.path.join(input_dir, name), os.path.join(output_dir, name),
+           image_size)
+          for name in shard_names
+          if not tf.gfile.Exists(os.path.join(output_dir, name))]
+  log_fn('Converting %d of %d shards' % (len(args), len(shard_names)))
+  num_processes = num_processes or multiprocessing.cpu_count()
+  if num_processes == 1:
+    results = (_convert_shard_from_args(a) for a in args)
+    pool = None
+  else:
+    pool = multiprocessing.Pool(min(num_processes, max(len(args), 1)))
+    results = pool.imap_unordered(_convert_shard_from_args, args)
+  num_images = {}
+  try:
+    for input_file, shard_num_images in results:
+      name = os.path.basename(input_file)
+      num_images[name] = shard_num_images
+      log_fn('Converted %s: %d images (%d/%d shards)' %
+             (name, shard_num_images, len(num_images), len(args)))
+  finally:
+    if pool:
+      # All results have been received, unless a conversion failed.
+      pool.terminate()
+      pool.join()
+  return num_images
+
+
+def main(positional_arguments):
+  if len(positional_arguments) > 1:
+    raise ValueError('Received unknown positional arguments: %s'
+                     % positional_arguments[1:])
+  flags_obj = absl_flags.FLAGS
+  if not flags_obj.input_dir or not flags_obj.output_dir:
+    raise ValueError('--input_dir and --output_dir must be set')
+  convert(flags_obj.input_dir, flags_obj.output_dir, flags_obj.image_size,
+          flags_obj.num_processes)
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -0,0 +1,65 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for tf_cnn_benchmarks.convert_imagenet_to_raw."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+import tensorflow as tf
+
+import convert_imagenet_to_raw
+import preprocessing
+from platforms import util as platforms_util
+
+
+class ConvertImagenetToRawTest(tf.test.TestCase):
+
+  def testConvert(self):
+    input_dir = os.path.join(platforms_util.get_test_data_dir(),
+                             'fake_tf_record_data')
+    output_dir = os.path.join(self.get_temp_dir(), 'imagenet_raw')
+    num_images = convert_imagenet_to_raw.convert(input_dir, output_dir,
+                                                 image_size=64,
+                                                 num_processes=1)
+    shard_names = convert_imagenet_to_raw.get_shard_names(input_dir)
+    self.assertEqual(sorted(num_images), shard_names)
+    self.assertEqual(sorted(os.listdir(output_dir)), shard_names)
+
+    input_file = os.path.join(input_dir, shard_names[0])
+    output_file = os.path.join(output_dir, shard_names[0])
+    self.assertEqual(
+        num_images[shard_names[0]],
+        sum(1 for _ in tf.python_io.tf_record_iterator(input_file)))
+    with tf.Graph().as_default():
+      _, expected_label, _, _ = preprocessing.parse_example_proto(
+          next(tf.python_io.tf_record_iterator(input_file)))
+      image, label = preprocessing.parse_raw_example_proto(
+          next(tf.python_io.tf_record_iterator(output_file)))
+      with self.test_session() as sess:
+        expected_label, image, label = sess.run([expected_label, image, label])
+    self.assertEqual(image.shape, (64, 64, 3))
+    self.assertAllEqual(label, expected_label)
+
+    # Shards that were already converted are skipped.
+    self.assertEqual(
+        convert_imagenet_to_raw.convert(input_dir, output_dir, image_size=64,
+                                        num_processes=1), {})
+
+
+if __name__ == '__main__':
+  tf.test.main()
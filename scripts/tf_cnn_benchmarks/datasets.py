@@ -140,7 +140,8 @@ class ImagenetDataset(ImageDataset):
 class Cifar10Dataset(ImageDataset):
   """Configuration for cifar 10 dataset.
 
-  It will mount all the input images to memory.
+  The images are read from the binary version of the dataset. The Python
+  version is converted to it by convert_cifar10_to_records.py.
   """
 
   def __init__(self, data_dir=None):
@@ -152,33 +153,97 @@ class Cifar10Dataset(ImageDataset):
         queue_runner_required=True,
         num_classes=11)
 
-  def read_data_files(self, subset='train'):
-    """Reads from data file and returns images and labels in a numpy array."""
-    assert self.data_dir, ('Cannot call `read_data_files` when using synthetic '
-                           'data')
+  # Each record of the binary version of the dataset is a label byte followed
+  # by the image, as uint8 in [depth, height, width] order.
+  RECORD_BYTES = 1 + 32 * 32 * 3
+
+  def _get_batch_names(self, subset):
     if subset == 'train':
-      filenames = [
-          os.path.join(self.data_dir, 'data_batch_%d' % i)
-          for i in xrange(1, 6)
-      ]
+      return ['data_batch_%d' % i for i in xrange(1, 6)]
     elif subset == 'validation':
-      filenames = [os.path.join(self.data_dir, 'test_batch')]
+      return ['test_batch']
     else:
       raise ValueError('Invalid data subset "%s"' % subset)
 
-    inputs = []
-    for filename in filenames:
-      with gfile.Open(filename, 'rb') as f:
-        # python2 does not have the encoding parameter
-        encoding = {} if six.PY2 else {'encoding': 'bytes'}
-        inputs.append(cPickle.load(f, **encoding))
+  def _read_pickled_batch(self, batch_name):
+    """Returns the uint8 images and labels of a batch of the Python version."""
+    with gfile.Open(os.path.join(self.data_dir, batch_name), 'rb') as f:
+      # python2 does not have the encoding parameter
+      encoding = {} if six.PY2 else {'encoding': 'bytes'}
+      batch = cPickle.load(f, **encoding)
     # See http://www.cs.toronto.edu/~kriz/cifar.html for a description of the
     # input format.
-    all_images = np.concatenate(
-        [each_input[b'data'] for each_input in inputs]).astype(np.float32)
-    all_labels = np.concatenate(
-        [each_input[b'labels'] for each_input in inputs])
-    return all_images, all_labels
+    return (np.asarray(batch[b'data'], dtype=np.uint8),
+            np.asarray(batch[b'labels'], dtype=np.uint8))
+
+  def get_record_files(self, subset='train'):
+    """Returns the files of the binary version of the dataset in `data_dir`.
+
+    The files are named like those of the binary version of CIFAR-10, which
+    can be used directly. The Python version can be converted once with
+    convert_cifar10_to_records.py. The binary files are 4 times smaller than
+    the images as float32, and can be read with a FixedLengthRecordDataset
+    instead of being embedded in the graph.
+
+    Args:
+      subset: 'train' or 'validation'.
+
+    Returns:
+      A list of file names, each containing records of RECORD_BYTES bytes.
+
+    Raises:
+      ValueError: If a file is missing.
+    """
+    assert self.data_dir, ('Cannot call `get_record_files` when using '
+                           'synthetic data')
+    filenames = [os.path.join(self.data_dir, batch_name + '.bin')
+                 for batch_name in self._get_batch_names(subset)]
+    for filename in filenames:
+      if not gfile.Exists(filename):
+        raise ValueError(
+            '%s does not exist. Convert the Python version of CIFAR-10 to the '
+            'binary version with: python convert_cifar10_to_records.py '
+            '--input_dir=%s --output_dir=<dir>, then set --data_dir=<dir>' %
+            (filename, self.data_dir))
+    return filenames
+
+  def write_record_files(self, output_dir):
+    """Converts the Python version in `data_dir` to the binary version.
+
+    Args:
+      output_dir: The directory to write the binary files to. May be
+        `data_dir`.
+
+    Returns:
+      The list of files written.
+
+    Raises:
+      ValueError: If `output_dir` is not writable.
+    """
+    try:
+      if not gfile.IsDirectory(output_dir):
+        gfile.MakeDirs(output_dir)
+    except tf.errors.OpError as e:
+      raise ValueError('Cannot create %s, choose a writable directory: %s' %
+                       (output_dir, e))
+    filenames = []
+    for subset in ('train', 'validation'):
+      for batch_name in self._get_batch_names(subset):
+        images, labels = self._read_pickled_batch(batch_name)
+        records = np.concatenate([labels[:, np.newaxis], images], axis=1)
+        filename = os.path.join(output_dir, batch_name + '.bin')
+        # Write to a temporary file unique to this process and rename it, so
+        # that concurrent conversions never read or write a partial file.
+        tmp_filename = '%s.tmp%d' % (filename, os.getpid())
+        try:
+          with gfile.Open(tmp_filename, 'wb') as f:
+            f.write(records.tobytes())
+          gfile.Rename(tmp_filename, filename, overwrite=True)
+        except tf.errors.OpError as e:
+          raise ValueError('Cannot write to %s, choose a writable directory: '
+                           '%s' % (output_dir, e))
+        filenames.append(filename)
+    return filenames
 
   def num_examples_per_epoch(self, subset='train'):
     if subset == 'train':
@@ -216,6 +281,7 @@ _SUPPORTED_INPUT_PREPROCESSORS = {
     'imagenet': {
         'default': preprocessing.RecordInputImagePreprocessor,
         'official_models_imagenet': preprocessing.ImagenetPreprocessor,
+        'raw_uint8': preprocessing.RawImagePreprocessor,
     },
     'cifar10': {
         'default': preprocessing.Cifar10ImagePreprocessor
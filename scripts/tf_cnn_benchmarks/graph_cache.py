@@ -0,0 +1,247 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Caches built graphs on local disk, keyed by the params that affect them.
+
+Runs that only differ in params that do not change the graph, such as
+--num_batches or --display_every, build the exact same graph. GraphCache stores
+the MetaGraphDef of a built graph, along with the names of the tensors and ops
+the benchmark needs, so that later runs can import it instead of rebuilding it.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+
+import tensorflow as tf
+
+from google.protobuf import message
+from tensorflow.python.util import nest
+
+
+# Params that do not affect the graph built by BenchmarkCNN._build_graph(). All
+# other params are part of the cache key, so a param that is missing here can
+# only cause cache misses, never the reuse of a different graph.
+RUNTIME_PARAMS = frozenset([
+    'allow_growth',
+    'auto_warmup_cv_threshold',
+    'auto_warmup_window',
+    'autotune_threshold',
+    'benchmark_history_db',
+    'benchmark_log_dir',
+    'benchmark_test_id',
+    'debugger',
+    'display_every',
+    'enable_optimizations',
+    'gpu_memory_frac_for_testing',
+    'graph_cache_dir',
+    'graph_cache_max_size_mb',
+    'graph_file',
+    'host_stats_interval_secs',
+    'kmp_affinity',
+    'kmp_blocktime',
+    'kmp_settings',
+    'max_ckpts_to_keep',
+    'measurement_phases',
+    'metrics_log_file',
+    'num_batches',
+    'num_epochs',
+    'num_inter_threads',
+    'num_intra_threads',
+    'num_warmup_batches',
+    'partitioned_graph_file_prefix',
+    'rewriter_config',
+    'save_model_secs',
+    'startup_profile',
+    'step_anomaly_mad_threshold',
+    'step_anomaly_window',
+    'tfprof_file',
+    'trace_file',
+    'use_chrome_trace_format',
+    'use_python32_barrier',
+    'use_session_callable',
+    'warmup_mode',
+    'xla',
+])
+
+_META_GRAPH_SUFFIX = '.meta'
+_INFO_SUFFIX = '.json'
+
+
+def get_graph_params(params, model_name):
+  """Returns a dict of everything the graph for `params` depends on."""
+  graph_params = {
+      name: value
+      for name, value in params._asdict().items()
+      if name not in RUNTIME_PARAMS
+  }
+  graph_params['model_name'] = model_name
+  graph_params['tensorflow_version'] = tf.__version__
+  # Round-trip through JSON, so the dict compares equal to a loaded one.
+  return json.loads(json.dumps(graph_params, sort_keys=True, default=str))
+
+
+def get_graph_key(graph_params):
+  """Returns the cache key of a dict returned by get_graph_params()."""
+  return hashlib.sha1(
+      json.dumps(graph_params, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def get_names(structure):
+  """Replaces every tensor or op in a nested structure with its name."""
+  return nest.map_structure(
+      lambda element: None if element is None else element.name, structure)
+
+
+def get_graph_elements(graph, names):
+  """Replaces every name in a nested structure with the tensor or op in graph.
+
+  This is the inverse of get_names().
+  """
+  def _get_element(name):
+    if name is None:
+      return None
+    if ':' in name:
+      return graph.get_tensor_by_name(name)
+    return graph.get_operation_by_name(name)
+  return nest.map_structure(_get_element, names)
+
+
+class GraphCache(object):
+  """A directory of MetaGraphDefs, evicted in least recently used order.
+
+  Each entry consists of two files named after the key: the serialized
+  MetaGraphDef, and a JSON file with the graph params the key was computed
+  from and the names of the tensors and ops the caller needs. The JSON file is
+  written last, so an entry without it is incomplete and is ignored. Its
+  modification time is the last time the entry was used.
+
+  Example usage:
+  ```
+  cache = GraphCache('/tmp/graph_cache', max_size_bytes=2**30)
+  graph_params = get_graph_params(params, model_name)
+  names = cache.load(graph_params)
+  if names is None:
+    fetches = build_graph()
+    cache.store(graph_params, tf.train.export_meta_graph(), get_names(fetches))
+  else:
+    fetches = get_graph_elements(tf.get_default_graph(), names)
+  ```
+  """
+
+  def __init__(self, cache_dir, max_size_bytes):
+    self.cache_dir = cache_dir
+    self.max_size_bytes = max_size_bytes
+    if not os.path.isdir(cache_dir):
+      os.makedirs(cache_dir)
+
+  def _path(self, key, suffix):
+    return os.path.join(self.cache_dir, key + suffix)
+
+  def load(self, graph_params):
+    """Imports the cached graph for `graph_params` into the default graph.
+
+    Args:
+      graph_params: A dict returned by get_graph_params().
+
+    Returns:
+      The names passed to store() for this graph, or None if the graph is not
+      in the cache. In that case, the default graph is not modified.
+    """
+    key = get_graph_key(graph_params)
+    info_path = self._path(key, _INFO_SUFFIX)
+    try:
+      with open(info_path) as f:
+        info = json.load(f)
+    except (IOError, OSError, ValueError):
+      return None
+    # Guards against hash collisions, however unlikely.
+    if info['graph_params'] != graph_params:
+      return None
+    # The MetaGraphDef is parsed before anything is imported, so that an entry
+    # evicted or damaged by a concurrent run is a cache miss.
+    meta_graph_def = tf.MetaGraphDef()
+    try:
+      with open(self._path(key, _META_GRAPH_SUFFIX), 'rb') as f:
+        meta_graph_def.ParseFromString(f.read())
+    except (IOError, OSError, message.DecodeError):
+      return None
+    tf.train.import_meta_graph(meta_graph_def, clear_devices=False)
+    os.utime(info_path, None)
+    return info['names']
+
+  def store(self, graph_params, meta_graph_def, names):
+    """Adds a graph to the cache, then evicts entries over the size limit.
+
+    Args:
+      graph_params: A dict returned by get_graph_params().
+      meta_graph_def: The MetaGraphDef of the graph.
+      names: A nested structure of tensor and op names, returned by
+        get_names(), that load() returns.
+    """
+    key = get_graph_key(graph_params)
+    # Write to temporary files unique to this process and rename them, so
+    # that concurrent runs never see or write a partially written entry.
+    tmp_suffix = '.tmp%d' % os.getpid()
+    meta_graph_path = self._path(key, _META_GRAPH_SUFFIX)
+    with open(meta_graph_path + tmp_suffix, 'wb') as f:
+      f.write(meta_graph_def.SerializeToString())
+    os.rename(meta_graph_path + tmp_suffix, meta_graph_path)
+    info_path = self._path(key, _INFO_SUFFIX)
+    with open(info_path + tmp_suffix, 'w') as f:
+      json.dump({'graph_params': graph_params, 'names': names}, f)
+    os.rename(info_path + tmp_suffix, info_path)
+    self.evict(keep_key=key)
+
+  def _entries(self):
+    """Returns a list of (last use time, size in bytes, key) of all entries."""
+    entries = []
+    for filename in os.listdir(self.cache_dir):
+      if not filename.endswith(_INFO_SUFFIX):
+        continue
+      key = filename[:-len(_INFO_SUFFIX)]
+      try:
+        last_used = os.path.getmtime(self._path(key, _INFO_SUFFIX))
+        size = (os.path.getsize(self._path(key, _INFO_SUFFIX)) +
+                os.path.getsize(self._path(key, _META_GRAPH_SUFFIX)))
+      except OSError:
+        # Evicted by a concurrent run.
+        continue
+      entries.append((last_used, size, key))
+    return entries
+
+  def evict(self, keep_key=None):
+    """Removes the least recently used entries until the cache fits.
+
+    Args:
+      keep_key: The key of an entry that is never evicted, even if it alone
+        does not fit.
+    """
+    entries = sorted(self._entries())
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, key in entries:
+      if total_size <= self.max_size_bytes:
+        break
+      if key == keep_key:
+        continue
+      for suffix in (_INFO_SUFFIX, _META_GRAPH_SUFFIX):
+        try:
+          os.remove(self._path(key, suffix))
+        except OSError:
+          pass
+      total_size -= size
@@ -0,0 +1,114 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for tf_cnn_benchmarks.graph_cache."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+import tensorflow as tf
+
+import benchmark_cnn
+import graph_cache
+
+
+def _build_graph():
+  x = tf.Variable(2., name='x')
+  y = tf.multiply(x, 3., name='y')
+  return {'y': y, 'ops': [tf.no_op(name='op')], 'none': None}
+
+
+class GraphCacheTest(tf.test.TestCase):
+
+  def testGraphKey(self):
+    params = benchmark_cnn.make_params(model='trivial')
+    graph_params = graph_cache.get_graph_params(params, 'trivial')
+    key = graph_cache.get_graph_key(graph_params)
+    runtime_params = params._replace(num_batches=7, display_every=3)
+    self.assertEqual(
+        graph_cache.get_graph_key(
+            graph_cache.get_graph_params(runtime_params, 'trivial')), key)
+    for other_params, model_name in ((params._replace(batch_size=7), 'trivial'),
+                                     (params, 'trivial_v2')):
+      self.assertNotEqual(
+          graph_cache.get_graph_key(
+              graph_cache.get_graph_params(other_params, model_name)), key)
+
+  def testStoreAndLoad(self):
+    cache = graph_cache.GraphCache(os.path.join(self.get_temp_dir(), 'load'),
+                                   max_size_bytes=2**20)
+    graph_params = {'batch_size': 1}
+    with tf.Graph().as_default():
+      self.assertIsNone(cache.load(graph_params))
+      fetches = _build_graph()
+      cache.store(graph_params, tf.train.export_meta_graph(),
+                  graph_cache.get_names(fetches))
+    with tf.Graph().as_default() as graph:
+      self.assertIsNone(cache.load({'batch_size': 2}))
+      self.assertFalse(graph.get_operations())
+      names = cache.load(graph_params)
+      fetches = graph_cache.get_graph_elements(graph, names)
+      self.assertEqual(fetches['ops'][0].name, 'op')
+      self.assertIsNone(fetches['none'])
+      self.assertEqual(len(tf.global_variables()), 1)
+      with self.test_session(graph=graph) as sess:
+        sess.run(tf.global_variables_initializer())
+        self.assertAllClose(sess.run(fetches['y']), 6.)
+
+  def testLoadDamagedEntry(self):
+    cache_dir = os.path.join(self.get_temp_dir(), 'damaged')
+    cache = graph_cache.GraphCache(cache_dir, max_size_bytes=2**20)
+    graph_params = {'batch_size': 1}
+    with tf.Graph().as_default():
+      cache.store(graph_params, tf.train.export_meta_graph(),
+                  graph_cache.get_names(_build_graph()))
+    key = graph_cache.get_graph_key(graph_params)
+    with open(os.path.join(cache_dir, key + '.meta'), 'wb') as f:
+      f.write(b'not a MetaGraphDef')
+    with tf.Graph().as_default() as graph:
+      self.assertIsNone(cache.load(graph_params))
+      self.assertFalse(graph.get_operations())
+    # No temporary files are left behind.
+    self.assertEqual(sorted(os.listdir(cache_dir)),
+                     [key + '.json', key + '.meta'])
+
+  def testEviction(self):
+    cache_dir = os.path.join(self.get_temp_dir(), 'eviction')
+    cache = graph_cache.GraphCache(cache_dir, max_size_bytes=2**20)
+    with tf.Graph().as_default():
+      names = graph_cache.get_names(_build_graph())
+      meta_graph_def = tf.train.export_meta_graph()
+    for batch_size in range(3):
+      cache.store({'batch_size': batch_size}, meta_graph_def, names)
+    self.assertEqual(len(os.listdir(cache_dir)), 6)
+    # Entry 1 is the least recently used one.
+    for batch_size, last_used in ((0, 300), (1, 100), (2, 200)):
+      key = graph_cache.get_graph_key({'batch_size': batch_size})
+      os.utime(os.path.join(cache_dir, key + '.json'), (last_used, last_used))
+    total_size = sum(os.path.getsize(os.path.join(cache_dir, f))
+                     for f in os.listdir(cache_dir))
+    cache.max_size_bytes = total_size * 2 // 3
+    cache.evict()
+    self.assertEqual(len(os.listdir(cache_dir)), 4)
+    for batch_size, is_cached in ((0, True), (1, False), (2, True)):
+      with tf.Graph().as_default():
+        names = cache.load({'batch_size': batch_size})
+        self.assertEqual(names is not None, is_cached)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,192 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Samples the host resource usage of this process while a benchmark runs.
+
+When the input pipeline saturates the host, step times alone do not show it.
+HostResourceSampler periodically reads the CPU time, resident set size, number
+of threads and context switches of this process from /proc, so they can be
+reported alongside the benchmark results.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import os
+import threading
+import time
+
+import six
+
+
+_PROC_STAT = '/proc/self/stat'
+_PROC_STATUS = '/proc/self/status'
+
+# A single reading of the resource usage of this process.
+ProcessSample = collections.namedtuple(
+    'ProcessSample',
+    [
+        # Seconds of user and system CPU time used so far.
+        'cpu_time',
+        # Resident set size, in bytes.
+        'rss_bytes',
+        'num_threads',
+        # Number of voluntary and involuntary context switches so far.
+        'voluntary_context_switches',
+        'involuntary_context_switches',
+    ])
+
+
+def is_supported():
+  """Returns True if the resource usage can be read on this host."""
+  return os.path.exists(_PROC_STAT) and os.path.exists(_PROC_STATUS)
+
+
+def parse_proc_stat(contents, clock_ticks_per_sec, page_size):
+  """Returns (cpu_time, rss_bytes, num_threads) from /proc/<pid>/stat."""
+  # The second field is the executable name in parentheses, which may contain
+  # spaces, so the remaining fields are split after the last ')'. The fields
+  # after it start at field 3 of proc(5).
+  fields = contents[contents.rindex(')') + 2:].split()
+  utime, stime = int(fields[11]), int(fields[12])
+  num_threads = int(fields[17])
+  rss_pages = int(fields[21])
+  return ((utime + stime) / clock_ticks_per_sec, rss_pages * page_size,
+          num_threads)
+
+
+def parse_proc_status(contents):
+  """Returns the voluntary and involuntary context switches from status."""
+  values = {}
+  for line in contents.splitlines():
+    key, _, value = line.partition(':')
+    values[key] = value.strip()
+  return (int(values['voluntary_ctxt_switches']),
+          int(values['nonvoluntary_ctxt_switches']))
+
+
+def read_process_sample():
+  """Returns a ProcessSample of the current resource usage of this process."""
+  with open(_PROC_STAT) as f:
+    cpu_time, rss_bytes, num_threads = parse_proc_stat(
+        f.read(), os.sysconf('SC_CLK_TCK'), os.sysconf('SC_PAGE_SIZE'))
+  with open(_PROC_STATUS) as f:
+    voluntary, involuntary = parse_proc_status(f.read())
+  return ProcessSample(cpu_time, rss_bytes, num_threads, voluntary,
+                       involuntary)
+
+
+class _MeanAndMax(object):
+  """Running mean and maximum of a metric."""
+
+  def __init__(self):
+    self.count = 0
+    self.total = 0.
+    self.max = None
+
+  def add(self, value):
+    self.count += 1
+    self.total += value
+    if self.max is None or value > self.max:
+      self.max = value
+
+  def mean(self):
+    return self.total / self.count if self.count else 0.
+
+
+class HostResourceSampler(threading.Thread):
+  """Samples the resource usage of this process every `interval_secs`.
+
+  Only the running mean and maximum of each metric are kept, so the sampler can
+  be left running for arbitrarily long benchmarks.
+
+  CPU utilization is the CPU time used between two samples divided by the wall
+  time between them, so 1.0 means one fully used core. Context switches are
+  reported per second.
+
+  Example usage:
+  ```
+  sampler = HostResourceSampler(interval_secs=1.)
+  sampler.start()
+  run_benchmark()
+  sampler.stop()
+  stats.update(sampler.get_summary())
+  ```
+  """
+
+  def __init__(self, interval_secs):
+    threading.Thread.__init__(self)
+    # Set daemon to true to allow Ctrl + C to terminate all threads.
+    self.daemon = True
+    if interval_secs <= 0:
+      raise ValueError('interval_secs must be positive, but got %s' %
+                       interval_secs)
+    if not is_supported():
+      raise ValueError('Sampling host resources requires %s and %s' %
+                       (_PROC_STAT, _PROC_STATUS))
+    self.interval_secs = interval_secs
+    self._stop_event = threading.Event()
+    self._metrics = collections.OrderedDict(
+        (name, _MeanAndMax()) for name in (
+            'cpu_utilization', 'rss_bytes', 'num_threads',
+            'voluntary_context_switches_per_sec',
+            'involuntary_context_switches_per_sec'))
+    self._last_sample = None
+    self._last_sample_time = None
+
+  def run(self):
+    self._sample()
+    while not self._stop_event.wait(self.interval_secs):
+      self._sample()
+
+  def stop(self):
+    """Takes a final sample, and stops the sampler thread."""
+    self._stop_event.set()
+    self.join()
+    self._sample()
+
+  def _sample(self):
+    sample = read_process_sample()
+    sample_time = time.time()
+    self._metrics['rss_bytes'].add(sample.rss_bytes)
+    self._metrics['num_threads'].add(sample.num_threads)
+    if self._last_sample is not None:
+      elapsed_time = sample_time - self._last_sample_time
+      if elapsed_time > 0:
+        last = self._last_sample
+        self._metrics['cpu_utilization'].add(
+            (sample.cpu_time - last.cpu_time) / elapsed_time)
+        self._metrics['voluntary_context_switches_per_sec'].add(
+            (sample.voluntary_context_switches -
+             last.voluntary_context_switches) / elapsed_time)
+        self._metrics['involuntary_context_switches_per_sec'].add(
+            (sample.involuntary_context_switches -
+             last.involuntary_context_switches) / elapsed_time)
+    self._last_sample = sample
+    self._last_sample_time = sample_time
+
+  def get_summary(self):
+    """Returns a dict of the mean and maximum of each sampled metric.
+
+    The keys are 'host_<metric>_mean' and 'host_<metric>_max'. Metrics that
+    were never sampled are omitted.
+    """
+    summary = {}
+    for name, mean_and_max in six.iteritems(self._metrics):
+      if mean_and_max.count:
+        summary['host_%s_mean' % name] = mean_and_max.mean()
+        summary['host_%s_max' % name] = mean_and_max.max
+    return summary
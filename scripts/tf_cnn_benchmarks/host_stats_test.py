@@ -0,0 +1,70 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for tf_cnn_benchmarks.host_stats."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+import tensorflow as tf
+
+import host_stats
+
+
+class HostStatsTest(tf.test.TestCase):
+
+  def testParseProcStat(self):
+    # The executable name contains a space and a parenthesis.
+    contents = ('1234 (python (3)) S 1 1234 1234 0 -1 4194560 100 0 0 0 '
+                '250 50 0 0 20 0 7 0 100 1000000 300 18446744073709551615')
+    cpu_time, rss_bytes, num_threads = host_stats.parse_proc_stat(
+        contents, clock_ticks_per_sec=100, page_size=4096)
+    self.assertAllClose(cpu_time, 3.)
+    self.assertEqual(rss_bytes, 300 * 4096)
+    self.assertEqual(num_threads, 7)
+
+  def testParseProcStatus(self):
+    contents = ('Name:\tpython\nThreads:\t7\nvoluntary_ctxt_switches:\t42\n'
+                'nonvoluntary_ctxt_switches:\t5\n')
+    self.assertEqual(host_stats.parse_proc_status(contents), (42, 5))
+
+  def testSampler(self):
+    if not host_stats.is_supported():
+      self.skipTest('/proc is not available')
+    sampler = host_stats.HostResourceSampler(interval_secs=0.01)
+    sampler.start()
+    end_time = time.time() + 0.1
+    while time.time() < end_time:
+      pass
+    sampler.stop()
+    summary = sampler.get_summary()
+    self.assertGreater(summary['host_rss_bytes_max'], 0)
+    # The sampler thread itself is running.
+    self.assertGreaterEqual(summary['host_num_threads_max'], 2)
+    self.assertGreater(summary['host_cpu_utilization_max'], 0)
+    self.assertLessEqual(summary['host_cpu_utilization_mean'],
+                         summary['host_cpu_utilization_max'])
+    self.assertIn('host_voluntary_context_switches_per_sec_mean', summary)
+    self.assertIn('host_involuntary_context_switches_per_sec_mean', summary)
+
+  def testInvalidInterval(self):
+    with self.assertRaises(ValueError):
+      host_stats.HostResourceSampler(interval_secs=0)
+
+
+if __name__ == '__main__':
+  tf.test.main()
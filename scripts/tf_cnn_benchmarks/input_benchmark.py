@@ -0,0 +1,163 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Utilities to benchmark the input pipeline without a model.
+
+These are used by --input_pipeline_only. Running the input pipeline on its own
+shows whether it can keep up with the model, and which of its stages is the
+slowest.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+import numpy as np
+from six.moves import xrange  # pylint: disable=redefined-builtin
+import tensorflow as tf
+
+from tensorflow.contrib.data.python.ops import threadpool
+from tensorflow.python.util import nest
+
+
+def run_steps(sess, fetch, num_warmup_steps, num_steps, sample_fetch=None):
+  """Runs `fetch` repeatedly, and returns how long the timed steps took.
+
+  Args:
+    sess: The Session to run `fetch` in.
+    fetch: The op producing one step of input, such as a batch.
+    num_warmup_steps: The number of untimed steps to run first, to fill the
+      buffers of the input pipeline.
+    num_steps: The number of timed steps.
+    sample_fetch: If not None, a tensor that is evaluated with every timed
+      step, such as the occupancy of a buffer.
+
+  Returns:
+    A tuple of the seconds taken by the timed steps, and the list of values
+    of `sample_fetch`, which is empty if `sample_fetch` is None.
+  """
+  for _ in xrange(num_warmup_steps):
+    sess.run(fetch)
+  samples = []
+  start_time = time.time()
+  for _ in xrange(num_steps):
+    if sample_fetch is None:
+      sess.run(fetch)
+    else:
+      samples.append(sess.run([fetch, sample_fetch])[1])
+  return time.time() - start_time, samples
+
+
+def get_stage_batch(ds, batch_size, num_threads=None):
+  """Returns a tensor that reads `batch_size` elements of a stage dataset.
+
+  The elements of the stages before batching may have different shapes, such
+  as decoded images, so the size of each element is batched instead of the
+  element itself.
+
+  Args:
+    ds: A dataset returned by InputPreprocessor.create_stage_datasets().
+    batch_size: The number of elements to read per step.
+    num_threads: If not None, the number of threads of a private threadpool to
+      run `ds` in, like --datasets_num_private_threads.
+
+  Returns:
+    A tensor with the sizes of the next `batch_size` elements of `ds`.
+  """
+  def _get_size(*components):
+    return tf.add_n([tf.size(c) for c in nest.flatten(components)])
+  ds = ds.map(_get_size).batch(batch_size)
+  if num_threads:
+    ds = threadpool.override_threadpool(
+        ds,
+        threadpool.PrivateThreadPool(
+            num_threads, display_name='input_pipeline_thread_pool'))
+  return ds.make_one_shot_iterator().get_next()
+
+
+def add_stats_aggregator(ds):
+  """Records the statistics of `ds`, if this version of TensorFlow can.
+
+  Args:
+    ds: A tf.data.Dataset.
+
+  Returns:
+    A tuple of `ds` with its statistics recorded, and a string tensor with
+    a summary of the statistics. The tensor is None if statistics cannot be
+    recorded.
+  """
+  try:
+    aggregator = tf.data.experimental.StatsAggregator()
+    ds = ds.apply(tf.data.experimental.set_stats_aggregator(aggregator))
+  except AttributeError:
+    return ds, None
+  return ds, aggregator.get_summary()
+
+
+def get_buffer_utilization(summary_str):
+  """Returns the mean occupancy of the prefetch buffers in a summary.
+
+  Args:
+    summary_str: A serialized tf.Summary from the tensor returned by
+      add_stats_aggregator().
+
+  Returns:
+    The mean fraction of the buffers that was full when an element was taken
+    from them, or None if the summary has no buffer statistics.
+  """
+  summary = tf.Summary()
+  summary.ParseFromString(summary_str)
+  total = 0.
+  count = 0.
+  for value in summary.value:
+    if value.tag.endswith('buffer_utilization') and value.HasField('histo'):
+      total += value.histo.sum
+      count += value.histo.num
+  if not count:
+    return None
+  return total / count
+
+
+def get_queue_utilization(queue_runners):
+  """Returns a tensor with the mean occupancy of the queues of queue runners.
+
+  This measures the buffers of the input pipelines that are not built with
+  tf.data.
+
+  Args:
+    queue_runners: A list of tf.train.QueueRunner.
+
+  Returns:
+    A float tensor with the mean fraction of the queues that is full, or None
+    if there are no queues with a bounded capacity.
+  """
+  utilizations = []
+  for queue_runner in queue_runners:
+    queue = queue_runner.queue
+    capacity = queue.queue_ref.op.get_attr('capacity')
+    if capacity > 0:
+      utilizations.append(tf.to_float(queue.size()) / capacity)
+  if not utilizations:
+    return None
+  return tf.reduce_mean(tf.stack(utilizations))
+
+
+def mean_or_none(values):
+  """Returns the mean of `values`, ignoring None, or None if there are none."""
+  values = [v for v in values if v is not None]
+  if not values:
+    return None
+  return float(np.mean(values))
@@ -0,0 +1,78 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for tf_cnn_benchmarks.input_benchmark."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+
+import input_benchmark
+
+
+class InputBenchmarkTest(tf.test.TestCase):
+
+  def testRunSteps(self):
+    with tf.Graph().as_default():
+      counter = tf.Variable(0)
+      increment = tf.assign_add(counter, 1)
+      with self.test_session() as sess:
+        sess.run(counter.initializer)
+        elapsed_time, samples = input_benchmark.run_steps(
+            sess, increment, num_warmup_steps=2, num_steps=3,
+            sample_fetch=counter.read_value())
+        self.assertEqual(sess.run(counter), 5)
+    self.assertGreater(elapsed_time, 0)
+    self.assertEqual(len(samples), 3)
+
+  def testGetStageBatch(self):
+    with tf.Graph().as_default():
+      ds = tf.data.Dataset.range(1, 5).map(
+          lambda x: (tf.zeros(tf.stack([x, 2])), x))
+      sizes = input_benchmark.get_stage_batch(ds, batch_size=2)
+      with self.test_session() as sess:
+        # Every element is the size of an image plus a label.
+        self.assertAllEqual(sess.run(sizes), [3, 5])
+        self.assertAllEqual(sess.run(sizes), [7, 9])
+
+  def testGetBufferUtilization(self):
+    summary = tf.Summary()
+    summary.value.add(tag='Prefetch::buffer_utilization',
+                      histo=tf.HistogramProto(num=4, sum=3.))
+    summary.value.add(tag='Prefetch::buffer_utilization_2',
+                      histo=tf.HistogramProto(num=2, sum=0.))
+    summary.value.add(tag='bytes_read', simple_value=10.)
+    self.assertAllClose(
+        input_benchmark.get_buffer_utilization(summary.SerializeToString()),
+        0.75)
+    self.assertIsNone(
+        input_benchmark.get_buffer_utilization(
+            tf.Summary().SerializeToString()))
+
+  def testGetQueueUtilization(self):
+    with tf.Graph().as_default():
+      queue = tf.FIFOQueue(4, tf.int32)
+      enqueue = queue.enqueue(1)
+      queue_runner = tf.train.QueueRunner(queue, [enqueue])
+      utilization = input_benchmark.get_queue_utilization([queue_runner])
+      with self.test_session() as sess:
+        sess.run(enqueue)
+        self.assertAllClose(sess.run(utilization), 0.25)
+      self.assertIsNone(input_benchmark.get_queue_utilization([]))
+
+
+if __name__ == '__main__':
+  tf.test.main()
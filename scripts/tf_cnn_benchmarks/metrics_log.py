@@ -0,0 +1,132 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Writes structured per-step metrics as JSON lines.
+
+Each record written by StepMetricsWriter is a dict, serialized as one JSON
+object per line, so that runs can be analyzed without parsing the text output
+of tf_cnn_benchmarks.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+import threading
+
+from six.moves import queue
+import tensorflow as tf
+
+from tensorflow.python.platform import gfile
+
+
+# The maximum number of records that can be waiting to be written. If the
+# writer thread falls this far behind, further records are dropped instead of
+# blocking the training loop.
+_DEFAULT_MAX_QUEUE_SIZE = 10000
+
+# How often close() checks that the writer thread is still alive while waiting
+# for room on a full queue.
+_CLOSE_POLL_SECS = 0.1
+
+# Put on the queue to tell the writer thread to exit.
+_STOP_SENTINEL = object()
+
+
+def to_json_value(value):
+  """Converts Numpy scalars, which json cannot serialize, to Python scalars."""
+  if hasattr(value, 'item'):
+    return value.item()
+  raise TypeError('%r is not JSON serializable' % (value,))
+
+
+class StepMetricsWriter(object):
+  """Writes per-step records to a JSONL file from a background thread.
+
+  write() only puts the record on a bounded queue, so it never blocks on disk
+  I/O. Serializing and writing records happens on a separate thread. If the
+  queue is full, the record is dropped and counted in `num_dropped`.
+
+  Example usage:
+  ```
+  writer = StepMetricsWriter('/tmp/metrics.jsonl')
+  for step in range(num_steps):
+    loss = sess.run(loss_op)
+    writer.write({'step': step, 'loss': loss})
+  writer.close()
+  ```
+  """
+
+  def __init__(self, filename, max_queue_size=_DEFAULT_MAX_QUEUE_SIZE):
+    self.filename = filename
+    self.num_written = 0
+    self.num_dropped = 0
+    dirname = os.path.dirname(filename)
+    if dirname and not gfile.Exists(dirname):
+      gfile.MakeDirs(dirname)
+    self._file = gfile.Open(filename, 'w')
+    self._queue = queue.Queue(max_queue_size)
+    self._thread = threading.Thread(target=self._write_loop)
+    # Set daemon to true to allow Ctrl + C to terminate all threads.
+    self._thread.daemon = True
+    self._thread.start()
+
+  def write(self, record):
+    """Enqueues `record`, a dict, to be written. Never blocks."""
+    try:
+      self._queue.put_nowait(record)
+    except queue.Full:
+      self.num_dropped += 1
+
+  def close(self):
+    """Writes all enqueued records, then closes the file."""
+    # The writer thread may have died, for example on a record json cannot
+    # serialize, in which case nothing empties a full queue.
+    while self._thread.is_alive():
+      try:
+        self._queue.put(_STOP_SENTINEL, timeout=_CLOSE_POLL_SECS)
+        break
+      except queue.Full:
+        pass
+    self._thread.join()
+    self._file.close()
+    if self.num_dropped:
+      tf.logging.warn('Dropped %d of %d per-step metric records because the '
+                      'writer to %s could not keep up' %
+                      (self.num_dropped, self.num_dropped + self.num_written,
+                       self.filename))
+
+  def _write_loop(self):
+    done = False
+    while not done:
+      lines = []
+      record = self._queue.get()
+      # Write every record that is already enqueued with a single call, to
+      # avoid a write per step.
+      while True:
+        if record is _STOP_SENTINEL:
+          done = True
+          break
+        lines.append(json.dumps(record, sort_keys=True,
+                                default=to_json_value))
+        try:
+          record = self._queue.get_nowait()
+        except queue.Empty:
+          break
+      if lines:
+        self._file.write('\n'.join(lines) + '\n')
+        self.num_written += len(lines)
+    self._file.flush()
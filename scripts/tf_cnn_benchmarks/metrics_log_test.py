@@ -0,0 +1,77 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for tf_cnn_benchmarks.metrics_log."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+
+import numpy as np
+import tensorflow as tf
+
+import metrics_log
+
+
+class StepMetricsWriterTest(tf.test.TestCase):
+
+  def _read_records(self, filename):
+    with open(filename) as f:
+      return [json.loads(line) for line in f]
+
+  def testWriteRecords(self):
+    filename = os.path.join(self.get_temp_dir(), 'subdir', 'metrics.jsonl')
+    writer = metrics_log.StepMetricsWriter(filename)
+    for step in range(100):
+      writer.write({'step': step, 'loss': np.float32(step / 2.),
+                    'global_step': np.int64(step + 1)})
+    writer.close()
+    records = self._read_records(filename)
+    self.assertEqual(len(records), 100)
+    self.assertEqual(writer.num_written, 100)
+    self.assertEqual(writer.num_dropped, 0)
+    for step, record in enumerate(records):
+      self.assertEqual(record, {'step': step, 'loss': step / 2.,
+                                'global_step': step + 1})
+
+  def testFullQueueDropsRecords(self):
+    filename = os.path.join(self.get_temp_dir(), 'dropped.jsonl')
+    writer = metrics_log.StepMetricsWriter(filename, max_queue_size=1)
+    for step in range(1000):
+      writer.write({'step': step})
+    writer.close()
+    records = self._read_records(filename)
+    self.assertEqual(len(records) + writer.num_dropped, 1000)
+    self.assertEqual(len(records), writer.num_written)
+    steps = [record['step'] for record in records]
+    self.assertEqual(steps, sorted(steps))
+
+  def testCloseAfterWriterThreadDied(self):
+    filename = os.path.join(self.get_temp_dir(), 'died.jsonl')
+    writer = metrics_log.StepMetricsWriter(filename, max_queue_size=1)
+    # json cannot serialize this record, so the writer thread raises and
+    # exits.
+    writer.write({'step': object()})
+    writer._thread.join()
+    writer.write({'step': 1})
+    # The queue is now full, and close() must not wait for room forever.
+    writer.close()
+    self.assertEqual(writer.num_written, 0)
+
+
+if __name__ == '__main__':
+  tf.test.main()
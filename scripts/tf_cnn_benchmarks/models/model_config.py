@@ -20,97 +20,129 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-from functools import partial
-
-from models import alexnet_model
-from models import densenet_model
-from models import googlenet_model
-from models import inception_model
-from models import lenet_model
-from models import mobilenet_v2
-from models import nasnet_model
-from models import official_resnet_model
-from models import overfeat_model
-from models import resnet_model
-from models import ssd_model
-from models import trivial_model
-from models import vgg_model
-from models.experimental import deepspeech
-from models.experimental import official_ncf_model
+import importlib
+
+
+class _LazyModelFunc(object):
+  """A model function that imports its module the first time it is called.
+
+  Importing every model module up front is slow, and some modules, such as
+  ssd_model, pull in further dependencies, so only the module of the model
+  that is run is imported.
+
+  Args:
+    module_name: Name of the module in the models package that defines the
+      model function, such as 'vgg_model'.
+    func_name: Name of the model function or class in that module.
+    *args: Positional arguments to pass to the model function, like
+      functools.partial.
+    **kwargs: Keyword arguments to pass to the model function.
+  """
+
+  def __init__(self, module_name, func_name, *args, **kwargs):
+    self._module_name = 'models.' + module_name
+    self._func_name = func_name
+    self._args = args
+    self._kwargs = kwargs
+
+  def __call__(self, *args, **kwargs):
+    func = getattr(importlib.import_module(self._module_name), self._func_name)
+    return func(*(self._args + args), **dict(self._kwargs, **kwargs))
 
 
 _model_name_to_imagenet_model = {
-    'vgg11': vgg_model.Vgg11Model,
-    'vgg16': vgg_model.Vgg16Model,
-    'vgg19': vgg_model.Vgg19Model,
-    'lenet': lenet_model.Lenet5Model,
-    'googlenet': googlenet_model.GooglenetModel,
-    'overfeat': overfeat_model.OverfeatModel,
-    'alexnet': alexnet_model.AlexnetModel,
-    'trivial': trivial_model.TrivialModel,
-    'inception3': inception_model.Inceptionv3Model,
-    'inception4': inception_model.Inceptionv4Model,
+    'vgg11': _LazyModelFunc('vgg_model', 'Vgg11Model'),
+    'vgg16': _LazyModelFunc('vgg_model', 'Vgg16Model'),
+    'vgg19': _LazyModelFunc('vgg_model', 'Vgg19Model'),
+    'lenet': _LazyModelFunc('lenet_model', 'Lenet5Model'),
+    'googlenet': _LazyModelFunc('googlenet_model', 'GooglenetModel'),
+    'overfeat': _LazyModelFunc('overfeat_model', 'OverfeatModel'),
+    'alexnet': _LazyModelFunc('alexnet_model', 'AlexnetModel'),
+    'trivial': _LazyModelFunc('trivial_model', 'TrivialModel'),
+    'inception3': _LazyModelFunc('inception_model', 'Inceptionv3Model'),
+    'inception4': _LazyModelFunc('inception_model', 'Inceptionv4Model'),
     'official_resnet18_v2':
-        partial(official_resnet_model.ImagenetResnetModel, 18),
+        _LazyModelFunc('official_resnet_model', 'ImagenetResnetModel', 18),
     'official_resnet34_v2':
-        partial(official_resnet_model.ImagenetResnetModel, 34),
+        _LazyModelFunc('official_resnet_model', 'ImagenetResnetModel', 34),
     'official_resnet50_v2':
-        partial(official_resnet_model.ImagenetResnetModel, 50),
+        _LazyModelFunc('official_resnet_model', 'ImagenetResnetModel', 50),
     'official_resnet101_v2':
-        partial(official_resnet_model.ImagenetResnetModel, 101),
+        _LazyModelFunc('official_resnet_model', 'ImagenetResnetModel', 101),
     'official_resnet152_v2':
-        partial(official_resnet_model.ImagenetResnetModel, 152),
+        _LazyModelFunc('official_resnet_model', 'ImagenetResnetModel', 152),
     'official_resnet200_v2':
-        partial(official_resnet_model.ImagenetResnetModel, 200),
+        _LazyModelFunc('official_resnet_model', 'ImagenetResnetModel', 200),
     'official_resnet18':
-        partial(official_resnet_model.ImagenetResnetModel, 18, version=1),
+        _LazyModelFunc('official_resnet_model', 'ImagenetResnetModel', 18,
+                       version=1),
     'official_resnet34':
-        partial(official_resnet_model.ImagenetResnetModel, 34, version=1),
+        _LazyModelFunc('official_resnet_model', 'ImagenetResnetModel', 34,
+                       version=1),
     'official_resnet50':
-        partial(official_resnet_model.ImagenetResnetModel, 50, version=1),
+        _LazyModelFunc('official_resnet_model', 'ImagenetResnetModel', 50,
+                       version=1),
     'official_resnet101':
-        partial(official_resnet_model.ImagenetResnetModel, 101, version=1),
+        _LazyModelFunc('official_resnet_model', 'ImagenetResnetModel', 101,
+                       version=1),
     'official_resnet152':
-        partial(official_resnet_model.ImagenetResnetModel, 152, version=1),
+        _LazyModelFunc('official_resnet_model', 'ImagenetResnetModel', 152,
+                       version=1),
     'official_resnet200':
-        partial(official_resnet_model.ImagenetResnetModel, 200, version=1),
-    'resnet50': resnet_model.create_resnet50_model,
-    'resnet50_v1.5': resnet_model.create_resnet50_v1_5_model,
-    'resnet50_v2': resnet_model.create_resnet50_v2_model,
-    'resnet101': resnet_model.create_resnet101_model,
-    'resnet101_v2': resnet_model.create_resnet101_v2_model,
-    'resnet152': resnet_model.create_resnet152_model,
-    'resnet152_v2': resnet_model.create_resnet152_v2_model,
-    'nasnet': nasnet_model.NasnetModel,
-    'nasnetlarge': nasnet_model.NasnetLargeModel,
-    'mobilenet': mobilenet_v2.MobilenetModel,
-    'ncf': official_ncf_model.NcfModel,
+        _LazyModelFunc('official_resnet_model', 'ImagenetResnetModel', 200,
+                       version=1),
+    'resnet50': _LazyModelFunc('resnet_model', 'create_resnet50_model'),
+    'resnet50_v1.5': _LazyModelFunc('resnet_model',
+                                    'create_resnet50_v1_5_model'),
+    'resnet50_v2': _LazyModelFunc('resnet_model', 'create_resnet50_v2_model'),
+    'resnet101': _LazyModelFunc('resnet_model', 'create_resnet101_model'),
+    'resnet101_v2': _LazyModelFunc('resnet_model', 'create_resnet101_v2_model'),
+    'resnet152': _LazyModelFunc('resnet_model', 'create_resnet152_model'),
+    'resnet152_v2': _LazyModelFunc('resnet_model', 'create_resnet152_v2_model'),
+    'nasnet': _LazyModelFunc('nasnet_model', 'NasnetModel'),
+    'nasnetlarge': _LazyModelFunc('nasnet_model', 'NasnetLargeModel'),
+    'mobilenet': _LazyModelFunc('mobilenet_v2', 'MobilenetModel'),
+    'ncf': _LazyModelFunc('experimental.official_ncf_model', 'NcfModel'),
 }
 
 
 _model_name_to_cifar_model = {
-    'alexnet': alexnet_model.AlexnetCifar10Model,
-    'resnet20': resnet_model.create_resnet20_cifar_model,
-    'resnet20_v2': resnet_model.create_resnet20_v2_cifar_model,
-    'resnet32': resnet_model.create_resnet32_cifar_model,
-    'resnet32_v2': resnet_model.create_resnet32_v2_cifar_model,
-    'resnet44': resnet_model.create_resnet44_cifar_model,
-    'resnet44_v2': resnet_model.create_resnet44_v2_cifar_model,
-    'resnet56': resnet_model.create_resnet56_cifar_model,
-    'resnet56_v2': resnet_model.create_resnet56_v2_cifar_model,
-    'resnet110': resnet_model.create_resnet110_cifar_model,
-    'resnet110_v2': resnet_model.create_resnet110_v2_cifar_model,
-    'trivial': trivial_model.TrivialCifar10Model,
-    'densenet40_k12': densenet_model.create_densenet40_k12_model,
-    'densenet100_k12': densenet_model.create_densenet100_k12_model,
-    'densenet100_k24': densenet_model.create_densenet100_k24_model,
-    'nasnet': nasnet_model.NasnetCifarModel,
+    'alexnet': _LazyModelFunc('alexnet_model', 'AlexnetCifar10Model'),
+    'resnet20': _LazyModelFunc('resnet_model', 'create_resnet20_cifar_model'),
+    'resnet20_v2': _LazyModelFunc('resnet_model',
+                                  'create_resnet20_v2_cifar_model'),
+    'resnet32': _LazyModelFunc('resnet_model', 'create_resnet32_cifar_model'),
+    'resnet32_v2': _LazyModelFunc('resnet_model',
+                                  'create_resnet32_v2_cifar_model'),
+    'resnet44': _LazyModelFunc('resnet_model', 'create_resnet44_cifar_model'),
+    'resnet44_v2': _LazyModelFunc('resnet_model',
+                                  'create_resnet44_v2_cifar_model'),
+    'resnet56': _LazyModelFunc('resnet_model', 'create_resnet56_cifar_model'),
+    'resnet56_v2': _LazyModelFunc('resnet_model',
+                                  'create_resnet56_v2_cifar_model'),
+    'resnet110': _LazyModelFunc('resnet_model', 'create_resnet110_cifar_model'),
+    'resnet110_v2': _LazyModelFunc('resnet_model',
+                                   'create_resnet110_v2_cifar_model'),
+    'trivial': _LazyModelFunc('trivial_model', 'TrivialCifar10Model'),
+    'densenet40_k12': _LazyModelFunc('densenet_model',
+                                     'create_densenet40_k12_model'),
+    'densenet100_k12': _LazyModelFunc('densenet_model',
+                                      'create_densenet100_k12_model'),
+    'densenet100_k24': _LazyModelFunc('densenet_model',
+                                      'create_densenet100_k24_model'),
+    'nasnet': _LazyModelFunc('nasnet_model', 'NasnetCifarModel'),
 }
 
 
 _model_name_to_object_detection_model = {
-    'ssd300': ssd_model.SSD300Model,
-    'trivial': trivial_model.TrivialSSD300Model,
+    'ssd300': _LazyModelFunc('ssd_model', 'SSD300Model'),
+    'trivial': _LazyModelFunc('trivial_model', 'TrivialSSD300Model'),
+}
+
+
+_model_name_to_speech_model = {
+    'deepspeech2': _LazyModelFunc('experimental.deepspeech',
+                                  'DeepSpeech2Model'),
 }
 
 
@@ -121,7 +153,7 @@ def _get_model_map(dataset_name):
   elif dataset_name in ('imagenet', 'synthetic'):
     return _model_name_to_imagenet_model
   elif dataset_name == 'librispeech':
-    return {'deepspeech2': deepspeech.DeepSpeech2Model}
+    return _model_name_to_speech_model
   elif dataset_name == 'coco':
     return _model_name_to_object_detection_model
   else:
@@ -129,7 +161,10 @@ def _get_model_map(dataset_name):
 
 
 def get_model_config(model_name, dataset, params):
-  """Map model name to model network configuration."""
+  """Map model name to model network configuration.
+
+  Only the module of the requested model is imported.
+  """
   model_map = _get_model_map(dataset.name)
   if model_name not in model_map:
     raise ValueError('Invalid model name \'%s\' for dataset \'%s\'' %
@@ -0,0 +1,67 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for model_config."""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+import subprocess
+import sys
+
+import tensorflow as tf
+
+import datasets
+from models import model_config
+from models import trivial_model
+
+
+class ModelConfigTest(tf.test.TestCase):
+
+  def testModelModulesAreImportedLazily(self):
+    # Use a new process, since other tests may have imported the modules.
+    script = ('import sys\n'
+              'from models import model_config\n'
+              'print(sorted(m for m in sys.modules\n'
+              '             if m.startswith("models.")))')
+    output = subprocess.check_output(
+        [sys.executable, '-c', script],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    self.assertEqual(output.decode().strip(), "['models.model_config']")
+
+  def testGetModelConfig(self):
+    dataset = datasets.create_dataset(None, 'imagenet')
+    model = model_config.get_model_config('trivial', dataset, params=None)
+    self.assertIsInstance(model, trivial_model.TrivialModel)
+    model = model_config.get_model_config('official_resnet50', dataset,
+                                          params=None)
+    self.assertEqual(model.get_model_name(), 'official_resnet_50_v1')
+    with self.assertRaises(ValueError):
+      model_config.get_model_config('not_a_model', dataset, params=None)
+
+  def testRegisterModel(self):
+    dataset = datasets.create_dataset(None, 'cifar10')
+    model_config.register_model('trivial_registered', 'cifar10',
+                                trivial_model.TrivialCifar10Model)
+    model = model_config.get_model_config('trivial_registered', dataset,
+                                          params=None)
+    self.assertIsInstance(model, trivial_model.TrivialCifar10Model)
+    with self.assertRaises(ValueError):
+      model_config.register_model('trivial', 'cifar10',
+                                  trivial_model.TrivialCifar10Model)
+
+
+if __name__ == '__main__':
+  tf.test.main()
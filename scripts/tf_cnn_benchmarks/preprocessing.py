@@ -109,6 +109,40 @@ def parse_example_proto(example_serialized):
   return features['image/encoded'], label, bbox, features['image/class/text']
 
 
+def parse_raw_example_proto(example_serialized):
+  """Parses an Example proto written by convert_imagenet_to_raw.py.
+
+  Each Example proto contains the following fields:
+
+    image/raw: <the uint8 pixels of the image, in [height, width, 3] order>
+    image/height: 256
+    image/width: 256
+    image/class/label: 615
+
+  Args:
+    example_serialized: scalar Tensor tf.string containing a serialized
+      Example protocol buffer.
+
+  Returns:
+    image: 3-D uint8 Tensor of shape [height, width, 3].
+    label: Tensor tf.int32 containing the label.
+  """
+  feature_map = {
+      'image/raw': tf.FixedLenFeature([], dtype=tf.string),
+      'image/height': tf.FixedLenFeature([], dtype=tf.int64),
+      'image/width': tf.FixedLenFeature([], dtype=tf.int64),
+      'image/class/label': tf.FixedLenFeature([1], dtype=tf.int64,
+                                              default_value=-1),
+  }
+  features = tf.parse_single_example(example_serialized, feature_map)
+  label = tf.cast(features['image/class/label'], dtype=tf.int32)
+  image_shape = tf.stack([tf.cast(features['image/height'], tf.int32),
+                          tf.cast(features['image/width'], tf.int32), 3])
+  image = tf.reshape(tf.decode_raw(features['image/raw'], tf.uint8),
+                     image_shape)
+  return image, label
+
+
 _RESIZE_METHOD_MAP = {
     'nearest': tf.image.ResizeMethod.NEAREST_NEIGHBOR,
     'bilinear': tf.image.ResizeMethod.BILINEAR,
@@ -467,6 +501,73 @@ def distort_color(image, batch_position=0, distort_color_in_yiq=False,
     return image
 
 
+# The RGB to YIQ and YIQ to RGB matrices of random_hsv_in_yiq.
+_RGB_TO_YIQ = [[0.299, 0.587, 0.114],
+               [0.596, -0.274, -0.322],
+               [0.211, -0.523, 0.312]]
+_YIQ_TO_RGB = [[1.0, 0.956, 0.621],
+               [1.0, -0.272, -0.647],
+               [1.0, -1.107, 1.705]]
+
+
+def distort_color_batch(images, scope=None):
+  """Distort the color of a batch of images.
+
+  Applies the same random brightness, saturation, hue and contrast changes as
+  distort_color() with distort_color_in_yiq=True, but to a whole batch at once.
+  These changes are all affine, and the contrast change only depends on the
+  mean of each channel, so every image is transformed by a single 3x3 color
+  matrix plus an offset, which makes the order of the changes irrelevant.
+
+  Args:
+    images: float32 Tensor of shape [batch_size, height, width, 3]. Tensor
+      values should be in range [0, 1].
+    scope: Optional scope for op_scope.
+  Returns:
+    color-distorted images
+  """
+  with tf.name_scope(scope or 'distort_color_batch'):
+    batch_size = tf.shape(images)[0]
+    brightness_delta = tf.random_uniform([batch_size], -32. / 255., 32. / 255.)
+    saturation_factor = tf.random_uniform([batch_size], 0.5, 1.5)
+    hue_delta = tf.random_uniform([batch_size], -0.2 * math.pi, 0.2 * math.pi)
+    contrast_factor = tf.random_uniform([batch_size], 0.5, 1.5)
+
+    # Rotates the chroma plane by the hue delta and scales it by the
+    # saturation factor, in YIQ space.
+    vsu = saturation_factor * tf.cos(hue_delta)
+    vsw = saturation_factor * tf.sin(hue_delta)
+    zeros = tf.zeros_like(vsu)
+    ones = tf.ones_like(vsu)
+    yiq_matrix = tf.reshape(
+        tf.stack([ones, zeros, zeros, zeros, vsu, -vsw, zeros, vsw, vsu],
+                 axis=1), [-1, 3, 3])
+
+    def _tile(matrix):
+      return tf.tile(tf.expand_dims(tf.constant(matrix), 0),
+                     [batch_size, 1, 1])
+    hsv_matrix = tf.matmul(_tile(_YIQ_TO_RGB),
+                           tf.matmul(yiq_matrix, _tile(_RGB_TO_YIQ)))
+
+    # Adjusting the contrast of x by c gives c * x + (1 - c) * mean(x), so for
+    # the image x, with channel means m, the output is
+    # c * M * x + M * (brightness + (1 - c) * m), where M is hsv_matrix.
+    contrast_factor = tf.reshape(contrast_factor, [-1, 1])
+    channel_means = tf.reduce_mean(images, axis=[1, 2])
+    offset = (tf.reshape(brightness_delta, [-1, 1]) +
+              (1. - contrast_factor) * channel_means)
+    offset = tf.matmul(hsv_matrix, tf.expand_dims(offset, 2))
+    color_matrix = tf.reshape(contrast_factor, [-1, 1, 1]) * hsv_matrix
+
+    pixels = tf.reshape(images, [batch_size, -1, 3])
+    pixels = (tf.matmul(pixels, color_matrix, transpose_b=True) +
+              tf.transpose(offset, [0, 2, 1]))
+    distorted_images = tf.reshape(pixels, tf.shape(images))
+    distorted_images.set_shape(images.shape)
+    # The color distortions do not necessarily clamp.
+    return tf.clip_by_value(distorted_images, 0.0, 1.0)
+
+
 class InputPreprocessor(object):
   """Base class for all model preprocessors."""
 
@@ -586,6 +687,25 @@ class InputPreprocessor(object):
     """Creates a dataset for the benchmark."""
     raise NotImplementedError('Must be implemented by subclass.')
 
+  def create_stage_datasets(self, dataset, subset, num_parallel_calls):
+    """Creates datasets that run the first stages of the input pipeline.
+
+    Used by --input_pipeline_only to find the slowest stage. Each dataset runs
+    all stages up to and including its own, on one example per element, and
+    repeats indefinitely. The last stage, batching, is the dataset returned by
+    create_dataset().
+
+    Args:
+      dataset: The Dataset to read.
+      subset: 'train' or 'validation'.
+      num_parallel_calls: The number of examples to process in parallel.
+
+    Returns:
+      A list of (stage name, tf.data.Dataset) tuples, in pipeline order.
+    """
+    del dataset, subset, num_parallel_calls  # Unused
+    return []
+
   def create_iterator(self, ds):
     ds_iterator = ds.make_initializable_iterator()
     tf.add_to_collection(tf.GraphKeys.TABLE_INITIALIZERS,
@@ -643,7 +763,8 @@ class BaseImagePreprocessor(InputPreprocessor):
                summary_verbosity=0,
                distort_color_in_yiq=True,
                fuse_decode_and_crop=True,
-               match_mlperf=False):
+               match_mlperf=False,
+               batch_color_distortion=False):
     super(BaseImagePreprocessor, self).__init__(batch_size, output_shapes)
     image_shape = output_shapes[0]
     # image_shape is in form (batch_size, height, width, depth)
@@ -658,6 +779,7 @@ class BaseImagePreprocessor(InputPreprocessor):
     self.distortions = distortions
     self.distort_color_in_yiq = distort_color_in_yiq
     self.fuse_decode_and_crop = fuse_decode_and_crop
+    self.batch_color_distortion = batch_color_distortion
     if self.batch_size % self.num_splits != 0:
       raise ValueError(
           ('batch_size must be a multiple of num_splits: '
@@ -681,6 +803,31 @@ class BaseImagePreprocessor(InputPreprocessor):
   def preprocess(self, image_buffer, bbox, batch_position):
     raise NotImplementedError('Must be implemented by subclass.')
 
+  def distort_color_in_batches(self):
+    """Whether the color of batches is distorted by preprocess_batch()."""
+    return False
+
+  def _create_stage_record_dataset(self, dataset, subset):
+    """Returns the records of `subset`, read like create_dataset() does."""
+    glob_pattern = dataset.tf_record_pattern(subset)
+    file_names = gfile.Glob(glob_pattern)
+    if not file_names:
+      raise ValueError('Found no files in --data_dir matching: {}'
+                       .format(glob_pattern))
+    ds = tf.data.TFRecordDataset.list_files(file_names)
+    ds = ds.apply(interleave_ops.parallel_interleave(tf.data.TFRecordDataset,
+                                                     cycle_length=10))
+    return ds.repeat()
+
+  def _add_batch_positions(self, ds):
+    """Pairs every element with its position in a batch, as create_dataset()."""
+    counter = tf.data.Dataset.range(self.batch_size).repeat()
+    return tf.data.Dataset.zip((ds, counter))
+
+  def preprocess_batch(self, images, labels):
+    """Preprocesses a batch returned by parse_and_preprocess()."""
+    raise NotImplementedError('Must be implemented by subclass.')
+
   def create_dataset(self,
                      batch_size,
                      num_splits,
@@ -726,6 +873,8 @@ class BaseImagePreprocessor(InputPreprocessor):
             map_func=self.parse_and_preprocess,
             batch_size=batch_size_per_split,
             num_parallel_batches=num_splits))
+    if self.distort_color_in_batches():
+      ds = ds.map(self.preprocess_batch, num_parallel_calls=num_splits)
     ds = ds.prefetch(buffer_size=num_splits)
     if num_threads:
       ds = threadpool.override_threadpool(
@@ -738,14 +887,22 @@ class BaseImagePreprocessor(InputPreprocessor):
 class RecordInputImagePreprocessor(BaseImagePreprocessor):
   """Preprocessor for images with RecordInput format."""
 
+  def distort_color_in_batches(self):
+    return self.train and self.distortions and self.batch_color_distortion
+
   def preprocess(self, image_buffer, bbox, batch_position):
     """Preprocessing image_buffer as a function of its batch position."""
     if self.train:
+      distort_color_in_batches = self.distort_color_in_batches()
       image = train_image(image_buffer, self.height, self.width, bbox,
-                          batch_position, self.resize_method, self.distortions,
+                          batch_position, self.resize_method,
+                          self.distortions and not distort_color_in_batches,
                           None, summary_verbosity=self.summary_verbosity,
                           distort_color_in_yiq=self.distort_color_in_yiq,
                           fuse_decode_and_crop=self.fuse_decode_and_crop)
+      if distort_color_in_batches:
+        # preprocess_batch() distorts the color and normalizes the batch.
+        return tf.cast(image, tf.float32)
     else:
       image = tf.image.decode_jpeg(
           image_buffer, channels=3, dct_method='INTEGER_FAST')
@@ -756,14 +913,24 @@ class RecordInputImagePreprocessor(BaseImagePreprocessor):
 
     # image = tf.cast(image, tf.uint8) # HACK TESTING
 
+    return self._normalize(image)
+
+  def _normalize(self, images):
     if self.match_mlperf:
       mlperf.logger.log(key=mlperf.tags.INPUT_MEAN_SUBTRACTION,
                         value=_CHANNEL_MEANS)
-      normalized = image - _CHANNEL_MEANS
+      normalized = images - _CHANNEL_MEANS
     else:
-      normalized = normalized_image(image)
+      normalized = normalized_image(images)
     return tf.cast(normalized, self.dtype)
 
+  def preprocess_batch(self, images, labels):
+    """Distorts the color of a batch of training images, and normalizes it."""
+    assert self.distort_color_in_batches()
+    # Images values are expected to be in [0,1] for color distortion.
+    images = distort_color_batch(images / 255.) * 255.
+    return self._normalize(images), labels
+
   def minibatch(self,
                 dataset,
                 subset,
@@ -823,14 +990,81 @@ class RecordInputImagePreprocessor(BaseImagePreprocessor):
                    self.depth])
         labels[split_index] = tf.reshape(labels[split_index],
                                          [self.batch_size_per_split])
+        if not params.use_datasets and self.distort_color_in_batches():
+          images[split_index], labels[split_index] = self.preprocess_batch(
+              images[split_index], labels[split_index])
       return images, labels
 
+  def create_stage_datasets(self, dataset, subset, num_parallel_calls):
+    records = self._create_stage_record_dataset(dataset, subset)
+    parsed = records.map(lambda value: parse_example_proto(value)[:2],
+                         num_parallel_calls=num_parallel_calls)
+
+    def _decode(image_buffer, label):
+      image = tf.image.decode_jpeg(image_buffer, channels=3,
+                                   dct_method='INTEGER_FAST')
+      return image, label
+    decoded = parsed.map(_decode, num_parallel_calls=num_parallel_calls)
+    # preprocess() decodes the JPEG itself, fused with the crop when training,
+    # so this stage starts from the records.
+    augmented = self._add_batch_positions(records).map(
+        self.parse_and_preprocess, num_parallel_calls=num_parallel_calls)
+    return [('read', records), ('parse', parsed), ('decode', decoded),
+            ('augment', augmented)]
+
   def supports_datasets(self):
     return True
 
 
+class RawImagePreprocessor(RecordInputImagePreprocessor):
+  """Preprocessor for images converted by convert_imagenet_to_raw.py.
+
+  The images are already decoded and resized, so the expensive JPEG decoding is
+  skipped. Training images are randomly cropped to the model's image size and
+  flipped, then color distorted if --distortions is set. Evaluation images are
+  cropped at the center. The images must be at least as large as the model's
+  image size.
+  """
+
+  def parse_and_preprocess(self, value, batch_position):
+    image, label = parse_raw_example_proto(value)
+    return self.preprocess_raw_image(image, batch_position), label
+
+  def create_stage_datasets(self, dataset, subset, num_parallel_calls):
+    records = self._create_stage_record_dataset(dataset, subset)
+    parsed = records.map(parse_raw_example_proto,
+                         num_parallel_calls=num_parallel_calls)
+    augmented = self._add_batch_positions(records).map(
+        self.parse_and_preprocess, num_parallel_calls=num_parallel_calls)
+    return [('read', records), ('parse', parsed), ('augment', augmented)]
+
+  def preprocess_raw_image(self, image, batch_position):
+    """Preprocesses a uint8 image as a function of its batch position."""
+    if self.train:
+      image = tf.random_crop(image, [self.height, self.width, 3])
+      image = tf.image.random_flip_left_right(image)
+      image = tf.cast(image, tf.float32)
+      if self.distort_color_in_batches():
+        # preprocess_batch() distorts the color and normalizes the batch.
+        return image
+      if self.distortions:
+        # Images values are expected to be in [0,1] for color distortion.
+        image = distort_color(image / 255., batch_position,
+                              distort_color_in_yiq=self.distort_color_in_yiq)
+        image *= 255.
+    else:
+      image = tf.image.resize_image_with_crop_or_pad(image, self.height,
+                                                     self.width)
+      image = tf.cast(image, tf.float32)
+    return self._normalize(image)
+
+
 class ImagenetPreprocessor(RecordInputImagePreprocessor):
 
+  def distort_color_in_batches(self):
+    # The official preprocessing does not distort colors.
+    return False
+
   def preprocess(self, image_buffer, bbox, batch_position):
     # pylint: disable=g-import-not-at-top
     try:
@@ -849,11 +1083,21 @@ class ImagenetPreprocessor(RecordInputImagePreprocessor):
     return tf.cast(image, self.dtype)
 
 
+# The batches of CIFAR-10 are already in random order, so a buffer of a fifth
+# of the train subset mixes them well enough. It is filled before the first
+# step, so a buffer of the whole subset would delay startup.
+_CIFAR10_SHUFFLE_BUFFER_SIZE = 10000
+
+
 class Cifar10ImagePreprocessor(BaseImagePreprocessor):
-  """Preprocessor for Cifar10 input images."""
+  """Preprocessor for Cifar10 input images.
+
+  Images are preprocessed a batch at a time, so the number of ops does not
+  depend on the batch size.
+  """
 
-  def _distort_image(self, image):
-    """Distort one image for training a network.
+  def _distort_images(self, images):
+    """Distort a batch of images for training a network.
 
     Adopted the standard data augmentation scheme that is widely used for
     this dataset: the images are first zero-padded with 4 pixels on each side,
@@ -861,87 +1105,143 @@ class Cifar10ImagePreprocessor(BaseImagePreprocessor):
     are then horizontally mirrored.
 
     Args:
-      image: input image.
+      images: float32 tensor of shape [batch_size, height, width, depth].
     Returns:
-      distorted image.
+      distorted images.
     """
-    image = tf.image.resize_image_with_crop_or_pad(
-        image, self.height + 8, self.width + 8)
-    distorted_image = tf.random_crop(image,
-                                     [self.height, self.width, self.depth])
-    # Randomly flip the image horizontally.
-    distorted_image = tf.image.random_flip_left_right(distorted_image)
-    if self.summary_verbosity >= 3:
-      tf.summary.image('distorted_image', tf.expand_dims(distorted_image, 0))
-    return distorted_image
-
-  def _eval_image(self, image):
-    """Get the image for model evaluation."""
-    distorted_image = tf.image.resize_image_with_crop_or_pad(
-        image, self.width, self.height)
-    if self.summary_verbosity >= 3:
-      tf.summary.image('cropped.image', tf.expand_dims(distorted_image, 0))
-    return distorted_image
+    padding = 4
+    images = tf.pad(images, [[0, 0], [padding, padding], [padding, padding],
+                             [0, 0]])
+    batch_size = tf.shape(images)[0]
+    offsets = tf.to_float(tf.random_uniform(
+        [batch_size, 2], maxval=2 * padding + 1, dtype=tf.int32))
+    # crop_and_resize crops every image in a single op. Boxes whose corners are
+    # on pixel centers, one pixel apart per output pixel, copy the pixels
+    # exactly. Swapping the left and right edges of a box mirrors the crop.
+    padded_height = self.height + 2 * padding - 1.
+    padded_width = self.width + 2 * padding - 1.
+    y1 = offsets[:, 0] / padded_height
+    y2 = (offsets[:, 0] + self.height - 1) / padded_height
+    left = offsets[:, 1] / padded_width
+    right = (offsets[:, 1] + self.width - 1) / padded_width
+    flip = tf.random_uniform([batch_size]) < 0.5
+    x1 = tf.where(flip, right, left)
+    x2 = tf.where(flip, left, right)
+    return tf.image.crop_and_resize(
+        images, tf.stack([y1, x1, y2, x2], axis=1), tf.range(batch_size),
+        [self.height, self.width])
+
+  def preprocess_batch(self, records):
+    """Preprocesses a batch of records of the binary CIFAR-10 format.
 
-  def preprocess(self, raw_image):
-    """Preprocessing raw image."""
-    if self.summary_verbosity >= 3:
-      tf.summary.image('raw.image', tf.expand_dims(raw_image, 0))
+    Args:
+      records: string tensor of shape [batch_size], where each record is a
+        label byte followed by the image, in [depth, height, width] order.
+    Returns:
+      A tuple of the images, as a tensor of shape [batch_size, height, width,
+      depth] and type self.dtype, and the int32 labels.
+    """
+    records = tf.decode_raw(records, tf.uint8)
+    labels = tf.cast(records[:, 0], tf.int32)
+    images = tf.reshape(records[:, 1:],
+                        [-1, self.depth, self.height, self.width])
+    images = tf.cast(tf.transpose(images, [0, 2, 3, 1]), tf.float32)
     if self.train and self.distortions:
-      image = self._distort_image(raw_image)
-    else:
-      image = self._eval_image(raw_image)
-    normalized = normalized_image(image)
-    return tf.cast(normalized, self.dtype)
+      images = self._distort_images(images)
+    normalized = normalized_image(images)
+    # Keep the static batch size, which the reshape and the crop lose.
+    normalized.set_shape(records.shape[:1].concatenate(
+        [self.height, self.width, self.depth]))
+    return tf.cast(normalized, self.dtype), labels
 
   def minibatch(self,
                 dataset,
                 subset,
                 params,
                 shift_ratio=-1):
-    # TODO(jsimsa): Implement datasets code path
-    del shift_ratio, params
+    del shift_ratio  # Not used when using datasets instead of data_flow_ops
     with tf.name_scope('batch_processing'):
-      all_images, all_labels = dataset.read_data_files(subset)
-      all_images = tf.constant(all_images)
-      all_labels = tf.constant(all_labels)
-      input_image, input_label = tf.train.slice_input_producer(
-          [all_images, all_labels])
-      input_image = tf.cast(input_image, self.dtype)
-      input_label = tf.cast(input_label, tf.int32)
-      # Ensure that the random shuffling has good mixing properties.
-      min_fraction_of_examples_in_queue = 0.4
-      min_queue_examples = int(dataset.num_examples_per_epoch(subset) *
-                               min_fraction_of_examples_in_queue)
-      raw_images, raw_labels = tf.train.shuffle_batch(
-          [input_image, input_label], batch_size=self.batch_size,
-          capacity=min_queue_examples + 3 * self.batch_size,
-          min_after_dequeue=min_queue_examples)
-
-      images = [[] for i in range(self.num_splits)]
-      labels = [[] for i in range(self.num_splits)]
-
-      # Create a list of size batch_size, each containing one image of the
-      # batch. Without the unstack call, raw_images[i] would still access the
-      # same image via a strided_slice op, but would be slower.
-      raw_images = tf.unstack(raw_images, axis=0)
-      raw_labels = tf.unstack(raw_labels, axis=0)
-      for i in xrange(self.batch_size):
-        split_index = i % self.num_splits
-        # The raw image read from data has the format [depth, height, width]
-        # reshape to the format returned by minibatch.
-        raw_image = tf.reshape(raw_images[i],
-                               [dataset.depth, dataset.height, dataset.width])
-        raw_image = tf.transpose(raw_image, [1, 2, 0])
-        image = self.preprocess(raw_image)
-        images[split_index].append(image)
+      if params.use_datasets:
+        ds = self.create_dataset(
+            self.batch_size, self.num_splits, self.batch_size_per_split,
+            dataset, subset, self.train,
+            datasets_repeat_cached_sample=params.datasets_repeat_cached_sample,
+            num_threads=params.datasets_num_private_threads,
+            datasets_use_caching=params.datasets_use_caching)
+        ds_iterator = self.create_iterator(ds)
+        images = [None] * self.num_splits
+        labels = [None] * self.num_splits
+        for d in xrange(self.num_splits):
+          images[d], labels[d] = ds_iterator.get_next()
+      else:
+        # The records are read from files instead of being embedded in the
+        # graph as constants, and stay uint8 until they are batched.
+        records = tf.data.FixedLengthRecordDataset(
+            dataset.get_record_files(subset), dataset.RECORD_BYTES)
+        records = records.apply(tf.contrib.data.shuffle_and_repeat(
+            buffer_size=_CIFAR10_SHUFFLE_BUFFER_SIZE))
+        record = records.make_one_shot_iterator().get_next()
+        records = tf.train.batch([record], batch_size=self.batch_size,
+                                 capacity=3 * self.batch_size)
+        all_images, all_labels = self.preprocess_batch(records)
+        images = tf.split(all_images, self.num_splits)
+        labels = tf.split(all_labels, self.num_splits)
+      if self.summary_verbosity >= 3:
+        tf.summary.image('images', images[0])
+      return images, labels
 
-        labels[split_index].append(raw_labels[i])
+  def create_dataset(self,
+                     batch_size,
+                     num_splits,
+                     batch_size_per_split,
+                     dataset,
+                     subset,
+                     train,
+                     datasets_repeat_cached_sample,
+                     num_threads=None,
+                     datasets_use_caching=False,
+                     datasets_parallel_interleave_cycle_length=None,
+                     datasets_sloppy_parallel_interleave=False,
+                     datasets_parallel_interleave_prefetch=None):
+    """Creates a dataset for the benchmark."""
+    # There are at most six files, which are read one after the other.
+    del datasets_parallel_interleave_cycle_length
+    del datasets_sloppy_parallel_interleave
+    del datasets_parallel_interleave_prefetch
+    assert self.supports_datasets()
+    ds = tf.data.FixedLengthRecordDataset(dataset.get_record_files(subset),
+                                          dataset.RECORD_BYTES)
+    if datasets_repeat_cached_sample:
+      # Repeat a single sample element indefinitely to emulate memory-speed IO.
+      ds = ds.take(1).cache().repeat()
+    if datasets_use_caching:
+      ds = ds.cache()
+    if train:
+      ds = ds.apply(tf.contrib.data.shuffle_and_repeat(
+          buffer_size=_CIFAR10_SHUFFLE_BUFFER_SIZE))
+    else:
+      ds = ds.repeat()
+    # Batch the raw records first, so the images are decoded and distorted a
+    # whole batch at a time.
+    ds = ds.batch(batch_size_per_split, drop_remainder=True)
+    ds = ds.map(self.preprocess_batch, num_parallel_calls=num_splits)
+    ds = ds.prefetch(buffer_size=num_splits)
+    if num_threads:
+      ds = threadpool.override_threadpool(
+          ds,
+          threadpool.PrivateThreadPool(
+              num_threads, display_name='input_pipeline_thread_pool'))
+    return ds
 
-      for split_index in xrange(self.num_splits):
-        images[split_index] = tf.parallel_stack(images[split_index])
-        labels[split_index] = tf.parallel_stack(labels[split_index])
-      return images, labels
+  def create_stage_datasets(self, dataset, subset, num_parallel_calls):
+    # The images are decoded and distorted a batch at a time, when batching.
+    del num_parallel_calls  # Unused
+    records = tf.data.FixedLengthRecordDataset(
+        dataset.get_record_files(subset), dataset.RECORD_BYTES)
+    return [('read', records.repeat())]
+
+  def supports_datasets(self):
+    return True
 
 
 class COCOPreprocessor(BaseImagePreprocessor):
@@ -1153,12 +1453,14 @@ class TestImagePreprocessor(BaseImagePreprocessor):
                summary_verbosity=0,
                distort_color_in_yiq=False,
                fuse_decode_and_crop=False,
-               match_mlperf=False):
+               match_mlperf=False,
+               batch_color_distortion=False):
     super(TestImagePreprocessor, self).__init__(
         batch_size, output_shapes, num_splits, dtype, train, distortions,
         resize_method, shift_ratio, summary_verbosity=summary_verbosity,
         distort_color_in_yiq=distort_color_in_yiq,
-        fuse_decode_and_crop=fuse_decode_and_crop, match_mlperf=match_mlperf)
+        fuse_decode_and_crop=fuse_decode_and_crop, match_mlperf=match_mlperf,
+        batch_color_distortion=batch_color_distortion)
     self.expected_subset = None
 
   def set_fake_data(self, fake_images, fake_labels):
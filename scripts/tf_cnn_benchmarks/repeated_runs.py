@@ -0,0 +1,193 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Runs the same benchmark several times and summarizes the results.
+
+Throughput on a shared host can vary by several percent between runs, so a
+single images/sec number is not enough to compare two configurations. Each
+repeat runs tf_cnn_benchmarks.py in a fresh process, so that no state, such as
+the autotuning results or the memory allocator, is shared between runs.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import six
+
+import flags
+import metrics_log
+from cnn_util import log_fn
+
+
+_TF_CNN_BENCHMARKS_SCRIPT = os.path.join(os.path.dirname(__file__),
+                                         'tf_cnn_benchmarks.py')
+
+
+def get_flags_from_params(params):
+  """Returns command line flags that reproduce `params`.
+
+  Only parameters whose values differ from their defaults in flags.param_specs
+  are returned.
+
+  Args:
+    params: Params tuple, typically created by make_params or
+      make_params_from_flags.
+
+  Returns:
+    A list of strings such as '--batch_size=64'.
+  """
+  flag_strs = []
+  for name, spec in sorted(six.iteritems(flags.param_specs)):
+    value = getattr(params, name)
+    if value == spec.default_value or value is None:
+      continue
+    if spec.flag_type == 'boolean':
+      flag_strs.append('--%s%s' % ('' if value else 'no', name))
+    elif spec.flag_type == 'list':
+      flag_strs.append('--%s=%s' % (name, ','.join(map(str, value))))
+    else:
+      flag_strs.append('--%s=%s' % (name, value))
+  return flag_strs
+
+
+def write_stats(stats, filename):
+  """Writes the stats dict returned by BenchmarkCNN.run() as JSON."""
+  with open(filename, 'w') as f:
+    json.dump(stats, f, sort_keys=True, default=metrics_log.to_json_value)
+
+
+def summarize(values, trim_fraction=0., num_bootstrap_samples=10000,
+              confidence_level=0.95, seed=0):
+  """Returns robust summary statistics of per-run results.
+
+  Args:
+    values: A list of per-run values, such as images/sec.
+    trim_fraction: The fraction of the values to drop from each end, after
+      sorting, before computing the statistics.
+    num_bootstrap_samples: Number of bootstrap resamples used to compute the
+      confidence interval of the median.
+    confidence_level: The confidence level of the confidence interval.
+    seed: Seed for the bootstrap resampling.
+
+  Returns:
+    A dict with the median, the 25th and 75th percentiles and the interquartile
+    range, and the bounds of a bootstrap confidence interval of the median,
+    of the values that remain after trimming.
+  """
+  if not 0 <= trim_fraction < 0.5:
+    raise ValueError('trim_fraction must be in [0, 0.5), but got %s' %
+                     trim_fraction)
+  values = np.sort(np.asarray(values, dtype=np.float64))
+  num_trimmed = int(len(values) * trim_fraction)
+  if num_trimmed:
+    values = values[num_trimmed:-num_trimmed]
+  if not values.size:
+    raise ValueError('No values to summarize')
+  p25, median, p75 = np.percentile(values, [25, 50, 75])
+  resamples = np.random.RandomState(seed).choice(
+      values, size=(num_bootstrap_samples, values.size))
+  alpha = 100. * (1. - confidence_level) / 2.
+  ci_low, ci_high = np.percentile(np.median(resamples, axis=1),
+                                  [alpha, 100. - alpha])
+  return {
+      'num_runs': int(values.size),
+      'num_trimmed_runs': 2 * num_trimmed,
+      'median': median,
+      'p25': p25,
+      'p75': p75,
+      'iqr': p75 - p25,
+      'ci_low': ci_low,
+      'ci_high': ci_high,
+  }
+
+
+def run_in_subprocess(params, stats_file, extra_flags=(), stdout=None):
+  """Runs tf_cnn_benchmarks.py with `params` in a new process.
+
+  Args:
+    params: Params tuple of the benchmark to run.
+    stats_file: File the run writes its stats to, as JSON.
+    extra_flags: Additional command line flags to pass to the run.
+    stdout: File object the output of the run is written to. Defaults to the
+      stdout of this process.
+
+  Returns:
+    The stats dict returned by BenchmarkCNN.run() in the new process.
+
+  Raises:
+    subprocess.CalledProcessError: If the run fails.
+  """
+  command = ([sys.executable, _TF_CNN_BENCHMARKS_SCRIPT] +
+             get_flags_from_params(params) + list(extra_flags) +
+             ['--stats_output_file=%s' % stats_file])
+  subprocess.check_call(command, stdout=stdout,
+                        stderr=subprocess.STDOUT if stdout else None)
+  with open(stats_file) as f:
+    return json.load(f)
+
+
+def run_repeated(params, num_repeats, extra_flags=()):
+  """Runs tf_cnn_benchmarks.py `num_repeats` times, each in a new process.
+
+  Args:
+    params: Params tuple of the benchmark to run.
+    num_repeats: The number of times to run the benchmark.
+    extra_flags: Additional command line flags to pass to every run.
+
+  Returns:
+    A list with the stats dict returned by BenchmarkCNN.run() in each run.
+
+  Raises:
+    subprocess.CalledProcessError: If a run fails.
+  """
+  all_stats = []
+  stats_dir = tempfile.mkdtemp(prefix='tf_cnn_benchmarks_repeats_')
+  try:
+    for i in range(num_repeats):
+      log_fn('Starting run %d of %d' % (i + 1, num_repeats))
+      stats_file = os.path.join(stats_dir, 'stats_%d.json' % i)
+      all_stats.append(run_in_subprocess(params, stats_file, extra_flags))
+  finally:
+    shutil.rmtree(stats_dir, ignore_errors=True)
+  return all_stats
+
+
+def run_and_report(params, num_repeats, trim_fraction=0., extra_flags=()):
+  """Runs the benchmark repeatedly and logs a summary of images/sec.
+
+  Returns:
+    The dict returned by summarize() for the images/sec of each run.
+  """
+  all_stats = run_repeated(params, num_repeats, extra_flags)
+  images_per_sec = [stats['images_per_sec'] for stats in all_stats]
+  summary = summarize(images_per_sec, trim_fraction)
+  log_fn('-' * 64)
+  log_fn('images/sec of each run: %s' %
+         ', '.join('%.2f' % v for v in images_per_sec))
+  log_fn('images/sec over %d runs (%d trimmed): median %.2f, IQR %.2f '
+         '(%.2f to %.2f), 95%% CI of median %.2f to %.2f' %
+         (len(images_per_sec), summary['num_trimmed_runs'], summary['median'],
+          summary['iqr'], summary['p25'], summary['p75'], summary['ci_low'],
+          summary['ci_high']))
+  log_fn('-' * 64)
+  return summary
@@ -0,0 +1,104 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for tf_cnn_benchmarks.repeated_runs."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import os
+import subprocess
+
+import numpy as np
+import tensorflow as tf
+
+import benchmark_cnn
+import repeated_runs
+import test_util
+
+
+class RepeatedRunsTest(tf.test.TestCase):
+
+  def testGetFlagsFromParams(self):
+    params = benchmark_cnn.make_params(
+        batch_size=64, model='resnet50', use_fp16=True,
+        fetch_loss_every_step=False,
+        eval_during_training_at_specified_steps=['10', '20'])
+    self.assertEqual(
+        repeated_runs.get_flags_from_params(params),
+        ['--batch_size=64',
+         '--eval_during_training_at_specified_steps=10,20',
+         '--nofetch_loss_every_step',
+         '--model=resnet50',
+         '--use_fp16'])
+    self.assertEqual(
+        repeated_runs.get_flags_from_params(benchmark_cnn.make_params()), [])
+
+  def testSummarize(self):
+    values = [100., 101., 102., 103., 104.]
+    summary = repeated_runs.summarize(values)
+    self.assertEqual(summary['num_runs'], 5)
+    self.assertAllClose(summary['median'], 102.)
+    self.assertAllClose(summary['p25'], 101.)
+    self.assertAllClose(summary['p75'], 103.)
+    self.assertAllClose(summary['iqr'], 2.)
+    self.assertLessEqual(summary['ci_low'], summary['median'])
+    self.assertGreaterEqual(summary['ci_high'], summary['median'])
+    self.assertGreaterEqual(summary['ci_low'], 100.)
+    self.assertLessEqual(summary['ci_high'], 104.)
+
+  def testSummarizeTrimsOutliers(self):
+    values = [1., 100., 101., 102., 103., 104., 105., 106., 107., 1000.]
+    summary = repeated_runs.summarize(values, trim_fraction=0.1)
+    self.assertEqual(summary['num_runs'], 8)
+    self.assertEqual(summary['num_trimmed_runs'], 2)
+    self.assertAllClose(summary['median'], 103.5)
+    self.assertLessEqual(summary['ci_high'], 107.)
+    with self.assertRaises(ValueError):
+      repeated_runs.summarize(values, trim_fraction=0.5)
+
+  def testWriteStats(self):
+    filename = os.path.join(self.get_temp_dir(), 'stats.json')
+    repeated_runs.write_stats(
+        {'images_per_sec': np.float64(12.5), 'num_steps': 10}, filename)
+    with open(filename) as f:
+      self.assertEqual(json.load(f), {'images_per_sec': 12.5, 'num_steps': 10})
+
+  def testRunRepeatedRemovesStatsDir(self):
+    stats_files = []
+
+    def run_in_subprocess(params, stats_file, extra_flags):
+      del params, extra_flags  # Unused
+      stats_files.append(stats_file)
+      if len(stats_files) == 3:
+        raise subprocess.CalledProcessError(1, 'tf_cnn_benchmarks.py')
+      return {'images_per_sec': 1.}
+
+    with test_util.monkey_patch(repeated_runs,
+                                run_in_subprocess=run_in_subprocess):
+      self.assertEqual(
+          repeated_runs.run_repeated(benchmark_cnn.make_params(), 2),
+          [{'images_per_sec': 1.}] * 2)
+      # The directory is also removed if a run fails.
+      with self.assertRaises(subprocess.CalledProcessError):
+        repeated_runs.run_repeated(benchmark_cnn.make_params(), 2)
+    for stats_file in stats_files:
+      self.assertFalse(os.path.exists(os.path.dirname(stats_file)))
+
+
+
+if __name__ == '__main__':
+  tf.test.main()
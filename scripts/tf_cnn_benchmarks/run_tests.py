@@ -28,8 +28,22 @@ import all_reduce_benchmark_test
 import allreduce_test
 import benchmark_cnn_distributed_test
 import benchmark_cnn_test
+import benchmark_history_test
 import cnn_util_test
+import compare_runs_test
+import convert_imagenet_to_raw_test
+import graph_cache_test
+import host_stats_test
+import input_benchmark_test
+import metrics_log_test
+import repeated_runs_test
+import startup_profile_test
+import step_stats_test
+import sweep_test
+import tower_function_test
 import variable_mgr_util_test
+import variable_snapshot_test
+from models import model_config_test
 from models import nasnet_test
 
 
@@ -60,10 +74,24 @@ def main(_):
   if FLAGS.full_tests:
     suite = unittest.TestSuite([
         loader.loadTestsFromModule(allreduce_test),
+        loader.loadTestsFromModule(benchmark_history_test),
         loader.loadTestsFromModule(cnn_util_test),
+        loader.loadTestsFromModule(compare_runs_test),
+        loader.loadTestsFromModule(convert_imagenet_to_raw_test),
+        loader.loadTestsFromModule(graph_cache_test),
+        loader.loadTestsFromModule(host_stats_test),
+        loader.loadTestsFromModule(input_benchmark_test),
+        loader.loadTestsFromModule(metrics_log_test),
+        loader.loadTestsFromModule(repeated_runs_test),
+        loader.loadTestsFromModule(startup_profile_test),
+        loader.loadTestsFromModule(step_stats_test),
+        loader.loadTestsFromModule(sweep_test),
+        loader.loadTestsFromModule(tower_function_test),
         loader.loadTestsFromModule(variable_mgr_util_test),
+        loader.loadTestsFromModule(variable_snapshot_test),
         loader.loadTestsFromModule(benchmark_cnn_test),
         loader.loadTestsFromModule(all_reduce_benchmark_test),
+        loader.loadTestsFromModule(model_config_test),
         loader.loadTestsFromModule(nasnet_test),
     ])
     dist_suite = unittest.TestSuite([
@@ -72,9 +100,23 @@ def main(_):
   else:
     suite = unittest.TestSuite([
         loader.loadTestsFromModule(allreduce_test),
+        loader.loadTestsFromModule(benchmark_history_test),
         loader.loadTestsFromModule(cnn_util_test),
+        loader.loadTestsFromModule(compare_runs_test),
+        loader.loadTestsFromModule(convert_imagenet_to_raw_test),
+        loader.loadTestsFromModule(graph_cache_test),
+        loader.loadTestsFromModule(host_stats_test),
+        loader.loadTestsFromModule(input_benchmark_test),
+        loader.loadTestsFromModule(metrics_log_test),
+        loader.loadTestsFromModule(repeated_runs_test),
+        loader.loadTestsFromModule(startup_profile_test),
+        loader.loadTestsFromModule(step_stats_test),
+        loader.loadTestsFromModule(sweep_test),
+        loader.loadTestsFromModule(tower_function_test),
         loader.loadTestsFromModule(all_reduce_benchmark_test),
         loader.loadTestsFromModule(variable_mgr_util_test),
+        loader.loadTestsFromModule(variable_snapshot_test),
+        loader.loadTestsFromModule(model_config_test),
         loader.loadTestsFromTestCase(benchmark_cnn_test.TestAlexnetModel),
         loader.loadTestsFromTestCase(benchmark_cnn_test.TfCnnBenchmarksTest),
         loader.loadTestsFromTestCase(benchmark_cnn_test.VariableUpdateTest),
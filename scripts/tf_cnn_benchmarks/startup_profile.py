@@ -0,0 +1,118 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Measures where the time before the first training step goes.
+
+For large graphs, building the graph, creating the session and running the
+first step can take minutes. StartupProfiler splits that time into phases,
+each ending at a call to mark(), and optionally records the size of the graph
+at the end of each phase.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import time
+
+
+# A phase of the startup.
+StartupPhase = collections.namedtuple(
+    'StartupPhase',
+    [
+        'name',
+        # Wall time of the phase, in seconds.
+        'time',
+        # Number of ops in the graph and size of the serialized GraphDef, in
+        # bytes, at the end of the phase. None if the graph was not measured.
+        'num_ops',
+        'graph_def_bytes',
+    ])
+
+
+class StartupProfiler(object):
+  """Splits the startup time into consecutive phases.
+
+  Each call to mark() ends the current phase, which started at the previous
+  call, or at `start_time` for the first phase. So the phases add up to the
+  total startup time.
+
+  Example usage:
+  ```
+  profiler = StartupProfiler()
+  build_graph(graph)
+  profiler.mark('build_graph', graph)
+  sess = create_session(graph)
+  profiler.mark('create_session')
+  profiler.finish()
+  ```
+  """
+
+  def __init__(self, start_time=None, measure_graphs=False):
+    """Creates a StartupProfiler.
+
+    Args:
+      start_time: The time at which startup began. Defaults to now.
+      measure_graphs: If True, the number of ops and the GraphDef size of the
+        graph passed to mark() are recorded. Serializing the graph takes time
+        itself, which is excluded from the phases.
+    """
+    self._last_mark_time = time.time() if start_time is None else start_time
+    self._measure_graphs = measure_graphs
+    self.phases = []
+    self.finished = False
+
+  def mark(self, name, graph=None):
+    """Ends the phase called `name`. Ignored once finish() is called."""
+    if self.finished:
+      return
+    now = time.time()
+    num_ops = None
+    graph_def_bytes = None
+    if self._measure_graphs and graph is not None:
+      num_ops = len(graph.get_operations())
+      graph_def_bytes = graph.as_graph_def().ByteSize()
+    self.phases.append(StartupPhase(name, now - self._last_mark_time, num_ops,
+                                    graph_def_bytes))
+    # Start the next phase after measuring the graph.
+    self._last_mark_time = time.time() if num_ops is not None else now
+
+  def finish(self):
+    """Ends the startup. Later calls to mark() are ignored."""
+    self.finished = True
+
+  def total_time(self):
+    return sum(phase.time for phase in self.phases)
+
+  def get_stats(self):
+    """Returns a dict with the total startup time and the time of each phase."""
+    stats = {'startup_time': self.total_time()}
+    for phase in self.phases:
+      key = 'startup_%s_time' % phase.name
+      stats[key] = stats.get(key, 0.) + phase.time
+    return stats
+
+  def get_report_lines(self):
+    """Returns lines of a table with the time and graph size of each phase."""
+    lines = ['%-20s %9s %10s %14s' % ('Startup phase', 'time (s)', 'ops',
+                                      'GraphDef (MB)')]
+    for phase in self.phases:
+      lines.append('%-20s %9.2f %10s %14s' % (
+          phase.name, phase.time,
+          '' if phase.num_ops is None else phase.num_ops,
+          ('' if phase.graph_def_bytes is None else
+           '%.2f' % (phase.graph_def_bytes / 2.**20))))
+    lines.append('%-20s %9.2f' % ('total', self.total_time()))
+    return lines
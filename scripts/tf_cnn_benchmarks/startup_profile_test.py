@@ -0,0 +1,66 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for tf_cnn_benchmarks.startup_profile."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+import tensorflow as tf
+
+import startup_profile
+
+
+class StartupProfilerTest(tf.test.TestCase):
+
+  def testPhases(self):
+    profiler = startup_profile.StartupProfiler(start_time=time.time() - 1.)
+    profiler.mark('import')
+    graph = tf.Graph()
+    with graph.as_default():
+      tf.constant(1.) + tf.constant(2.)  # pylint: disable=expression-not-assigned
+    profiler.mark('build_graph', graph)
+    profiler.finish()
+    profiler.mark('ignored')
+    self.assertEqual([p.name for p in profiler.phases],
+                     ['import', 'build_graph'])
+    self.assertGreaterEqual(profiler.phases[0].time, 1.)
+    # Graphs are only measured with measure_graphs=True.
+    self.assertIsNone(profiler.phases[1].num_ops)
+    stats = profiler.get_stats()
+    self.assertAllClose(stats['startup_time'],
+                        stats['startup_import_time'] +
+                        stats['startup_build_graph_time'])
+
+  def testMeasureGraphs(self):
+    profiler = startup_profile.StartupProfiler(measure_graphs=True)
+    graph = tf.Graph()
+    with graph.as_default():
+      tf.constant(1.) + tf.constant(2.)  # pylint: disable=expression-not-assigned
+    profiler.mark('build_graph', graph)
+    profiler.mark('create_session')
+    self.assertEqual(profiler.phases[0].num_ops, 3)
+    self.assertGreater(profiler.phases[0].graph_def_bytes, 0)
+    self.assertIsNone(profiler.phases[1].num_ops)
+    lines = profiler.get_report_lines()
+    self.assertEqual(len(lines), 4)
+    self.assertTrue(lines[1].startswith('build_graph'))
+    self.assertTrue(lines[-1].startswith('total'))
+
+
+if __name__ == '__main__':
+  tf.test.main()
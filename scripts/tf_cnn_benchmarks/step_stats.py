@@ -0,0 +1,366 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Streaming statistics over benchmark step times.
+
+tf_cnn_benchmarks can run for hours, so per-step times are not stored. Instead,
+StepTimeStats keeps a running mean and variance and a quantile sketch, all of
+which are updated in constant time and use a bounded amount of memory.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import math
+
+import six
+
+
+# Percentiles of the step time that are reported at the end of a run.
+STEP_TIME_PERCENTILES = (50, 90, 99)
+
+# Phases of a training step tracked by PhaseTimeStats.
+# Time in Session.run().
+PHASE_SESS_RUN = 'sess_run'
+# Time blocked waiting for cnn_util.ImageProducer to finish putting the next
+# batch into the staging area.
+PHASE_INPUT_WAIT = 'input_wait'
+# Time in Python between steps, e.g. handling summaries and checking whether to
+# checkpoint or evaluate.
+PHASE_HOST_OVERHEAD = 'host_overhead'
+# Time the input iterator's get_next op took, as recorded in the RunMetadata of
+# traced steps. This is only available for steps that were traced.
+PHASE_ITERATOR_WAIT = 'iterator_wait'
+
+# Step times are clamped to be at least this many seconds, so that a step that
+# is faster than the resolution of time.time() does not cause a division by
+# zero.
+_MIN_STEP_TIME = 1e-9
+
+
+def _weighted_median(values_and_weights):
+  """Returns the median of a list of (value, weight) pairs."""
+  values_and_weights = sorted(values_and_weights)
+  half_weight = sum(w for _, w in values_and_weights) / 2.
+  cumulative_weight = 0
+  for value, weight in values_and_weights:
+    cumulative_weight += weight
+    if cumulative_weight >= half_weight:
+      return value
+  return values_and_weights[-1][0] if values_and_weights else 0.
+
+
+class StepTimeStats(object):
+  """Accumulates statistics over step times in constant memory.
+
+  The mean and variance of the step times, and of the per-step speeds, are
+  computed exactly with Welford's algorithm. Quantiles are approximated with a
+  logarithmically-bucketed sketch: a step time t is counted in the bucket
+  ceil(log(t) / log(gamma)), so every quantile returned is within a relative
+  error of `relative_accuracy` of the true quantile. The number of buckets only
+  grows with the dynamic range of the step times, not with the number of steps.
+
+  Example usage:
+  ```
+  step_time_stats = StepTimeStats()
+  for _ in range(num_steps):
+    start_time = time.time()
+    sess.run(fetches)
+    step_time_stats.add(time.time() - start_time)
+  p50, p90, p99 = step_time_stats.percentiles((50, 90, 99))
+  ```
+  """
+
+  def __init__(self, relative_accuracy=0.01):
+    if not 0 < relative_accuracy < 1:
+      raise ValueError('relative_accuracy must be in (0, 1), but got %s' %
+                       relative_accuracy)
+    self.relative_accuracy = relative_accuracy
+    self._gamma = (1. + relative_accuracy) / (1. - relative_accuracy)
+    self._log_gamma = math.log(self._gamma)
+    self.reset()
+
+  def reset(self):
+    """Discards all step times added so far."""
+    self.count = 0
+    self.total_time = 0.
+    self.min_time = None
+    self.max_time = None
+    self.last_time = None
+    self._mean = 0.
+    self._m2 = 0.
+    # Statistics over 1 / step_time. Speeds are batch_size / step_time, so these
+    # are scaled by the batch size when speeds are computed.
+    self._inverse_mean = 0.
+    self._inverse_m2 = 0.
+    self._buckets = {}
+
+  def add(self, step_time):
+    """Adds the duration of a single step, in seconds."""
+    step_time = max(step_time, _MIN_STEP_TIME)
+    self.last_time = step_time
+    self.count += 1
+    self.total_time += step_time
+    if self.min_time is None or step_time < self.min_time:
+      self.min_time = step_time
+    if self.max_time is None or step_time > self.max_time:
+      self.max_time = step_time
+
+    delta = step_time - self._mean
+    self._mean += delta / self.count
+    self._m2 += delta * (step_time - self._mean)
+
+    inverse_time = 1. / step_time
+    delta = inverse_time - self._inverse_mean
+    self._inverse_mean += delta / self.count
+    self._inverse_m2 += delta * (inverse_time - self._inverse_mean)
+
+    key = int(math.ceil(math.log(step_time) / self._log_gamma))
+    self._buckets[key] = self._buckets.get(key, 0) + 1
+
+  def __len__(self):
+    return self.count
+
+  def mean(self):
+    """Returns the mean step time, in seconds."""
+    return self._mean
+
+  def stddev(self):
+    """Returns the population standard deviation of the step times."""
+    if not self.count:
+      return 0.
+    return math.sqrt(self._m2 / self.count)
+
+  def _bucket_value(self, key):
+    """Returns the step time that represents the bucket `key`."""
+    return 2. * self._gamma ** key / (self._gamma + 1.)
+
+  def _clip(self, value):
+    return min(max(value, self.min_time), self.max_time)
+
+  def percentiles(self, percentiles=STEP_TIME_PERCENTILES):
+    """Returns a list of approximate percentiles of the step times.
+
+    Args:
+      percentiles: An iterable of percentiles, each in [0, 100].
+
+    Returns:
+      A list with the approximate step time, in seconds, at each of
+      `percentiles`. All values are 0 if no step times have been added.
+    """
+    percentiles = list(percentiles)
+    if not self.count:
+      return [0.] * len(percentiles)
+    ranks = sorted((p / 100. * (self.count - 1), i)
+                   for i, p in enumerate(percentiles))
+    results = [0.] * len(percentiles)
+    rank_index = 0
+    cumulative_count = 0
+    for key in sorted(self._buckets):
+      cumulative_count += self._buckets[key]
+      while (rank_index < len(ranks) and
+             ranks[rank_index][0] < cumulative_count):
+        results[ranks[rank_index][1]] = self._clip(self._bucket_value(key))
+        rank_index += 1
+    for _, i in ranks[rank_index:]:
+      results[i] = self.max_time
+    return results
+
+  def get_perf_timing(self, batch_size, scale=1):
+    """Returns the mean, uncertainty and jitter of the speed, in images/sec.
+
+    Args:
+      batch_size: The number of images processed per step.
+      scale: Only the mean speed is multiplied by this value.
+
+    Returns:
+      A (speed_mean, speed_uncertainty, speed_jitter) tuple. speed_uncertainty
+      is the standard error of the mean of the per-step speeds, and speed_jitter
+      is the median absolute deviation of the per-step speeds, scaled to be
+      comparable to a standard deviation. speed_jitter is computed from the
+      quantile sketch, and so is approximate.
+    """
+    speed_mean = scale * batch_size / self._mean
+    speed_uncertainty = (batch_size * math.sqrt(self._inverse_m2 / self.count) /
+                         math.sqrt(float(self.count)))
+    speeds = [(batch_size / self._clip(self._bucket_value(key)), count)
+              for key, count in six.iteritems(self._buckets)]
+    median_speed = _weighted_median(speeds)
+    speed_jitter = 1.4826 * _weighted_median(
+        [(abs(speed - median_speed), count) for speed, count in speeds])
+    return speed_mean, speed_uncertainty, speed_jitter
+
+
+class SteadyStateDetector(object):
+  """Detects when step times have reached a steady state.
+
+  The step times are considered steady once the coefficient of variation (the
+  standard deviation divided by the mean) of the last `window_size` step times
+  drops below `cv_threshold`. The first few steps are typically much slower
+  than the rest, due to autotuning, memory allocation, etc., so they keep the
+  coefficient of variation high until they fall out of the window.
+  """
+
+  def __init__(self, window_size, cv_threshold):
+    if window_size < 2:
+      raise ValueError('window_size must be at least 2, but got %d' %
+                       window_size)
+    self.window_size = window_size
+    self.cv_threshold = cv_threshold
+    self._window = collections.deque()
+    self._sum = 0.
+    self._sum_of_squares = 0.
+
+  def add(self, step_time):
+    """Adds a step time and returns whether the step times are steady."""
+    self._window.append(step_time)
+    self._sum += step_time
+    self._sum_of_squares += step_time * step_time
+    if len(self._window) > self.window_size:
+      removed = self._window.popleft()
+      self._sum -= removed
+      self._sum_of_squares -= removed * removed
+    return self.is_steady()
+
+  def coefficient_of_variation(self):
+    """Returns the coefficient of variation of the step times in the window."""
+    n = len(self._window)
+    if not n or self._sum <= 0:
+      return float('inf')
+    mean = self._sum / n
+    variance = max(self._sum_of_squares / n - mean * mean, 0.)
+    return math.sqrt(variance) / mean
+
+  def is_steady(self):
+    return (len(self._window) == self.window_size and
+            self.coefficient_of_variation() < self.cv_threshold)
+
+
+class PhaseTimeStats(object):
+  """Accumulates the time spent in each phase of a step, in constant memory.
+
+  Not every phase is timed on every step, so the mean time of a phase is taken
+  over the steps on which that phase was timed.
+  """
+
+  def __init__(self):
+    self.reset()
+
+  def reset(self):
+    """Discards all phase times added so far."""
+    self._total_times = {}
+    self._counts = {}
+    # The time of each phase in the most recent step in which it was timed.
+    self.last_times = {}
+
+  def add(self, phase, seconds):
+    """Adds the time spent in `phase` during a single step."""
+    self.last_times[phase] = seconds
+    self._total_times[phase] = self._total_times.get(phase, 0.) + seconds
+    self._counts[phase] = self._counts.get(phase, 0) + 1
+
+  def mean_times(self):
+    """Returns a dict from each phase to its mean time per step, in seconds."""
+    return {phase: total_time / self._counts[phase]
+            for phase, total_time in six.iteritems(self._total_times)}
+
+
+# Activities that StepAnomalyTracker attributes lost time to, in addition to
+# those passed to StepAnomalyTracker.add().
+ACTIVITY_INPUT_WAIT = 'input_wait'
+ACTIVITY_UNATTRIBUTED = 'unattributed'
+
+
+def _median(values):
+  values = sorted(values)
+  n = len(values)
+  if n % 2:
+    return values[n // 2]
+  return (values[n // 2 - 1] + values[n // 2]) / 2.
+
+
+class StepAnomalyTracker(object):
+  """Flags unusually slow iterations and attributes their lost time.
+
+  An iteration is anomalous if its time exceeds the median of the last
+  `window_size` iteration times by more than `mad_threshold` times their median
+  absolute deviation (scaled to be comparable to a standard deviation). The
+  time lost by an anomalous iteration is its excess over the median. It is
+  attributed to the side activities, such as checkpointing, that ran in that
+  iteration, split evenly if there were several. If waiting for input accounts
+  for most of the lost time, it is also counted as an activity. Lost time of
+  anomalous iterations without any activity is counted as unattributed.
+  """
+
+  # Iterations are not checked until this many iteration times are known.
+  _MIN_ITERATIONS = 10
+
+  def __init__(self, window_size=100, mad_threshold=5.):
+    if window_size < self._MIN_ITERATIONS:
+      raise ValueError('window_size must be at least %d, but got %d' %
+                       (self._MIN_ITERATIONS, window_size))
+    self.window_size = window_size
+    self.mad_threshold = mad_threshold
+    self._window = collections.deque(maxlen=window_size)
+    self.num_iterations = 0
+    self.num_anomalies = 0
+    self.total_time = 0.
+    self.lost_time = 0.
+    self.lost_time_by_activity = {}
+
+  def add(self, iteration_time, activities=(), input_wait_time=0.):
+    """Adds an iteration and returns the time it lost, or 0 if it is normal.
+
+    Args:
+      iteration_time: The wall time of the iteration, in seconds.
+      activities: Names of the side activities run in this iteration.
+      input_wait_time: Time spent waiting for input during the iteration.
+
+    Returns:
+      The time the iteration took beyond the median, if it is anomalous.
+      Otherwise, 0.
+    """
+    lost_time = 0.
+    if len(self._window) >= self._MIN_ITERATIONS:
+      median = _median(self._window)
+      mad = 1.4826 * _median([abs(t - median) for t in self._window])
+      # Do not flag tiny variations when nearly all iterations take the same
+      # time.
+      mad = max(mad, 0.01 * median)
+      if iteration_time > median + self.mad_threshold * mad:
+        lost_time = iteration_time - median
+        activities = list(activities)
+        if input_wait_time > lost_time / 2:
+          activities.append(ACTIVITY_INPUT_WAIT)
+        if not activities:
+          activities = [ACTIVITY_UNATTRIBUTED]
+        for activity in activities:
+          self.lost_time_by_activity[activity] = (
+              self.lost_time_by_activity.get(activity, 0.) +
+              lost_time / len(activities))
+        self.num_anomalies += 1
+        self.lost_time += lost_time
+    self._window.append(iteration_time)
+    self.num_iterations += 1
+    self.total_time += iteration_time
+    return lost_time
+
+  def lost_time_fractions(self):
+    """Returns a dict from activity to its fraction of the total lost time."""
+    if not self.lost_time:
+      return {}
+    return {activity: t / self.lost_time
+            for activity, t in six.iteritems(self.lost_time_by_activity)}
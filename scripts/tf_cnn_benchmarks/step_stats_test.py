@@ -0,0 +1,172 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for tf_cnn_benchmarks.step_stats."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+import tensorflow as tf
+
+import step_stats
+
+
+class StepTimeStatsTest(tf.test.TestCase):
+
+  def _add_all(self, step_time_stats, step_times):
+    for step_time in step_times:
+      step_time_stats.add(step_time)
+
+  def testMeanAndStddev(self):
+    step_times = np.random.RandomState(0).uniform(0.01, 0.5, size=1000)
+    step_time_stats = step_stats.StepTimeStats()
+    self._add_all(step_time_stats, step_times)
+    self.assertEqual(len(step_time_stats), 1000)
+    self.assertAllClose(step_time_stats.mean(), np.mean(step_times))
+    self.assertAllClose(step_time_stats.stddev(), np.std(step_times))
+    self.assertAllClose(step_time_stats.total_time, np.sum(step_times))
+
+  def testPercentiles(self):
+    step_times = np.random.RandomState(0).lognormal(-3, 0.5, size=10000)
+    step_time_stats = step_stats.StepTimeStats(relative_accuracy=0.01)
+    self._add_all(step_time_stats, step_times)
+    percentiles = [0, 50, 90, 99, 100]
+    approx = step_time_stats.percentiles(percentiles)
+    exact = np.percentile(step_times, percentiles)
+    self.assertAllClose(approx, exact, rtol=0.02)
+
+  def testPerfTiming(self):
+    step_times = np.random.RandomState(0).uniform(0.05, 0.1, size=500)
+    batch_size = 64
+    step_time_stats = step_stats.StepTimeStats()
+    self._add_all(step_time_stats, step_times)
+    speed_mean, speed_uncertainty, speed_jitter = (
+        step_time_stats.get_perf_timing(batch_size))
+    speeds = batch_size / step_times
+    self.assertAllClose(speed_mean, batch_size / np.mean(step_times))
+    self.assertAllClose(speed_uncertainty,
+                        np.std(speeds) / np.sqrt(len(speeds)))
+    self.assertAllClose(
+        speed_jitter,
+        1.4826 * np.median(np.abs(speeds - np.median(speeds))), rtol=0.05)
+
+  def testReset(self):
+    step_time_stats = step_stats.StepTimeStats()
+    self._add_all(step_time_stats, [1., 2., 3.])
+    step_time_stats.reset()
+    self.assertEqual(len(step_time_stats), 0)
+    self.assertEqual(step_time_stats.percentiles([50]), [0.])
+    step_time_stats.add(0.5)
+    self.assertAllClose(step_time_stats.mean(), 0.5)
+    self.assertAllClose(step_time_stats.percentiles([0, 50, 100]),
+                        [0.5, 0.5, 0.5])
+
+  def testMemoryIsBounded(self):
+    step_time_stats = step_stats.StepTimeStats()
+    self._add_all(step_time_stats,
+                  np.random.RandomState(0).uniform(0.1, 0.2, size=100000))
+    # log(2) / log(1.01 / 0.99) is about 35 buckets.
+    self.assertLess(len(step_time_stats._buckets), 40)
+
+  def testZeroStepTime(self):
+    step_time_stats = step_stats.StepTimeStats()
+    step_time_stats.add(0.)
+    speed_mean, _, _ = step_time_stats.get_perf_timing(batch_size=1)
+    self.assertTrue(np.isfinite(speed_mean))
+
+  def testInvalidRelativeAccuracy(self):
+    with self.assertRaises(ValueError):
+      step_stats.StepTimeStats(relative_accuracy=0)
+
+
+class SteadyStateDetectorTest(tf.test.TestCase):
+
+  def testDetectsSteadyState(self):
+    detector = step_stats.SteadyStateDetector(window_size=5,
+                                              cv_threshold=0.05)
+    # The first steps are slow, as they would be while autotuning.
+    for step_time in [5., 2., 1.]:
+      self.assertFalse(detector.add(step_time))
+    steady = [detector.add(0.1) for _ in range(5)]
+    self.assertEqual(steady, [False] * 4 + [True])
+    self.assertAllClose(detector.coefficient_of_variation(), 0.)
+
+  def testNoisyStepTimesAreNotSteady(self):
+    detector = step_stats.SteadyStateDetector(window_size=4,
+                                              cv_threshold=0.05)
+    for _ in range(10):
+      self.assertFalse(detector.add(0.1))
+      self.assertFalse(detector.add(0.2))
+    self.assertAllClose(detector.coefficient_of_variation(), 1. / 3)
+
+  def testInvalidWindowSize(self):
+    with self.assertRaises(ValueError):
+      step_stats.SteadyStateDetector(window_size=1, cv_threshold=0.05)
+
+
+class PhaseTimeStatsTest(tf.test.TestCase):
+
+  def testMeanTimes(self):
+    phase_time_stats = step_stats.PhaseTimeStats()
+    for _ in range(4):
+      phase_time_stats.add(step_stats.PHASE_SESS_RUN, 0.1)
+      phase_time_stats.add(step_stats.PHASE_INPUT_WAIT, 0.01)
+    phase_time_stats.add(step_stats.PHASE_ITERATOR_WAIT, 0.05)
+    mean_times = phase_time_stats.mean_times()
+    self.assertEqual(len(mean_times), 3)
+    self.assertAllClose(mean_times[step_stats.PHASE_SESS_RUN], 0.1)
+    self.assertAllClose(mean_times[step_stats.PHASE_INPUT_WAIT], 0.01)
+    self.assertAllClose(mean_times[step_stats.PHASE_ITERATOR_WAIT], 0.05)
+    phase_time_stats.reset()
+    self.assertEqual(phase_time_stats.mean_times(), {})
+
+
+class StepAnomalyTrackerTest(tf.test.TestCase):
+
+  def testAttributesLostTime(self):
+    tracker = step_stats.StepAnomalyTracker(window_size=20, mad_threshold=5.)
+    step_times = np.random.RandomState(0).uniform(0.099, 0.101, size=50)
+    for i, step_time in enumerate(step_times):
+      if i == 20:
+        self.assertAllClose(tracker.add(1.1, ['checkpoint']), 1., atol=0.01)
+      elif i == 30:
+        tracker.add(0.5, ['checkpoint', 'summary'])
+      elif i == 40:
+        tracker.add(0.3, input_wait_time=0.2)
+      elif i == 45:
+        tracker.add(0.3)
+      else:
+        self.assertEqual(tracker.add(step_time, ['summary']), 0.)
+    self.assertEqual(tracker.num_iterations, 50)
+    self.assertEqual(tracker.num_anomalies, 4)
+    lost_time = tracker.lost_time_by_activity
+    self.assertAllClose(lost_time['checkpoint'], 1. + 0.2, atol=0.01)
+    self.assertAllClose(lost_time['summary'], 0.2, atol=0.01)
+    self.assertAllClose(lost_time[step_stats.ACTIVITY_INPUT_WAIT], 0.2,
+                        atol=0.01)
+    self.assertAllClose(lost_time[step_stats.ACTIVITY_UNATTRIBUTED], 0.2,
+                        atol=0.01)
+    self.assertAllClose(sum(tracker.lost_time_fractions().values()), 1.)
+
+  def testNoAnomaliesBeforeWindowHasEnoughIterations(self):
+    tracker = step_stats.StepAnomalyTracker(window_size=10)
+    self.assertEqual(tracker.add(0.1), 0.)
+    self.assertEqual(tracker.add(10.), 0.)
+    self.assertEqual(tracker.lost_time_fractions(), {})
+
+
+if __name__ == '__main__':
+  tf.test.main()
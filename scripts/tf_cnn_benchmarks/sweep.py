@@ -0,0 +1,375 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Runs tf_cnn_benchmarks over a sweep of parameter values.
+
+The sweep is described by a JSON file given by --sweep_config, which is either
+an object mapping parameter names to lists of values, in which case every
+combination of the values is run, or a list of objects, each of which is one
+set of parameter overrides. For example:
+
+  {"batch_size": [32, 64], "variable_update": ["parameter_server",
+                                               "replicated"]}
+
+Every other parameter is taken from the command line flags, which are the same
+as those of tf_cnn_benchmarks.py:
+
+  python sweep.py --sweep_config=sweep.json --sweep_results_dir=/tmp/sweep \\
+      --model=resnet50 --num_gpus=8
+
+Each configuration runs in a new process. Its results are stored in
+--sweep_results_dir, keyed by a hash of its parameters, so rerunning an
+interrupted or extended sweep skips the configurations that were already run.
+
+With --sweep_share_sessions, configurations that only differ in num_batches,
+num_warmup_batches or display_every instead run in a single process and
+session, one measurement phase each (see --measurement_phases), so the graph
+is built, the variables are initialized and the session is warmed up once.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import hashlib
+import itertools
+import json
+from multiprocessing import pool
+import os
+import subprocess
+
+from absl import app
+from absl import flags as absl_flags
+
+import benchmark_cnn
+import flags
+import repeated_runs
+from cnn_util import log_fn
+
+
+absl_flags.DEFINE_string('sweep_config', None,
+                         'JSON file describing the parameter values to sweep '
+                         'over.')
+absl_flags.DEFINE_string('sweep_results_dir', None,
+                         'Directory in which the result and output of each '
+                         'configuration are stored.')
+absl_flags.DEFINE_integer('sweep_num_parallel_runs', 1,
+                          'Number of configurations to run at the same time. '
+                          'Runs that share devices interfere with each other, '
+                          'so only increase this if each configuration uses '
+                          'different devices.', lower_bound=1)
+absl_flags.DEFINE_boolean('sweep_share_sessions', False,
+                          'If True, configurations that only differ in '
+                          'num_batches, num_warmup_batches or display_every '
+                          'run as measurement phases of a single session. '
+                          'Every phase runs the warm up of a configuration '
+                          'run on its own.')
+absl_flags.DEFINE_string('sweep_sort_by', 'images_per_sec',
+                         'Stat by which the results table is sorted, in '
+                         'descending order.')
+
+
+# A configuration in a sweep.
+SweepConfig = collections.namedtuple(
+    'SweepConfig',
+    [
+        # The parameters that are swept over, as a dict.
+        'overrides',
+        # The Params tuple of the configuration.
+        'params',
+        # A stable hash of the parameters.
+        'params_hash',
+    ])
+
+
+def expand_sweep(sweep):
+  """Returns the list of parameter overrides described by `sweep`.
+
+  Args:
+    sweep: Either a dict mapping parameter names to lists of values, or a list
+      of dicts of parameter overrides.
+
+  Returns:
+    A list of dicts of parameter overrides. If `sweep` is a dict, there is one
+    dict for every combination of values.
+  """
+  if isinstance(sweep, dict):
+    names = sorted(sweep)
+    return [dict(zip(names, values))
+            for values in itertools.product(*[sweep[n] for n in names])]
+  return [dict(overrides) for overrides in sweep]
+
+
+# Part of every params hash. Change it when the meaning of stored results
+# changes, so that they are not reused.
+_PARAMS_HASH_VERSION = 1
+
+
+def get_params_hash(params):
+  """Returns a stable hash of `params`.
+
+  All parameters are hashed, including those left at their defaults, so a
+  change of a default value never reuses results run with the old value.
+  """
+  contents = json.dumps({'version': _PARAMS_HASH_VERSION,
+                         'params': params._asdict()}, sort_keys=True)
+  return hashlib.sha1(contents.encode('utf-8')).hexdigest()[:16]
+
+
+def make_sweep_configs(base_params, sweep):
+  """Returns a SweepConfig for every configuration in `sweep`.
+
+  Raises:
+    ValueError: If the parameters of a configuration are invalid.
+  """
+  configs = []
+  for overrides in expand_sweep(sweep):
+    for name in overrides:
+      if name not in flags.param_specs:
+        raise ValueError('Unknown parameter in sweep: %s' % name)
+    params = base_params._replace(**overrides)
+    benchmark_cnn.validate_params(params)
+    configs.append(SweepConfig(overrides, params, get_params_hash(params)))
+  return configs
+
+
+def group_configs_by_session(configs):
+  """Groups the configurations that can share a session.
+
+  Configurations share a session if they only differ in the fields of
+  benchmark_cnn.MeasurementPhase. Configurations that set --measurement_phases
+  themselves, or --input_pipeline_only, which does not support it, are never
+  grouped.
+
+  Returns:
+    A list of lists of SweepConfig, in the order of their first configuration.
+  """
+  groups = collections.OrderedDict()
+  for config in configs:
+    if config.params.measurement_phases or config.params.input_pipeline_only:
+      key = config.params_hash
+    else:
+      session_params = config.params._replace(**{
+          name: flags.param_specs[name].default_value
+          for name in benchmark_cnn.MeasurementPhase._fields})
+      key = 'session_' + get_params_hash(session_params)
+    groups.setdefault(key, []).append(config)
+  return list(groups.values())
+
+
+def get_measurement_phase_str(params):
+  """Returns the --measurement_phases entry that runs `params`.
+
+  The number of warm up batches is always set, since phases after the first
+  one default to no warm up. Each phase then warms up like a run of `params`
+  on its own, whose result it is stored as.
+  """
+  params = params._replace(
+      num_warmup_batches=benchmark_cnn.get_num_warmup_batches(params))
+  return ':'.join('%s=%d' % (name, getattr(params, name))
+                  for name in benchmark_cnn.MeasurementPhase._fields
+                  if getattr(params, name) is not None)
+
+
+def _result_file(results_dir, params_hash):
+  return os.path.join(results_dir, '%s.json' % params_hash)
+
+
+def _store_result(results_dir, params_hash, result):
+  # Write to a temporary file first, so an interrupted sweep does not leave a
+  # partial result that would be skipped by the next sweep.
+  filename = _result_file(results_dir, params_hash)
+  with open(filename + '.tmp', 'w') as f:
+    json.dump(result, f, sort_keys=True)
+  os.rename(filename + '.tmp', filename)
+
+
+def load_result(results_dir, params_hash):
+  """Returns the stored result of a configuration, or None if it was not run."""
+  filename = _result_file(results_dir, params_hash)
+  if not os.path.exists(filename):
+    return None
+  with open(filename) as f:
+    return json.load(f)
+
+
+def run_config(config, results_dir, run_fn=repeated_runs.run_in_subprocess):
+  """Runs a configuration unless its result is stored, and returns the result.
+
+  The result is a dict with the overrides, the command line flags and the stats
+  of the configuration, and the name of its per-step metrics log. It is only
+  stored if the run succeeds, so failed configurations are retried by the next
+  sweep.
+
+  Args:
+    config: The SweepConfig to run.
+    results_dir: Directory where results are stored.
+    run_fn: Function that runs the benchmark. Takes the params, the stats file
+      and the keyword argument stdout, and returns the stats dict.
+
+  Returns:
+    The result, or None if the run failed.
+  """
+  result = load_result(results_dir, config.params_hash)
+  if result is not None:
+    log_fn('Skipping %s, which was already run' % config.overrides)
+    return result
+  log_fn('Running %s' % config.overrides)
+  prefix = os.path.join(results_dir, config.params_hash)
+  params = config.params
+  if not params.metrics_log_file:
+    # Record the per-step times, so the runs can be compared with
+    # compare_runs.py.
+    params = params._replace(metrics_log_file=prefix + '.metrics.jsonl')
+  try:
+    with open(prefix + '.log', 'w') as log_file:
+      stats = run_fn(params, prefix + '.stats.json', stdout=log_file)
+  except subprocess.CalledProcessError as e:
+    log_fn('Run of %s failed with exit code %d. See %s.log' %
+           (config.overrides, e.returncode, prefix))
+    return None
+  result = {
+      'overrides': config.overrides,
+      'flags': repeated_runs.get_flags_from_params(config.params),
+      'stats': stats,
+  }
+  if not config.params.metrics_log_file:
+    result['metrics_log_file'] = os.path.basename(params.metrics_log_file)
+  _store_result(results_dir, config.params_hash, result)
+  return result
+
+
+def run_config_group(configs, results_dir,
+                     run_fn=repeated_runs.run_in_subprocess):
+  """Runs configurations that can share a session in a single run.
+
+  Each configuration whose result is not stored yet is one measurement phase of
+  the run. Its stats are the stats of its phase, along with the stats that
+  cover the whole run, such as the startup time. Per-step metrics are not
+  recorded, since the steps of all phases would be mixed in one log.
+
+  Args:
+    configs: A list of SweepConfig returned by group_configs_by_session().
+    results_dir: Directory where results are stored.
+    run_fn: Function that runs the benchmark, as in run_config().
+
+  Returns:
+    The list of results of `configs`. The results of all the configurations
+    that were run are None if the run failed.
+  """
+  pending = [c for c in configs
+             if load_result(results_dir, c.params_hash) is None]
+  if len(pending) <= 1:
+    return [run_config(c, results_dir, run_fn) for c in configs]
+  params = pending[0].params._replace(
+      measurement_phases=[get_measurement_phase_str(c.params) for c in pending])
+  params_hash = get_params_hash(params)
+  prefix = os.path.join(results_dir, params_hash)
+  log_fn('Running %s in one session' % [c.overrides for c in pending])
+  try:
+    with open(prefix + '.log', 'w') as log_file:
+      stats = run_fn(params, prefix + '.stats.json', stdout=log_file)
+  except subprocess.CalledProcessError as e:
+    log_fn('Run of %s failed with exit code %d. See %s.log' %
+           ([c.overrides for c in pending], e.returncode, prefix))
+    stats = None
+  if stats is not None:
+    run_stats = {name: value for name, value in stats.items()
+                 if name != 'measurement_phases'}
+    for config, phase_stats in zip(pending, stats['measurement_phases']):
+      config_stats = dict(run_stats)
+      config_stats.update(phase_stats)
+      _store_result(results_dir, config.params_hash, {
+          'overrides': config.overrides,
+          'flags': repeated_runs.get_flags_from_params(config.params),
+          'stats': config_stats,
+          'session_log_file': os.path.basename(prefix + '.log'),
+      })
+  return [load_result(results_dir, c.params_hash) for c in configs]
+
+
+def get_results_table(results, sort_by='images_per_sec'):
+  """Returns a tab-separated table of the results, one row per configuration.
+
+  The table has a column for each swept parameter and for the `sort_by` stat,
+  and is sorted by that stat in descending order.
+  """
+  results = [r for r in results if r is not None]
+  names = sorted(set(itertools.chain.from_iterable(
+      r['overrides'] for r in results)))
+  results.sort(key=lambda r: r['stats'].get(sort_by, float('-inf')),
+               reverse=True)
+  rows = [names + [sort_by]]
+  for result in results:
+    value = result['stats'].get(sort_by)
+    rows.append([str(result['overrides'].get(name, '')) for name in names] +
+                ['%.2f' % value if isinstance(value, float) else str(value)])
+  return '\n'.join('\t'.join(row) for row in rows)
+
+
+def run_sweep(base_params, sweep, results_dir, num_parallel_runs=1,
+              sort_by='images_per_sec', share_sessions=False):
+  """Runs every configuration of `sweep`, and returns the results table."""
+  configs = make_sweep_configs(base_params, sweep)
+  if not os.path.isdir(results_dir):
+    os.makedirs(results_dir)
+  log_fn('Sweeping over %d configurations' % len(configs))
+  if share_sessions:
+    groups = group_configs_by_session(configs)
+  else:
+    groups = [[c] for c in configs]
+  # Every group runs in its own process, so threads are enough to run several
+  # at once.
+  thread_pool = pool.ThreadPool(num_parallel_runs)
+  try:
+    results = list(itertools.chain.from_iterable(thread_pool.map(
+        lambda g: run_config_group(g, results_dir), groups)))
+  finally:
+    thread_pool.close()
+  table = get_results_table(results, sort_by)
+  with open(os.path.join(results_dir, 'results.tsv'), 'w') as f:
+    f.write(table + '\n')
+  num_failed = sum(1 for r in results if r is None)
+  if num_failed:
+    log_fn('%d of %d configurations failed' % (num_failed, len(configs)))
+  return table
+
+
+def main(positional_arguments):
+  if len(positional_arguments) > 1:
+    raise ValueError('Received unknown positional arguments: %s'
+                     % positional_arguments[1:])
+  flags_obj = absl_flags.FLAGS
+  if not flags_obj.sweep_config or not flags_obj.sweep_results_dir:
+    raise ValueError('--sweep_config and --sweep_results_dir must be '
+                     'specified')
+  with open(flags_obj.sweep_config) as f:
+    sweep = json.load(f)
+  table = run_sweep(benchmark_cnn.make_params_from_flags(), sweep,
+                    flags_obj.sweep_results_dir,
+                    flags_obj.sweep_num_parallel_runs, flags_obj.sweep_sort_by,
+                    flags_obj.sweep_share_sessions)
+  log_fn('-' * 64)
+  for line in table.split('\n'):
+    log_fn(line)
+
+
+if __name__ == '__main__':
+  # The benchmark flags are only defined when run as a script, so the functions
+  # above can be imported alongside other modules that define them.
+  flags.define_flags()
+  for name in flags.param_specs.keys():
+    absl_flags.declare_key_flag(name)
+  app.run(main)
@@ -0,0 +1,146 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for tf_cnn_benchmarks.sweep."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import subprocess
+
+import tensorflow as tf
+
+import benchmark_cnn
+import sweep
+
+
+class SweepTest(tf.test.TestCase):
+
+  def testExpandSweep(self):
+    self.assertEqual(
+        sweep.expand_sweep({'num_gpus': [1, 2], 'batch_size': [32, 64]}),
+        [{'batch_size': 32, 'num_gpus': 1}, {'batch_size': 32, 'num_gpus': 2},
+         {'batch_size': 64, 'num_gpus': 1}, {'batch_size': 64, 'num_gpus': 2}])
+    overrides = [{'batch_size': 32}, {'model': 'resnet50', 'use_fp16': True}]
+    self.assertEqual(sweep.expand_sweep(overrides), overrides)
+
+  def testMakeSweepConfigs(self):
+    base_params = benchmark_cnn.make_params(model='resnet50')
+    configs = sweep.make_sweep_configs(
+        base_params, [{'batch_size': 32}, {'batch_size': 64},
+                      {'model': 'resnet50'}])
+    self.assertEqual(configs[0].params.batch_size, 32)
+    self.assertEqual(configs[0].params.model, 'resnet50')
+    self.assertEqual(len(set(c.params_hash for c in configs)), 3)
+    # The hash only depends on the effective params, not on how they are
+    # specified.
+    self.assertEqual(
+        configs[2].params_hash,
+        sweep.get_params_hash(benchmark_cnn.make_params(model='resnet50')))
+    with self.assertRaises(ValueError):
+      sweep.make_sweep_configs(base_params, [{'not_a_param': 1}])
+    with self.assertRaises(ValueError):
+      sweep.make_sweep_configs(base_params,
+                               [{'variable_update': 'not_a_mode'}])
+
+  def testRunSkipsStoredResults(self):
+    results_dir = self.get_temp_dir()
+    configs = sweep.make_sweep_configs(
+        benchmark_cnn.make_params(), {'batch_size': [32, 64, 128]})
+    runs = []
+
+    def run_fn(params, stats_file, stdout):
+      del stats_file, stdout  # Unused
+      runs.append(params.batch_size)
+      if params.batch_size == 128:
+        raise subprocess.CalledProcessError(1, 'tf_cnn_benchmarks.py')
+      return {'images_per_sec': params.batch_size * 10.}
+
+    results = [sweep.run_config(c, results_dir, run_fn) for c in configs]
+    self.assertEqual(runs, [32, 64, 128])
+    self.assertIsNone(results[2])
+    self.assertEqual(results[1]['overrides'], {'batch_size': 64})
+    self.assertEqual(results[1]['stats'], {'images_per_sec': 640.})
+    self.assertEqual(results[1]['metrics_log_file'],
+                     configs[1].params_hash + '.metrics.jsonl')
+
+    # Only the failed configuration is run again.
+    results = [sweep.run_config(c, results_dir, run_fn) for c in configs]
+    self.assertEqual(runs, [32, 64, 128, 128])
+    self.assertEqual(results[1]['stats'], {'images_per_sec': 640.})
+
+    self.assertEqual(
+        sweep.get_results_table(results).split('\n'),
+        ['batch_size\timages_per_sec', '64\t640.00', '32\t320.00'])
+
+  def testGroupConfigsBySession(self):
+    configs = sweep.make_sweep_configs(
+        benchmark_cnn.make_params(), [
+            {'num_batches': 10}, {'batch_size': 64}, {'num_batches': 20},
+            {'num_batches': 30, 'display_every': 5},
+            {'measurement_phases': ['num_batches=10']},
+            {'input_pipeline_only': True, 'num_batches': 10},
+            {'input_pipeline_only': True, 'num_batches': 20}])
+    groups = sweep.group_configs_by_session(configs)
+    self.assertEqual([[c.overrides for c in g] for g in groups],
+                     [[{'num_batches': 10}, {'num_batches': 20},
+                       {'num_batches': 30, 'display_every': 5}],
+                      [{'batch_size': 64}],
+                      [{'measurement_phases': ['num_batches=10']}],
+                      [{'input_pipeline_only': True, 'num_batches': 10}],
+                      [{'input_pipeline_only': True, 'num_batches': 20}]])
+    self.assertEqual(sweep.get_measurement_phase_str(configs[3].params),
+                     'num_batches=30:num_warmup_batches=10:display_every=5')
+    # Phases after the first one warm up like configurations run on their own.
+    self.assertEqual(sweep.get_measurement_phase_str(
+        benchmark_cnn.make_params(num_warmup_batches=3)),
+                     'num_warmup_batches=3:display_every=10')
+
+  def testRunConfigGroup(self):
+    results_dir = self.get_temp_dir()
+    configs = sweep.make_sweep_configs(
+        benchmark_cnn.make_params(), {'num_batches': [10, 20, 30]})
+    runs = []
+
+    def run_fn(params, stats_file, stdout):
+      del stats_file, stdout  # Unused
+      runs.append(params.measurement_phases)
+      return {
+          'images_per_sec': 1.,
+          'startup_time': 5.,
+          'measurement_phases': [
+              {'images_per_sec': float(phase.split(':')[0].split('=')[1])}
+              for phase in params.measurement_phases],
+      }
+
+    # The first configuration is run on its own.
+    sweep.run_config(configs[0], results_dir, lambda *args, **kwargs: {})
+    results = sweep.run_config_group(configs, results_dir, run_fn)
+    self.assertEqual(runs, [
+        ['num_batches=20:num_warmup_batches=10:display_every=10',
+         'num_batches=30:num_warmup_batches=10:display_every=10']])
+    self.assertEqual(results[0]['stats'], {})
+    self.assertEqual(results[2]['overrides'], {'num_batches': 30})
+    self.assertEqual(results[2]['stats'],
+                     {'images_per_sec': 30., 'startup_time': 5.})
+
+    # Every configuration is stored, so nothing is run again.
+    self.assertEqual(sweep.run_config_group(configs, results_dir, run_fn),
+                     results)
+    self.assertEqual(len(runs), 1)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -22,6 +22,12 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import time
+# Taken before the other imports, so the startup profile includes the time to
+# import TensorFlow.
+_START_TIME = time.time()
+
+# pylint: disable=g-import-not-at-top
 from absl import app
 from absl import flags as absl_flags
 import tensorflow as tf
@@ -30,7 +36,10 @@ import benchmark_cnn
 import cnn_util
 import flags
 import mlperf
+import repeated_runs
+import startup_profile
 from cnn_util import log_fn
+# pylint: enable=g-import-not-at-top
 
 
 flags.define_flags()
@@ -43,6 +52,20 @@ absl_flags.DEFINE_boolean(
     'MLPerf training repo https://github.com/mlperf/training and add '
     'https://github.com/mlperf/training/tree/master/compliance to the '
     'PYTHONPATH')
+absl_flags.DEFINE_integer(
+    'num_repeats', 1,
+    'If greater than 1, run the benchmark this many times, each in a fresh '
+    'process, and report the median, interquartile range and a bootstrap '
+    'confidence interval of the median of images/sec.', lower_bound=1)
+absl_flags.DEFINE_float(
+    'repeat_trim_fraction', 0.,
+    'With --num_repeats, the fraction of the runs with the lowest and with '
+    'the highest images/sec to drop before summarizing.', lower_bound=0.,
+    upper_bound=0.49)
+absl_flags.DEFINE_string(
+    'stats_output_file', None,
+    'If set, the statistics of the run, such as images/sec, are written to '
+    'this file as JSON.')
 
 
 def main(positional_arguments):
@@ -56,16 +79,32 @@ def main(positional_arguments):
                      % positional_arguments[1:])
 
   params = benchmark_cnn.make_params_from_flags()
+  startup_profiler = startup_profile.StartupProfiler(
+      start_time=_START_TIME, measure_graphs=params.startup_profile)
+  startup_profiler.mark('import')
+  if absl_flags.FLAGS.num_repeats > 1:
+    extra_flags = []
+    if absl_flags.FLAGS.ml_perf_compliance_logging:
+      extra_flags.append('--ml_perf_compliance_logging')
+    repeated_runs.run_and_report(params, absl_flags.FLAGS.num_repeats,
+                                 absl_flags.FLAGS.repeat_trim_fraction,
+                                 extra_flags)
+    return
+
   with mlperf.mlperf_logger(absl_flags.FLAGS.ml_perf_compliance_logging,
                             params.model):
     params = benchmark_cnn.setup(params)
-    bench = benchmark_cnn.BenchmarkCNN(params)
+    startup_profiler.mark('setup')
+    bench = benchmark_cnn.BenchmarkCNN(params,
+                                       startup_profiler=startup_profiler)
 
     tfversion = cnn_util.tensorflow_version_tuple()
     log_fn('TensorFlow:  %i.%i' % (tfversion[0], tfversion[1]))
 
     bench.print_info()
-    bench.run()
+    stats = bench.run()
+    if absl_flags.FLAGS.stats_output_file:
+      repeated_runs.write_stats(stats, absl_flags.FLAGS.stats_output_file)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,197 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Builds the forward and backward pass of a tower once, as a function.
+
+By default, the whole network is rebuilt on every device, so graph construction
+time and GraphDef size grow linearly with the number of devices. TowerFunction
+instead defines the computation of a tower once as a TensorFlow function, which
+every tower calls with its own inputs and variables.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+
+from tensorflow.python.framework import function
+
+
+class _ReadOnlyVariable(object):
+  """Stands in for a non-trainable variable inside a tower function.
+
+  Variables cannot be assigned to from inside a function. The only
+  non-trainable variables the models assign to are the batch norm moving
+  averages, whose updates are only run for the first tower, which is not built
+  as a function. So reads return the value of the variable, and assignments do
+  nothing.
+  """
+
+  def __init__(self, variable):
+    self._variable = variable
+
+  @property
+  def dtype(self):
+    return self._variable.dtype.base_dtype
+
+  @property
+  def shape(self):
+    return self._variable.shape
+
+  def get_shape(self):
+    return self._variable.get_shape()
+
+  @property
+  def name(self):
+    return self._variable.name
+
+  def value(self):
+    return self._variable.value()
+
+  def _no_op_assign(self, value, use_locking=None, name=None, read_value=True):
+    del value, use_locking, read_value  # Unused
+    return tf.no_op(name=name)
+
+  assign = _no_op_assign
+  assign_add = _no_op_assign
+  assign_sub = _no_op_assign
+
+
+def _read_only_variable_to_tensor(var, dtype=None, name=None, as_ref=False):
+  del name, as_ref  # Unused
+  value = var.value()
+  if dtype is not None and not dtype.is_compatible_with(value.dtype):
+    raise ValueError('Incompatible type conversion requested to type %s for '
+                     'variable of type %s' % (dtype.name, value.dtype.name))
+  return value
+
+
+tf.register_tensor_conversion_function(_ReadOnlyVariable,
+                                       _read_only_variable_to_tensor)
+
+
+class TowerFunction(object):
+  """Calls the computation of a tower, defined once as a function.
+
+  The function is defined by the first call, from a tower built like a
+  regular tower. Its trainable variables are passed as explicit arguments, so
+  the same function works for towers that share variables, as in
+  parameter_server mode, and for towers that have their own, as in replicated
+  mode.
+
+  Args:
+    variable_scope_name: Name of the outer variable scope of the tower that was
+      built without the function.
+    template_variables: The trainable variables of that tower, in the order
+      returned by VariableMgr.trainable_variables_on_device. Every tower built
+      with the function gets variables with the same names, relative to its
+      own outer variable scope, and in the same order.
+  """
+
+  def __init__(self, variable_scope_name, template_variables):
+    self._variable_scope_name = variable_scope_name
+    prefix = variable_scope_name + '/'
+    self._template_variables = list(template_variables)
+    self._local_names = []
+    for v in self._template_variables:
+      if not v.op.name.startswith(prefix):
+        raise ValueError('Variable %s is not in variable scope %s, so towers '
+                         'cannot be built as a function' %
+                         (v.op.name, variable_scope_name))
+      self._local_names.append(v.op.name[len(prefix):])
+    self._func = None
+    self._num_inputs = None
+    self._output_shapes = None
+
+  def create_tower_variables(self):
+    """Creates the trainable variables of a tower in the current scope.
+
+    Must be called in the outer variable scope of the tower, so the variables
+    get the same names and placement as if the tower was built without the
+    function. If the scope reuses variables, as in parameter_server mode, the
+    existing variables are returned.
+
+    Returns:
+      The variables, in the same order as `template_variables`.
+    """
+    return [tf.get_variable(local_name, initializer=v.initial_value)
+            for local_name, v in zip(self._local_names,
+                                     self._template_variables)]
+
+  def __call__(self, build_fn, input_list, params):
+    """Returns the outputs of the tower function for a tower.
+
+    Args:
+      build_fn: Function that builds the tower. It takes the list of input
+        tensors and the list of trainable variable values, and returns a list
+        of output tensors. It is only called by the first call, to define the
+        function.
+      input_list: The input tensors of the tower.
+      params: The trainable variables of the tower, as returned by
+        create_tower_variables or VariableMgr.trainable_variables_on_device.
+
+    Returns:
+      The list of output tensors of the tower.
+    """
+    args = [tf.convert_to_tensor(x) for x in list(input_list) + list(params)]
+    if self._func is None:
+      self._define(build_fn, len(input_list), args)
+    elif len(input_list) != self._num_inputs:
+      raise ValueError('Expected %d inputs, but got %d' %
+                       (self._num_inputs, len(input_list)))
+    outputs = self._func(*args)
+    if isinstance(outputs, tf.Tensor):
+      outputs = [outputs]
+    outputs = list(outputs)
+    # Function outputs have unknown shapes, but later steps such as the
+    # all-reduce need the static shapes.
+    for output, shape in zip(outputs, self._output_shapes):
+      output.set_shape(shape)
+    return outputs
+
+  def _define(self, build_fn, num_inputs, args):
+    """Defines the function with the dtypes and shapes of `args`."""
+    self._num_inputs = num_inputs
+    arg_shapes = [arg.shape for arg in args]
+    param_index = {
+        '%s/%s' % (self._variable_scope_name, local_name): i
+        for i, local_name in enumerate(self._local_names)
+    }
+    global_variables = {v.op.name: v for v in tf.global_variables()}
+
+    def body(*func_args):
+      """Builds the tower from the function arguments."""
+      for arg, shape in zip(func_args, arg_shapes):
+        arg.set_shape(shape)
+      tower_inputs = list(func_args[:num_inputs])
+      tower_params = list(func_args[num_inputs:])
+
+      def getter(unused_getter, name, *unused_args, **unused_kwargs):
+        if name in param_index:
+          return tower_params[param_index[name]]
+        if name in global_variables:
+          return _ReadOnlyVariable(global_variables[name])
+        raise ValueError('Variable %s is not a variable of the first tower, '
+                         'so it cannot be used in the tower function' % name)
+
+      with tf.variable_scope(self._variable_scope_name, custom_getter=getter):
+        outputs = build_fn(tower_inputs, tower_params)
+      self._output_shapes = [output.shape for output in outputs]
+      return outputs
+
+    # Clear the device, so the function runs on the device of each call rather
+    # than on the device of the tower that defines it.
+    with tf.device(None):
+      self._func = function.Defun(*[arg.dtype for arg in args])(body)
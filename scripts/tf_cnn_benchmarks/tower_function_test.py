@@ -0,0 +1,68 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for tf_cnn_benchmarks.tower_function."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+
+import tower_function
+
+
+def _build_tower(input_list, params):
+  w = tf.get_variable('w', shape=[])
+  moving_average = tf.get_variable('moving_average', shape=[],
+                                   trainable=False)
+  tf.add_to_collection(tf.GraphKeys.UPDATE_OPS,
+                       tf.assign_sub(moving_average, 1.))
+  y = input_list[0] * w + moving_average
+  return [y] + tf.gradients(y, params)
+
+
+class TowerFunctionTest(tf.test.TestCase):
+
+  def testTowers(self):
+    with tf.Graph().as_default():
+      with tf.variable_scope('v0'):
+        w = tf.get_variable('w', initializer=2.)
+        tf.get_variable('moving_average', initializer=0., trainable=False)
+      tower_fn = tower_function.TowerFunction('v0', [w])
+      outputs = []
+      for device_num in (1, 2):
+        with tf.variable_scope('v%d' % device_num):
+          params = tower_fn.create_tower_variables()
+          self.assertEqual(params[0].op.name, 'v%d/w' % device_num)
+          outputs.append(tower_fn(_build_tower,
+                                  [tf.constant(float(device_num))], params))
+      # The network is only built once, in the function.
+      self.assertFalse(tf.get_collection(tf.GraphKeys.UPDATE_OPS))
+      self.assertEqual(outputs[0][0].shape, tf.TensorShape([]))
+      with self.test_session() as sess:
+        sess.run(tf.global_variables_initializer())
+        self.assertAllClose(sess.run(outputs), [[2., 1.], [4., 2.]])
+        # Assignments in the function do nothing.
+        self.assertAllClose(sess.run('v0/moving_average:0'), 0.)
+
+  def testVariableOutsideScope(self):
+    with tf.Graph().as_default():
+      w = tf.get_variable('w', initializer=2.)
+      with self.assertRaises(ValueError):
+        tower_function.TowerFunction('v0', [w])
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,134 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Stores the initial values of variables on local disk, to skip initializers.
+
+Initializing a large model runs its random initializers on every tower, then
+copies the variables of the first tower to the other towers. VariableSnapshot
+instead saves the variables of every tower right after they are initialized,
+so that later runs of the same model restore them with a sharded Saver, which
+reads the shards in parallel, without running any initializer or copy.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+import shutil
+
+import tensorflow as tf
+
+
+_CHECKPOINT_PREFIX = 'variables'
+
+
+def get_snapshot_key(model_name, seed, variables):
+  """Returns the key of the snapshot of `variables`.
+
+  The initial values of the variables only depend on the model, the random seed
+  and the variables themselves, so the names, shapes and dtypes of the
+  variables stand in for all params that affect them, such as --num_gpus or
+  --variable_update.
+
+  Args:
+    model_name: The name of the model.
+    seed: The graph-level random seed, --tf_random_seed.
+    variables: The variables in the snapshot.
+
+  Returns:
+    A hex string.
+  """
+  key_dict = {
+      'model_name': model_name,
+      'seed': seed,
+      'variables': [[v.op.name, v.shape.as_list(), v.dtype.base_dtype.name]
+                    for v in variables],
+  }
+  return hashlib.sha1(
+      json.dumps(key_dict, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class VariableSnapshot(object):
+  """A snapshot of the initial values of variables, in a local directory.
+
+  Each snapshot is a subdirectory named after its key, containing a sharded
+  checkpoint. It is written to a temporary directory which is then renamed, so
+  a snapshot directory is always complete.
+
+  Example usage:
+  ```
+  snapshot = VariableSnapshot('/tmp/snapshots', model_name, seed,
+                              tf.global_variables())
+  snapshot.create_saver()
+  with tf.Session() as sess:
+    if snapshot.exists():
+      snapshot.restore(sess)
+    else:
+      sess.run(tf.global_variables_initializer())
+      snapshot.save(sess)
+  ```
+
+  Args:
+    snapshot_dir: The directory containing all snapshots.
+    model_name: The name of the model.
+    seed: The graph-level random seed, --tf_random_seed.
+    variables: The variables to store in the snapshot.
+  """
+
+  def __init__(self, snapshot_dir, model_name, seed, variables):
+    self.variables = list(variables)
+    self.key = get_snapshot_key(model_name, seed, self.variables)
+    self.path = os.path.join(snapshot_dir, self.key)
+    self._saver = None
+
+  def exists(self):
+    """Returns True if the snapshot has every variable, with the same shape."""
+    try:
+      reader = tf.train.NewCheckpointReader(
+          os.path.join(self.path, _CHECKPOINT_PREFIX))
+    except (tf.errors.NotFoundError, tf.errors.DataLossError):
+      return False
+    shapes = reader.get_variable_to_shape_map()
+    return all(shapes.get(v.op.name) == v.shape.as_list()
+               for v in self.variables)
+
+  def create_saver(self):
+    """Creates the ops to save and restore the snapshot.
+
+    Must be called before the graph is finalized, and before save() or
+    restore().
+    """
+    # A sharded Saver saves and restores the variables of each device with a
+    # separate op, so the shards are read in parallel.
+    self._saver = tf.train.Saver(self.variables, sharded=True,
+                                 max_to_keep=None)
+
+  def restore(self, sess):
+    """Assigns the values in the snapshot to the variables."""
+    self._saver.restore(sess, os.path.join(self.path, _CHECKPOINT_PREFIX))
+
+  def save(self, sess):
+    """Saves the current values of the variables as the snapshot."""
+    tmp_path = '%s.tmp%d' % (self.path, os.getpid())
+    os.makedirs(tmp_path)
+    self._saver.save(sess, os.path.join(tmp_path, _CHECKPOINT_PREFIX),
+                     write_meta_graph=False, write_state=False)
+    try:
+      os.rename(tmp_path, self.path)
+    except OSError:
+      # Another run stored the same snapshot first.
+      shutil.rmtree(tmp_path, ignore_errors=True)
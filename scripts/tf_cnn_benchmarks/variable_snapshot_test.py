@@ -0,0 +1,67 @@
+# Copyright 2018 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for tf_cnn_benchmarks.variable_snapshot."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+import tensorflow as tf
+
+import variable_snapshot
+
+
+class VariableSnapshotTest(tf.test.TestCase):
+
+  def _create_snapshot(self, snapshot_dir, shape):
+    variables = [
+        tf.get_variable('v0/w', shape,
+                        initializer=tf.random_normal_initializer()),
+        tf.get_variable('v1/w', shape, initializer=tf.zeros_initializer()),
+    ]
+    return variable_snapshot.VariableSnapshot(snapshot_dir, 'model', 1234,
+                                              variables)
+
+  def testSaveAndRestore(self):
+    snapshot_dir = os.path.join(self.get_temp_dir(), 'snapshots')
+    with tf.Graph().as_default():
+      snapshot = self._create_snapshot(snapshot_dir, [2, 3])
+      snapshot.create_saver()
+      self.assertFalse(snapshot.exists())
+      with self.test_session() as sess:
+        sess.run(tf.global_variables_initializer())
+        expected_values = sess.run(snapshot.variables)
+        snapshot.save(sess)
+      self.assertTrue(snapshot.exists())
+      self.assertEqual(os.listdir(snapshot_dir), [snapshot.key])
+
+    with tf.Graph().as_default():
+      snapshot = self._create_snapshot(snapshot_dir, [2, 3])
+      snapshot.create_saver()
+      self.assertTrue(snapshot.exists())
+      with self.test_session() as sess:
+        snapshot.restore(sess)
+        self.assertAllEqual(sess.run(snapshot.variables), expected_values)
+
+    # Variables with different shapes have a different snapshot.
+    with tf.Graph().as_default():
+      snapshot = self._create_snapshot(snapshot_dir, [3, 3])
+      self.assertFalse(snapshot.exists())
+
+
+if __name__ == '__main__':
+  tf.test.main()